@@ -3,105 +3,270 @@ import pandas as pd
 import numpy as np
 import plotly.graph_objs as go
 
-def interactive_space(df_plot, grouping_variables=['Survived', 'Group_Age', 'Pclass', 'Embarked', 'Sex', 'deck', 'FamilyID']):
-    
-    # Título de la app
-    st.title('Interactive Titanic Data Visualization')
+from cluster_layout import order_groups, cluster_layout
+from grouping import composite_codes, format_labels
+from group_cache import GroupingCache, dataset_fingerprint, grouping_key
+from loader import CLEAN_ARROW, load_clean
+from profiling import collect, is_enabled, profiled, stage
+from rendering import RENDER_MODES, choose_render_mode, density_trace, points_in_box
 
-    # Selección de variables para agrupar
-    selected_vars = st.multiselect(
-        'Group by:', 
-        options=grouping_variables, 
-        default=[]
-    )
-    
-    # Generar posiciones de los puntos en un cluster
-    def generate_cluster_positions(center_x, center_y, n_points):
-        angles = np.linspace(0, 2 * np.pi, n_points, endpoint=False)
-        radii = np.random.uniform(0, 1, size=n_points)
-        x_offsets = radii * np.cos(angles)
-        y_offsets = radii * np.sin(angles)
-        return center_x + x_offsets, center_y + y_offsets
-
-    # Actualizar la gráfica y los conteos
-    if selected_vars:
-        df_plot['Group'] = df_plot[selected_vars].astype(str).agg('-'.join, axis=1)
-    else:
-        df_plot['Group'] = 'All Passengers'
 
-    groups = df_plot['Group'].value_counts().index.tolist()
-    
-    fig = go.Figure()
+# Campos del hover: nombre mostrado -> columna del dataframe
+HOVER_FIELDS = {
+    'Name': 'Name',
+    'Survived': 'Survived',
+    'Sex': 'Sex',
+    'Age': 'Age',
+    'Fare': 'Fare',
+    'Pclass': 'Pclass',
+    'Embarked': 'Embarked',
+    'Deck': 'deck',
+    'n_fam': 'n_fam',
+    'FamilyID': 'FamilyID',
+    'Family Survival Rate': 'Family_Survival_Rate',
+}
 
-    group_counts = []
+# Formato de los campos numéricos con decimales (se guardan como float32)
+HOVER_FORMATS = {
+    'Age': ':.4~f',
+    'Fare': ':.4~f',
+}
 
-    # Definir parámetros para la disposición en filas y columnas
-    max_clusters_per_row = 5
-    row_height = 5  # Espacio vertical entre filas
-    cluster_spacing_x = 5  # Espacio horizontal entre clusters
+# Memoria aproximada de una figura guardada en la caché, medida con tracemalloc: unos 6 KB por traza de plotly,
+# unos 40 bytes por valor del hover (objetos de Python) y las coordenadas de cada punto
+TRACE_NBYTES = 6 * 1024
+HOVER_VALUE_NBYTES = 40
 
-    max_row = len(groups) // max_clusters_per_row
-    # Generar un cluster para cada grupo
-    for i, group in enumerate(groups):
-        
-        group_df_plot = df_plot[df_plot['Group'] == group]
-        n_points = len(group_df_plot)
-        
-        per_points = round((n_points / len(df_plot)) * 100, 2)
-
-        # Calcular el centro del cluster basado en la fila y la columna
-        row = i // max_clusters_per_row  # Definir la fila (empezando por 0)
-        col = i % max_clusters_per_row   # Definir la columna (de 0 a max_clusters_per_row-1)
-
-        center_x = col * cluster_spacing_x  # Separar los clusters en la fila
-        center_y = -row * row_height        # Cada fila tendrá una altura diferente
-        
-        #definir la distancia de las etiquetas de grupo y numero de individuos en funcion de la fila
-        if row == 0:
-            pos = 1.3
-        elif row == 1:
-            pos = 1.8
-        elif row == 2:
-            pos = 2.5
-        elif row == 3:
-            pos = 3
-        elif row == 4:
-            pos = 3.5
+
+def hover_template(hover_fields):
+    """
+    Builds the hover template that formats the `customdata` of every point in the browser.
+
+    Parameters:
+    - hover_fields (list): The names of the fields shown in the hover, keys of `HOVER_FIELDS`.
+
+    Returns:
+    str: The plotly hover template, or None when there are no fields.
+    """
+    if not hover_fields:
+        return None
+    lines = [f'{field}: %{{customdata[{j}]{HOVER_FORMATS.get(field, "")}}}' for j, field in enumerate(hover_fields)]
+    return '<br>'.join(lines) + '<extra></extra>'
+
+
+def hover_customdata(df_plot, rows, hover_fields):
+    """
+    Returns the values shown in the hover of the given rows, as an array with one column per field.
+
+    Only the values are sent to the browser: the text is formatted there with `hover_template`.
+
+    Parameters:
+    - df_plot (pandas.DataFrame): The input dataframe containing the data.
+    - rows (numpy.ndarray): The positions of the rows.
+    - hover_fields (list): The names of the fields shown in the hover, keys of `HOVER_FIELDS`.
+
+    Returns:
+    numpy.ndarray: A (len(rows), len(hover_fields)) array, or None when there are no fields.
+    """
+    if not hover_fields:
+        return None
+    columns = [HOVER_FIELDS[field] for field in hover_fields]
+    return df_plot[columns].take(rows).to_numpy()
+
+
+def compute_grouping(df_plot, selected_vars):
+    """
+    Computes the groups of passengers and everything needed to draw them.
+
+    The rows are grouped by the sorted `selected_vars`, so the result can be shared by every order of the
+    same variables. The group labels are built separately for each order by `group_labels`.
+
+    Parameters:
+    - df_plot (pandas.DataFrame): The input dataframe containing the data.
+    - selected_vars (list): The categorical variables used to group the passengers.
+
+    Returns:
+    dict: The group codes of every row, the counts, percentages, row order, offsets and layout of the groups,
+    an empty `labels` dict to be filled by `group_labels` and an empty `figures` dict for `build_cluster_figure`.
+    """
+    # Un único paso para obtener los grupos, sus tamaños y el orden de las filas
+    codes, uniques = composite_codes(df_plot, sorted(selected_vars))
+    group_order, counts, row_order, offsets = order_groups(codes, len(uniques))
+
+    return {
+        'codes': codes,
+        'counts': counts,
+        'percentages': np.round((counts / len(df_plot)) * 100, 2),
+        'row_order': row_order,
+        'offsets': offsets,
+        'layout': cluster_layout(counts),  # Posiciones de todos los clusters, etiquetas y puntos
+        'labels': {},
+        'figures': {},
+    }
+
+
+def group_labels(df_plot, selected_vars, grouping):
+    """
+    Returns the label of every group for the given order of the grouping variables.
+
+    The labels are built from the first row of each group, so the cost depends on the number of groups
+    and not on the number of rows. They are stored in `grouping['labels']` for later reruns.
+
+    Parameters:
+    - df_plot (pandas.DataFrame): The input dataframe containing the data.
+    - selected_vars (list): The categorical variables used to group the passengers, in display order.
+    - grouping (dict): The result of `compute_grouping`.
+
+    Returns:
+    list: The label of every group, in display order.
+    """
+    order = tuple(selected_vars)
+    if order not in grouping['labels']:
+        first_rows = grouping['row_order'][grouping['offsets'][:-1]]
+        grouping['labels'][order] = format_labels(df_plot[list(order)].take(first_rows), list(order))
+    return grouping['labels'][order]
+
+
+@profiled()
+def build_cluster_figure(df_plot, selected_vars, cache=None, fingerprint=None,
+                         render_mode='auto', webgl_threshold=10_000, raster_threshold=500_000, detail_box=None,
+                         hover_fields=None):
+    """
+    Builds the figure with one cluster of points per group of passengers.
+
+    The groups are computed with a single factorize pass over the grouping key, and the positions of all
+    the clusters, labels and points are computed at once. Each trace is then built from a slice of those
+    precomputed arrays, so the cost grows linearly with the number of rows.
+    When a `cache` is given, the grouping is stored under the dataset fingerprint and the sorted
+    `selected_vars`, together with the figures built from it for every order of the variables, render mode
+    and hover fields, so going back to a figure already viewed skips all that work, including the validation
+    of its traces by plotly. Cached figures are shared by every session and must not be modified.
+
+    The points are drawn as SVG, with WebGL from `webgl_threshold` points, and from `raster_threshold`
+    points as a density raster computed on the server. In that last mode the hover of single passengers
+    is only shown for the points inside `detail_box`, the region selected by the user.
+
+    The hover values are sent as `customdata` arrays and formatted in the browser by a single
+    `hovertemplate`, so no text is built in Python for every passenger.
+
+    Parameters:
+    - df_plot (pandas.DataFrame): The input dataframe containing the data.
+    - selected_vars (list): The categorical variables used to group the passengers.
+    - cache (group_cache.GroupingCache): Cache of the groupings. Default is None (no cache).
+    - fingerprint (str): Fingerprint of `df_plot`. Default is None (computed when a cache is given).
+    - render_mode (str): 'auto', 'svg', 'webgl' or 'raster'. Default is 'auto' (chosen with the thresholds).
+    - webgl_threshold (int): Number of points from which WebGL is used. Default is 10,000.
+    - raster_threshold (int): Number of points from which the density is rasterized. Default is 500,000.
+    - detail_box (dict): Region with 'x' and 'y' ranges whose points get a hover in raster mode. Default is None.
+    - hover_fields (list): The fields shown in the hover, keys of `HOVER_FIELDS`. Default is None (all of them).
+
+    Returns:
+    plotly.graph_objs.Figure: The figure with the clusters.
+    """
+    with stage('grouping', variables=list(selected_vars)) as record:
+        if cache is not None:
+            if fingerprint is None:
+                fingerprint = dataset_fingerprint(df_plot)
+            key = grouping_key(fingerprint, selected_vars)
+            grouping = cache.get(key)
+            record['cache_hit'] = grouping is not None
+            if grouping is None:
+                grouping = compute_grouping(df_plot, selected_vars)
+                group_labels(df_plot, selected_vars, grouping)
+                cache.put(key, grouping)
+            elif tuple(selected_vars) not in grouping['labels']:
+                group_labels(df_plot, selected_vars, grouping)
+                cache.put(key, grouping)  # Actualizar el tamaño de la entrada
         else:
-            pos = 4
-
-        # Generar posiciones para los puntos del cluster
-        x_positions, y_positions = generate_cluster_positions(center_x, center_y, n_points)
-
-        # Obtener información para el hover
-        hover_data = group_df_plot[['Name', 'Survived', 'Sex', 'Age', 'Fare', 'Pclass', 'Embarked', 'deck', 'n_fam', 'FamilyID', 'Family_Survival_Rate']].to_dict('records')
-        hover_text = [
-            f"Name: {d['Name']}<br>Survived: {d['Survived']}<br>Sex: {d['Sex']}<br>Age: {d['Age']}<br>Fare: {d['Fare']}<br>Pclass: {d['Pclass']}<br>Embarked: {d['Embarked']}<br>Deck: {d['deck']}<br>n_fam: {d['n_fam']}<br>FamilyID: {d['FamilyID']}<br>Family Survival Rate: {d['Family_Survival_Rate']}"
-            for d in hover_data
-        ]
-        fig.add_trace(go.Scatter(
-            x=x_positions,
-            y=y_positions,
-            mode='markers',
-            marker=dict(size=4),
-            name=group,
-            text=hover_text,
-            hoverinfo='text'
-        ))
-
-        # Añadir el número de individuos en cada grupo
-        fig.add_trace(go.Scatter(
-            x=[center_x],
-            y=[center_y - (0.2 + pos)],            # Posicionar el texto debajo del cluster
-            text=[f'{n_points} ({per_points}%) <br>{group}'],  
-            mode='text',
-            textfont=dict(color='black', size=12-(pos*0.7)),  # Usar el color blanco para el texto
-            showlegend=True, 
-             name=f'{n_points}'  # Hacer que el texto sea visible solo cuando el grupo es visible
-        ))
-
-        # Ajustar diseño de la gráfica
-        fig.update_layout(
+            grouping = compute_grouping(df_plot, selected_vars)
+
+        groups = group_labels(df_plot, selected_vars, grouping)
+        record['groups'] = len(groups)
+    counts = grouping['counts']
+    offsets = grouping['offsets']
+    per_points = grouping['percentages']
+    layout = grouping['layout']
+    row_order = grouping['row_order']
+
+    if hover_fields is None:
+        hover_fields = list(HOVER_FIELDS)
+    template = hover_template(hover_fields)
+
+    mode = choose_render_mode(len(df_plot), render_mode, webgl_threshold, raster_threshold)
+    scatter = go.Scattergl if mode == 'webgl' else go.Scatter
+
+    # La figura ya construida se reutiliza, salvo en modo raster con una región seleccionada (cambia en cada selección)
+    figure_key = (tuple(selected_vars), mode, tuple(hover_fields))
+    reusable = cache is not None and (mode != 'raster' or detail_box is None)
+    if reusable:
+        cached = grouping['figures'].get(figure_key)
+        with stage('figure_cache', hit=cached is not None):
+            if cached is not None:
+                return cached['figure']
+
+    traces = []
+    if mode == 'raster':
+        # Un único raster con la densidad de todos los puntos
+        traces.append(density_trace(layout['x'], layout['y']))
+
+        # Hover de cada pasajero solo para la región seleccionada
+        if detail_box is not None:
+            inside = points_in_box(layout['x'], layout['y'], detail_box)
+            traces.append(go.Scattergl(
+                x=layout['x'][inside],
+                y=layout['y'][inside],
+                mode='markers',
+                marker=dict(size=4),
+                name='Selection',
+                customdata=hover_customdata(df_plot, row_order[inside], hover_fields),
+                hovertemplate=template,
+                hoverinfo=None if hover_fields else 'skip'
+            ))
+    else:
+        # Valores del hover de todos los puntos, ya ordenados por grupo
+        with stage('hover', rows=len(row_order), fields=len(hover_fields)):
+            customdata = hover_customdata(df_plot, row_order, hover_fields)
+
+    # Generar un cluster para cada grupo
+    with stage('traces', mode=mode, groups=len(groups)):
+        for i, group in enumerate(groups):
+            start, end = offsets[i], offsets[i + 1]
+            n_points = counts[i]
+
+            if mode != 'raster':
+                traces.append(scatter(
+                    x=layout['x'][start:end],
+                    y=layout['y'][start:end],
+                    mode='markers',
+                    marker=dict(size=4),
+                    name=group,
+                    customdata=customdata[start:end] if hover_fields else None,
+                    hovertemplate=template,
+                    hoverinfo=None if hover_fields else 'skip'
+                ))
+
+            # Añadir el número de individuos en cada grupo
+            traces.append(go.Scatter(
+                x=[layout['center_x'][i]],
+                y=[layout['label_y'][i]],            # Posicionar el texto debajo del cluster
+                text=[f'{n_points} ({per_points[i]}%) <br>{group}'],
+                mode='text',
+                textfont=dict(color='black', size=layout['label_size'][i]),
+                showlegend=True,
+                name=f'{n_points}'  # Hacer que el texto sea visible solo cuando el grupo es visible
+            ))
+
+    # Validación de las trazas por plotly
+    with stage('figure', traces=len(traces)):
+        fig = go.Figure(data=traces)
+
+    if selected_vars == []:
+        label = 'Index'
+    else:
+        label = ' + '.join(selected_vars)
+
+    # Ajustar diseño de la gráfica
+    fig.update_layout(
         xaxis=dict(showgrid=False, zeroline=False, showticklabels=False),
         yaxis=dict(showgrid=False, zeroline=False, showticklabels=False),
         title={
@@ -111,28 +276,86 @@ def interactive_space(df_plot, grouping_variables=['Survived', 'Group_Age', 'Pcl
             'xanchor': 'center',
             'yanchor': 'top'
         },
-        legend_title='Group',
+        legend_title=f'{label}',
         template='plotly_white'  # Set the theme here
-        )
+    )
 
+    if reusable:
+        hover_values = len(row_order) * len(hover_fields) if mode != 'raster' else 0
+        nbytes = len(traces) * TRACE_NBYTES + hover_values * HOVER_VALUE_NBYTES + 2 * layout['x'].nbytes
+        grouping['figures'][figure_key] = {'figure': fig, 'nbytes': nbytes}
+        cache.put(key, grouping)  # Actualizar el tamaño de la entrada
+    return fig
 
-    if selected_vars == []:
-        label = 'Index'
-    else:
-        label = ' + '.join(selected_vars)
 
-    # Ajustar diseño de la gráfica
-    fig.update_layout(
-        xaxis=dict(showgrid=False, zeroline=False, showticklabels=False),
-        yaxis=dict(showgrid=False, zeroline=False, showticklabels=False),
-        title='Interactive Categorical Grouping of Titanic Passengers',
-        legend_title=f'{label}',
+@st.cache_resource
+def get_grouping_cache(max_bytes=256 * 1024 ** 2):
+    """Returns the grouping cache shared by every rerun of the app, with a memory cap of `max_bytes`."""
+    return GroupingCache(max_bytes=max_bytes)
+
+
+@profiled()
+def interactive_space(df_plot, grouping_variables=['Survived', 'Group_Age', 'Pclass', 'Embarked', 'Sex', 'deck', 'FamilyID'],
+                      fingerprint=None, cache_max_bytes=256 * 1024 ** 2, webgl_threshold=10_000, raster_threshold=500_000):
+    
+    # Título de la app
+    st.title('Interactive Titanic Data Visualization')
+
+    # Selección de variables para agrupar
+    selected_vars = st.multiselect(
+        'Group by:', 
+        options=grouping_variables, 
+        default=[]
+    )
+
+    # Campos a mostrar en el hover de cada pasajero
+    hover_fields = st.multiselect(
+        'Hover fields:',
+        options=list(HOVER_FIELDS),
+        default=list(HOVER_FIELDS)
     )
 
-    # Mostrar gráfico en Streamlit
-    st.plotly_chart(fig)
+    # Modo de dibujo de los puntos ('auto' lo elige según el número de pasajeros)
+    render_mode = st.selectbox('Render mode:', options=RENDER_MODES, index=0)
+    mode = choose_render_mode(len(df_plot), render_mode, webgl_threshold, raster_threshold)
+
+    # En modo raster, el hover de cada pasajero solo se muestra en la región seleccionada
+    selection = st.session_state.get('clusters')
+    boxes = selection.selection.get('box', []) if selection is not None and mode == 'raster' else []
+    detail_box = boxes[-1] if boxes else None
+
+    with collect() as records:
+        fig = build_cluster_figure(df_plot, selected_vars, cache=get_grouping_cache(cache_max_bytes), fingerprint=fingerprint,
+                                   render_mode=mode, detail_box=detail_box, hover_fields=hover_fields)
+
+        # Mostrar gráfico en Streamlit (incluye la serialización de la figura)
+        with stage('plotly_chart', mode=mode):
+            if mode == 'raster':
+                st.caption('Select a region with the box tool to see the details of its passengers.')
+                st.plotly_chart(fig, key='clusters', on_select='rerun', selection_mode='box')
+            else:
+                st.plotly_chart(fig)
+
+    # Panel de depuración con el tiempo de cada etapa, solo con el profiling activado (TITANIC_PROFILE)
+    if is_enabled():
+        with st.expander('Performance of this rerun'):
+            st.dataframe(pd.DataFrame(records))
+
+
+@st.cache_resource
+def load_data(path=CLEAN_ARROW):
+    """
+    Loads the dataset once per process from its memory-mapped columnar file and computes its fingerprint for the grouping cache.
+
+    The dataframe is read-only and shared by every session: the state of a session is only its grouping,
+    whose group codes and layout are kept in the grouping cache, so the memory grows with the groupings
+    cached and not with the number of users.
+    """
+    df_plot = load_clean(path, read_only=True)
+    return df_plot, dataset_fingerprint(df_plot)
+
 
 # Ejemplo de uso
 if __name__ == '__main__':
-    df_plot = pd.read_csv(r'data\titanic_clean.csv')  # Asegúrate de cargar tu DataFrame aquí
-    interactive_space(df_plot)
\ No newline at end of file
+    df_plot, fingerprint = load_data()
+    interactive_space(df_plot, fingerprint=fingerprint)
@@ -0,0 +1,57 @@
+import argparse
+import json
+
+
+def flatten(results, prefix=''):
+    """
+    Flattens the nested results of a benchmark run to {'size/suite/name': seconds}.
+
+    Parameters:
+    - results (dict): The 'results' of a run, or a part of them.
+    - prefix (str): Path of `results` in the run. Default is ''.
+
+    Returns:
+    dict: The time of every measure, skipped measures (None) excluded.
+    """
+    flat = {}
+    for key, value in results.items():
+        path = f'{prefix}/{key}' if prefix else key
+        if isinstance(value, dict):
+            flat.update(flatten(value, path))
+        elif isinstance(value, float):
+            flat[path] = value
+    return flat
+
+
+def compare(old_path, new_path, threshold=1.2):
+    """
+    Compares two benchmark runs and lists the measures that got slower or faster than `threshold`.
+
+    Parameters:
+    - old_path (str): JSON file of the reference run.
+    - new_path (str): JSON file of the new run.
+    - threshold (float): Ratio new / old from which a change is reported. Default is 1.2.
+
+    Returns:
+    list: (measure, old seconds, new seconds, ratio) of every reported measure, the slowest first.
+    """
+    with open(old_path) as f:
+        old = flatten(json.load(f)['results'])
+    with open(new_path) as f:
+        new = flatten(json.load(f)['results'])
+    changes = []
+    for name in sorted(old.keys() & new.keys()):
+        ratio = new[name] / old[name] if old[name] > 0 else float('inf')
+        if ratio >= threshold or ratio <= 1 / threshold:
+            changes.append((name, old[name], new[name], ratio))
+    return sorted(changes, key=lambda change: -change[3])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compares two benchmark runs.')
+    parser.add_argument('old', help='JSON file of the reference run.')
+    parser.add_argument('new', help='JSON file of the new run.')
+    parser.add_argument('--threshold', type=float, default=1.2, help='Ratio from which a change is reported.')
+    args = parser.parse_args()
+    for name, old_seconds, new_seconds, ratio in compare(args.old, args.new, args.threshold):
+        print(f'{name:70s} {old_seconds:10.4f} {new_seconds:10.4f} {ratio:7.2f}x')
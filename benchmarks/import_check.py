@@ -0,0 +1,104 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Heavy backends, by top-level package
+BACKENDS = ['matplotlib', 'seaborn', 'plotly', 'scipy', 'datashader', 'dash', 'jupyter_dash']
+
+# Cold `import functions` (pandas and numpy included) measured on a single core: about 0.5 s, down from about
+# 3 s when the module imported every backend
+MAX_IMPORT_SECONDS = 1.0
+
+SETUP = '''
+import warnings
+warnings.filterwarnings('ignore')
+import functions
+import pandas as pd
+from loader import CLEAN_CSV, table_to_pandas, to_arrow
+df = table_to_pandas(to_arrow(pd.read_csv(CLEAN_CSV)))
+'''
+
+# Checks: (name, setup, code, backends allowed after running the code)
+CHECKS = [
+    ('import', '', 'import functions', []),
+    ('matplotlib', SETUP, "functions.cathegorical_simple(df, ['Sex', 'Pclass']); functions.mixed_pairs(df, 'Age', 'Survived')",
+     ['matplotlib', 'seaborn', 'scipy']),
+    ('plotly', SETUP, "functions.px_violin_simple(df, 'Age', show=False); functions.px_violin_multiple(df, 'Age', 'Pclass', 'Sex', show=False, summary=True)",
+     ['plotly']),
+    ('stats', SETUP + 'from correlation import correlation_stats\nfrom regression import regression_stats\n',
+     "correlation_stats(df, ['Age', 'Fare'], ['Sex']).correlation(['Age', 'Fare', 'Sex_male']); regression_stats(df, 'Age', 'Fare').fit().p_value",
+     ['scipy']),
+]
+
+PROBE = '''
+import json, sys, time
+{setup}
+start = time.perf_counter()
+{code}
+seconds = time.perf_counter() - start
+print(json.dumps([seconds, sorted({{name.split('.')[0] for name in sys.modules}} & set({backends!r}))]))
+'''
+
+
+def probe(setup, code):
+    """
+    Runs `code` after `setup` in a new interpreter, so every import is cold.
+
+    Parameters:
+    - setup (str): Code run before the timed code.
+    - code (str): The timed code.
+
+    Returns:
+    tuple: (seconds, backends) with the time of `code` and the backends of `BACKENDS` loaded at the end.
+    """
+    env = dict(os.environ, MPLBACKEND='Agg')
+    env.pop('TITANIC_PROFILE', None)
+    source = PROBE.format(setup=setup, code=code, backends=BACKENDS)
+    result = subprocess.run([sys.executable, '-c', source], cwd=ROOT, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f'The probe failed:\n{result.stderr}')
+    seconds, backends = json.loads(result.stdout.strip().splitlines()[-1])
+    return seconds, backends
+
+
+def run(max_seconds=MAX_IMPORT_SECONDS, repeat=3):
+    """
+    Checks that importing `functions` loads no backend within the time target, and that every function loads
+    only the backends of its own stack.
+
+    Parameters:
+    - max_seconds (float): Target of the cold import of `functions`, the best of `repeat` runs. Default is `MAX_IMPORT_SECONDS`.
+    - repeat (int): Number of cold imports timed. Default is 3.
+
+    Returns:
+    tuple: (results, failures) with the time and the backends of every check, and the failed checks.
+    """
+    results, failures = {}, []
+    for name, setup, code, allowed in CHECKS:
+        runs = [probe(setup, code) for _ in range(repeat if name == 'import' else 1)]
+        seconds = min(run_seconds for run_seconds, _ in runs)
+        backends = runs[-1][1]
+        results[name] = {'seconds': seconds, 'backends': backends}
+        unexpected = sorted(set(backends) - set(allowed))
+        if unexpected:
+            failures.append(f"{name}: imports {', '.join(unexpected)}")
+        if name == 'import' and seconds > max_seconds:
+            failures.append(f'import: {seconds:.3f} s over the target of {max_seconds:.3f} s')
+    return results, failures
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Checks the cold import time of functions.py and the backends it loads.')
+    parser.add_argument('--max-seconds', type=float, default=MAX_IMPORT_SECONDS, help='Target of the cold import of functions.py.')
+    parser.add_argument('--repeat', type=int, default=3, help='Cold imports timed, the best one is kept.')
+    args = parser.parse_args()
+    results, failures = run(args.max_seconds, args.repeat)
+    print(json.dumps(results, indent=2))
+    for failure in failures:
+        print(f'FAIL {failure}', file=sys.stderr)
+    sys.exit(1 if failures else 0)
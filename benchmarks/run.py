@@ -0,0 +1,227 @@
+import argparse
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+
+from benchmarks.synthetic import synthetic_manifest
+from loader import table_to_pandas, to_arrow
+
+
+SIZES = {'10k': 10_000, '1M': 1_000_000, '10M': 10_000_000}
+
+# Target of `cleaning.clean_titanic` on the 1M manifest (load_raw apart). Measured on a single core: 1.1-1.2 s with
+# the string work in Arrow, down from 3.0-3.2 s with object strings on the same machine
+CLEAN_1M_MAX_SECONDS = 1.0
+
+GROUPING_VARIABLES = ['Survived', 'Group_Age', 'Pclass', 'Embarked', 'Sex', 'deck', 'FamilyID']
+
+# Plotters of functions.py: (name, function, keyword arguments, whether it draws every row)
+PLOTS = [
+    ('cathegorical_simple', 'cathegorical_simple', {'variables': ['Survived', 'Pclass', 'Sex', 'Group_Age', 'Embarked', 'deck', 'alone']}, False),
+    ('numerical_simple', 'numerical_simple', {'variables': ['Age', 'Fare']}, True),
+    ('px_violin_simple', 'px_violin_simple', {'y': 'Age', 'show': False}, True),
+    ('px_violin_simple[summary]', 'px_violin_simple', {'y': 'Age', 'show': False, 'summary': True}, False),
+    ('cathegorical_pairs', 'cathegorical_pairs', {'dep_var': 'Survived', 'ind_vars': ['Pclass', 'Sex', 'Embarked', 'Group_Age']}, False),
+    ('mixed_pairs', 'mixed_pairs', {'num_var': 'Age', 'cath_var': 'Survived'}, False),
+    ('numerical_pairs', 'numerical_pairs', {'x_var': 'Age', 'y_var': 'Fare'}, True),
+    ('numerical_pairs[fast]', 'numerical_pairs', {'x_var': 'Age', 'y_var': 'Fare', 'mode': 'fast'}, False),
+    ('numerical_pairs[hexbin]', 'numerical_pairs', {'x_var': 'Age', 'y_var': 'Fare', 'mode': 'hexbin'}, False),
+    ('mixed_trios', 'mixed_trios', {'num_var': 'Age', 'cath_inter': 'Pclass', 'cath_intra': 'Survived'}, False),
+    ('px_violin_multiple', 'px_violin_multiple', {'y': 'Age', 'x': 'Pclass', 'color': 'Sex', 'show': False}, True),
+    ('px_violin_multiple[summary]', 'px_violin_multiple', {'y': 'Age', 'x': 'Pclass', 'color': 'Sex', 'show': False, 'summary': True}, False),
+    ('corr_matrix', 'corr_matrix', {}, False),
+]
+
+
+def timed(function, repeat=1):
+    """
+    Runs a function `repeat` times and measures it.
+
+    Parameters:
+    - function (callable): The function, without arguments.
+    - repeat (int): Number of runs. Default is 1.
+
+    Returns:
+    tuple: (result, seconds) with the result of the last run and the best time.
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - start)
+    return result, min(times)
+
+
+def bench_cleaning(raw_path, repeat=1):
+    """
+    Times the cleaning steps of the notebook on a raw manifest (see `cleaning`).
+
+    Parameters:
+    - raw_path (str): Path of the raw CSV.
+    - repeat (int): Number of runs of every step, the best one is kept. Default is 1.
+
+    Returns:
+    tuple: (results, df) with the time of every step and the cleaned dataset.
+    """
+    import cleaning
+
+    results = {}
+    raw, results['load_raw'] = timed(lambda: cleaning.load_raw(raw_path), repeat)
+    df, results['add_alone_deck'] = timed(lambda: cleaning.add_alone_deck(raw.copy()), repeat)
+    df['Age'], results['impute_age'] = timed(lambda: cleaning.impute_age(df), repeat)
+    names, results['extract_names'] = timed(lambda: cleaning.extract_names(df['Name']), repeat)
+    df['Surname'], df['Title'], df['n_fam'] = names['Surname'], names['Title'], df['SibSp'] + df['Parch']
+    df['FamilyID'], results['family_ids'] = timed(lambda: cleaning.family_ids(df), repeat)
+    _, results['family_survival_rate'] = timed(lambda: cleaning.family_survival_rate(df), repeat)
+    clean, results['clean_titanic'] = timed(lambda: cleaning.clean_titanic(raw), repeat)
+    return results, clean
+
+
+def bench_plots(df, full_max_rows=100_000, repeat=1):
+    """
+    Times every plotter of `functions` headless, closing the figures instead of showing them.
+
+    Parameters:
+    - df (pandas.DataFrame): The cleaned dataset.
+    - full_max_rows (int): Plotters that draw every row are skipped above this number of rows. Default is 100,000.
+    - repeat (int): Number of runs of every plotter, the best one is kept. Default is 1.
+
+    Returns:
+    dict: The time of every plotter, None when it is skipped.
+    """
+    import functions
+
+    show = plt.show
+    plt.show = lambda *args, **kwargs: plt.close('all')
+    results = {}
+    try:
+        for name, function, kwargs, every_row in PLOTS:
+            if every_row and len(df) > full_max_rows:
+                results[name] = None
+                continue
+            plot = getattr(functions, function)
+            _, results[name] = timed(lambda: plot(df, **kwargs), repeat)
+            plt.close('all')
+    finally:
+        plt.show = show
+    return results
+
+
+def bench_interactive(df, grouping_variables=GROUPING_VARIABLES, max_vars=None):
+    """
+    Times the reruns of `app.interactive_space` for every combination of grouping variables.
+
+    A rerun builds the figure with `app.build_cluster_figure` and the grouping cache of the app: the cold
+    run starts with an empty cache and the warm run repeats it with the grouping cached.
+
+    Parameters:
+    - df (pandas.DataFrame): The cleaned dataset.
+    - grouping_variables (list): The grouping variables of the app. Default is `GROUPING_VARIABLES`.
+    - max_vars (int): Maximum number of variables of a combination. Default is None (every combination).
+
+    Returns:
+    dict: The 'cold' and 'warm' time of every combination, keyed by the variables joined with '+'.
+    """
+    import logging
+    logging.getLogger('streamlit').setLevel(logging.ERROR)
+    from app import build_cluster_figure
+    from group_cache import GroupingCache, dataset_fingerprint
+    from rendering import choose_render_mode
+
+    fingerprint = dataset_fingerprint(df)
+    mode = choose_render_mode(len(df))
+    max_vars = len(grouping_variables) if max_vars is None else max_vars
+
+    results = {}
+    for k in range(max_vars + 1):
+        for selected_vars in itertools.combinations(grouping_variables, k):
+            cache = GroupingCache()
+            run = lambda: build_cluster_figure(df, list(selected_vars), cache=cache, fingerprint=fingerprint, render_mode=mode)
+            _, cold = timed(run)
+            _, warm = timed(run)
+            results['+'.join(selected_vars) or '(none)'] = {'cold': cold, 'warm': warm}
+    return results
+
+
+def git_commit():
+    """Returns the commit of the working tree, or None outside a git repository."""
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(sizes, out_path, suites=('cleaning', 'plots', 'interactive'), full_max_rows=100_000, grouping_variables=GROUPING_VARIABLES,
+        max_vars=None, repeat=1, seed=0):
+    """
+    Runs the benchmark suites on synthetic manifests and writes the results to a JSON file.
+
+    Parameters:
+    - sizes (list): Names of the sizes of `SIZES` to run.
+    - out_path (str): Path of the JSON file.
+    - suites (list): Suites to run among 'cleaning', 'plots' and 'interactive'. Default is every suite.
+    - full_max_rows (int): See `bench_plots`. Default is 100,000.
+    - grouping_variables (list): See `bench_interactive`. Default is `GROUPING_VARIABLES`.
+    - max_vars (int): See `bench_interactive`. Default is None.
+    - repeat (int): Number of runs of the cleaning and plotting steps. Default is 1.
+    - seed (int): Seed of the synthetic manifests. Default is 0.
+
+    Returns:
+    dict: The results, as written to `out_path`.
+    """
+    warnings.filterwarnings('ignore')
+    report = {
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'results': {},
+    }
+    for size in sizes:
+        n_rows = SIZES[size]
+        results = report['results'][size] = {'rows': n_rows}
+        with tempfile.TemporaryDirectory() as tmp:
+            raw_path = os.path.join(tmp, 'titanic.csv')
+            _, results['generate'] = timed(lambda: synthetic_manifest(n_rows, seed=seed).to_csv(raw_path, index=False))
+            cleaning_results, df = bench_cleaning(raw_path, repeat)
+        # The plots and the app use the typed dataset, as loaded from its columnar file
+        df = table_to_pandas(to_arrow(df))
+        if 'cleaning' in suites:
+            results['cleaning'] = cleaning_results
+            if n_rows == SIZES['1M'] and cleaning_results['clean_titanic'] > CLEAN_1M_MAX_SECONDS:
+                print(f"{size}: clean_titanic took {cleaning_results['clean_titanic']:.2f} s, over the target of {CLEAN_1M_MAX_SECONDS} s",
+                      file=sys.stderr)
+        if 'plots' in suites:
+            results['plots'] = bench_plots(df, full_max_rows, repeat)
+        if 'interactive' in suites:
+            results['interactive'] = bench_interactive(df, grouping_variables, max_vars)
+        print(f'{size}: done', file=sys.stderr)
+
+    with open(out_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmarks the cleaning, the plotters and the app on synthetic manifests.')
+    parser.add_argument('--sizes', nargs='+', default=['10k', '1M'], choices=list(SIZES), help='Sizes of the manifests.')
+    parser.add_argument('--out', default='benchmark_results.json', help='Path of the JSON file with the results.')
+    parser.add_argument('--suites', nargs='+', default=['cleaning', 'plots', 'interactive'], choices=['cleaning', 'plots', 'interactive'])
+    parser.add_argument('--full-max-rows', type=int, default=100_000, help='Skip the plotters that draw every row above this size.')
+    parser.add_argument('--grouping-variables', nargs='+', default=GROUPING_VARIABLES, help='Grouping variables of the app combinations.')
+    parser.add_argument('--max-vars', type=int, default=None, help='Maximum number of grouping variables of the app combinations.')
+    parser.add_argument('--repeat', type=int, default=1, help='Runs of every cleaning and plotting step, the best one is kept.')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the synthetic manifests.')
+    args = parser.parse_args()
+    run(args.sizes, args.out, args.suites, args.full_max_rows, args.grouping_variables, args.max_vars, args.repeat, args.seed)
@@ -0,0 +1,143 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+
+# Number of passengers travelling together (1 = alone) and their frequency, close to the real manifest
+FAMILY_SIZES = [1, 2, 3, 4, 5, 6, 7, 8, 11]
+FAMILY_WEIGHTS = [0.60, 0.18, 0.10, 0.04, 0.02, 0.025, 0.015, 0.01, 0.01]
+
+CLASS_WEIGHTS = [0.24, 0.21, 0.55]
+# Probability of survival of every class, for women and men
+SURVIVAL = {'female': [0.97, 0.92, 0.50], 'male': [0.37, 0.16, 0.14]}
+FARE_MEDIANS = [60.0, 15.0, 8.0]
+CABIN_RATES = [0.80, 0.08, 0.03]
+CLASS_DECKS = [['A', 'B', 'C', 'D', 'E'], ['D', 'E', 'F'], ['E', 'F', 'G']]
+PORTS = ['S', 'C', 'Q']
+PORT_WEIGHTS = [0.72, 0.19, 0.09]
+TICKET_PREFIXES = ['', '', '', 'PC ', 'A/5 ', 'STON/O2. ', 'C.A. ', 'SOTON/O.Q. ', 'W./C. ', 'CA ']
+
+SYLLABLES = ['an', 'ber', 'ca', 'dor', 'el', 'fen', 'gar', 'hol', 'is', 'jan', 'kel', 'lan', 'mor', 'nor', 'ol',
+             'pet', 'quin', 'ros', 'sen', 'tor', 'ul', 'van', 'wil', 'son', 'berg', 'ley', 'man', 'ton']
+
+
+def make_words(n, rng, min_syllables=2, max_syllables=3):
+    """
+    Builds `n` capitalized made-up words from random syllables.
+
+    Parameters:
+    - n (int): Number of words.
+    - rng (numpy.random.Generator): Random generator.
+    - min_syllables (int): Minimum number of syllables of a word. Default is 2.
+    - max_syllables (int): Maximum number of syllables of a word. Default is 3.
+
+    Returns:
+    pyarrow.Array: The words.
+    """
+    syllables = pa.array(SYLLABLES)
+    n_syllables = rng.integers(min_syllables, max_syllables + 1, n)
+    words = pa.array([''] * n)
+    for k in range(max_syllables):
+        part = syllables.take(pa.array(rng.integers(0, len(SYLLABLES), n)))
+        part = pc.if_else(pa.array(n_syllables > k), part, '')
+        words = pc.binary_join_element_wise(words, part, '')
+    return pc.utf8_capitalize(words)
+
+
+def synthetic_manifest(n_rows, seed=0):
+    """
+    Generates a raw manifest with the schema of `data/titanic.csv` and realistic cardinalities.
+
+    Passengers travel alone or in families that share a surname, a ticket, a class, a port and a cabin, and
+    whose `SibSp` + `Parch` equals the size of the family minus one, so `cleaning.family_ids` finds them.
+    Unrelated families share surnames (there are about a third as many surnames as families), every family
+    or lone passenger has its own ticket, and the survival, fare and deck depend on the class and the sex.
+    About 20% of the ages, 77% of the cabins and 0.2% of the ports are missing, like in the real manifest.
+
+    Parameters:
+    - n_rows (int): Number of passengers.
+    - seed (int): Seed of the random generator. Default is 0.
+
+    Returns:
+    pandas.DataFrame: The raw manifest.
+    """
+    rng = np.random.default_rng(seed)
+
+    # Families (a lone passenger is a family of one)
+    sizes = rng.choice(FAMILY_SIZES, size=n_rows, p=FAMILY_WEIGHTS)
+    n_families = int(np.searchsorted(np.cumsum(sizes), n_rows) + 1)
+    sizes = sizes[:n_families]
+    family = np.repeat(np.arange(n_families), sizes)[:n_rows]
+    size = sizes[family]
+
+    # Attributes shared by the family
+    family_class = rng.choice([1, 2, 3], size=n_families, p=CLASS_WEIGHTS)
+    pclass = family_class[family]
+    n_surnames = max(n_families // 3, 50)
+    surnames = make_words(n_surnames, rng)
+    surname = surnames.take(pa.array(rng.integers(0, n_surnames, n_families)[family]))
+    prefixes = pa.array(TICKET_PREFIXES).take(pa.array(rng.integers(0, len(TICKET_PREFIXES), n_families)[family]))
+    ticket = pc.binary_join_element_wise(prefixes, pc.cast(pa.array(100_000 + family), pa.string()), '')
+    embarked = rng.choice(PORTS, size=n_families, p=PORT_WEIGHTS)[family].astype(object)
+    embarked[rng.random(n_rows) < 0.002] = None
+
+    has_cabin = (rng.random(n_families) < np.array(CABIN_RATES)[family_class - 1])[family]
+    deck_choice = rng.random(n_families)[family]
+    deck = np.empty(n_rows, dtype=object)
+    for k, class_decks in enumerate(CLASS_DECKS):
+        rows = pclass == k + 1
+        deck[rows] = np.array(class_decks, dtype=object)[(deck_choice[rows] * len(class_decks)).astype(int)]
+    cabin_number = rng.integers(1, 150, n_families)[family]
+    cabin = pd.Series(deck + cabin_number.astype(str).astype(object)).where(has_cabin)
+
+    # Relatives aboard: SibSp + Parch = size - 1
+    parch = (rng.random(n_rows) * size).astype(int)
+    sibsp = size - 1 - parch
+
+    # Attributes of every passenger
+    sex = np.where(rng.random(n_rows) < 0.35, 'female', 'male').astype(object)
+    age = np.clip(rng.normal(30, 14, n_rows), 0.42, 80).round()
+    age = np.where(age < 1, 0.42, age)
+    children = (parch > 0) & (rng.random(n_rows) < 0.4)
+    age[children] = rng.integers(1, 15, children.sum())
+    age[rng.random(n_rows) < 0.2] = np.nan
+
+    female = sex == 'female'
+    title = np.where(female, np.where(age < 25, 'Miss', 'Mrs'), np.where(age < 13, 'Master', 'Mr')).astype(object)
+    rare = rng.random(n_rows) < 0.02
+    title[rare] = rng.choice(['Dr', 'Rev', 'Col', 'Major'], size=rare.sum())
+    first = make_words(256, rng, 2, 2).take(pa.array(rng.integers(0, 256, n_rows)))
+    name = pc.binary_join_element_wise(surname, ', ', pa.array(title, type=pa.string()), '. ', first, '')
+
+    p_survival = np.where(female, np.array(SURVIVAL['female'])[pclass - 1], np.array(SURVIVAL['male'])[pclass - 1])
+    survived = (rng.random(n_rows) < p_survival).astype(int)
+
+    fare = np.array(FARE_MEDIANS)[pclass - 1] * np.sqrt(size) * rng.lognormal(0, 0.5, n_families)[family]
+    fare[rng.random(n_rows) < 0.002] = 0.0
+
+    return pd.DataFrame({
+        'PassengerId': np.arange(1, n_rows + 1),
+        'Survived': survived,
+        'Pclass': pclass,
+        'Name': name.to_numpy(zero_copy_only=False),
+        'Sex': sex,
+        'Age': age,
+        'SibSp': sibsp,
+        'Parch': parch,
+        'Ticket': ticket.to_numpy(zero_copy_only=False),
+        'Fare': fare.round(4),
+        'Cabin': cabin,
+        'Embarked': embarked,
+    })
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Writes a synthetic Titanic manifest to a CSV file.')
+    parser.add_argument('rows', type=int, help='Number of passengers.')
+    parser.add_argument('path', help='Path of the CSV file.')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the random generator.')
+    args = parser.parse_args()
+    synthetic_manifest(args.rows, seed=args.seed).to_csv(args.path, index=False)
@@ -0,0 +1,237 @@
+import numpy as np
+import pandas as pd
+
+
+# Number of bits set in every byte
+POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+# A value with fewer rows than 1 / DENSE_RATIO of the dataset keeps its sorted row positions (4 bytes per row)
+# instead of a bitmap (1 bit per row of the dataset), like the array containers of roaring bitmaps
+DENSE_RATIO = 32
+
+
+def popcount(bits):
+    """Returns the number of bits set in a packed bitmap."""
+    return int(POPCOUNT[bits].sum(dtype=np.int64))
+
+
+def smallest_int(n):
+    """Returns the smallest signed integer dtype that holds the values 0 to `n`."""
+    for dtype in (np.int8, np.int16, np.int32):
+        if n <= np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+
+class Selection:
+    """
+    A set of rows of an indexed dataset, stored as a packed bitmap (dense sets) or as sorted row positions (sparse sets).
+
+    Selections are combined with `&` (and), `|` (or) and `~` (not), counted with `len` without building the rows,
+    and passed to the plotters of `functions.py` in place of the filtered dataframe.
+
+    Parameters:
+    - index (BitmapIndex): The index of the dataset.
+    - bits (numpy.ndarray): The packed bitmap of the rows (see `numpy.packbits`), or None.
+    - rows (numpy.ndarray): The sorted positions of the rows, or None. Exactly one of `bits` and `rows` is given.
+    """
+
+    def __init__(self, index, bits=None, rows=None):
+        self.index = index
+        self.bits = bits
+        self._rows = rows
+
+    def __repr__(self):
+        return f'Selection({len(self)} of {self.index.n_rows} rows)'
+
+    def __len__(self):
+        return self.count()
+
+    def count(self):
+        """Returns the number of rows selected, without building them."""
+        return len(self._rows) if self._rows is not None else popcount(self.bits)
+
+    def to_bits(self):
+        """Returns the selection as a packed bitmap."""
+        if self.bits is None:
+            mask = np.zeros(self.index.n_rows, dtype=bool)
+            mask[self._rows] = True
+            self.bits = np.packbits(mask)
+        return self.bits
+
+    def contains(self, rows):
+        """Returns whether every position of `rows` is selected."""
+        if self._rows is not None:
+            return np.isin(rows, self._rows, assume_unique=True)
+        return ((self.bits[rows >> 3] >> (7 - (rows & 7))) & 1).astype(bool)
+
+    def rows(self):
+        """Returns the sorted positions of the rows selected (a view of the index for a single sparse value)."""
+        if self._rows is None:
+            self._rows = np.flatnonzero(np.unpackbits(self.bits, count=self.index.n_rows))
+        return self._rows
+
+    def mask(self):
+        """Returns the selection as a boolean mask over the rows of the dataset."""
+        if self.bits is not None:
+            return np.unpackbits(self.bits, count=self.index.n_rows).view(bool)
+        mask = np.zeros(self.index.n_rows, dtype=bool)
+        mask[self._rows] = True
+        return mask
+
+    def __and__(self, other):
+        if self._rows is not None and other._rows is not None:
+            return Selection(self.index, rows=np.intersect1d(self._rows, other._rows, assume_unique=True))
+        if self._rows is not None or other._rows is not None:
+            sparse, dense = (self, other) if self._rows is not None else (other, self)
+            rows = sparse._rows
+            return Selection(self.index, rows=rows[dense.contains(rows)])
+        return Selection(self.index, bits=self.bits & other.bits)
+
+    def __or__(self, other):
+        if self._rows is not None and other._rows is not None:
+            return Selection(self.index, rows=np.union1d(self._rows, other._rows))
+        return Selection(self.index, bits=self.to_bits() | other.to_bits())
+
+    def __invert__(self):
+        bits = ~self.to_bits()
+        # The padding bits of the last byte stay unset
+        padding = -self.index.n_rows % 8
+        if padding:
+            bits[-1] &= (0xFF << padding) & 0xFF
+        return Selection(self.index, bits=bits)
+
+    def value_counts(self, column):
+        """
+        Counts the rows selected of every value of an indexed column, without building the rows of dense selections.
+
+        Parameters:
+        - column (str): The indexed column.
+
+        Returns:
+        pandas.Series: The number of rows of every value, in the order of the values of the index.
+        """
+        values = self.index.values[column]
+        if self._rows is not None:
+            codes = self.index.codes[column][self._rows]
+            counts = np.bincount(codes[codes >= 0], minlength=len(values))
+        else:
+            counts = [(Selection(self.index, **container) & self).count() for container in self.index.containers[column]]
+        return pd.Series(counts, index=pd.Index(values, name=column), name='count')
+
+    def to_frame(self, columns=None):
+        """
+        Returns the rows selected of the dataset.
+
+        Parameters:
+        - columns (list): The columns returned. Default is None (every column).
+
+        Returns:
+        pandas.DataFrame: The rows selected.
+        """
+        df = self.index.df if columns is None else self.index.df[list(columns)]
+        return df.take(self.rows())
+
+
+class BitmapIndex:
+    """
+    Bitmap index over the categorical columns of a dataset, to select subgroups without scanning the rows.
+
+    Every value of an indexed column is stored as a packed bitmap of its rows when it is frequent, or as the
+    sorted positions of its rows when it is rare (fewer than 1 / `DENSE_RATIO` of the rows, like most families),
+    so the index takes at most a few bytes per row and column. Conditions on several columns are combined
+    with bitwise operations on the bitmaps.
+
+    Parameters:
+    - df (pandas.DataFrame): The dataset. It is kept by reference, so it must not be modified afterwards.
+    - columns (list): The columns indexed. Default is None (the categorical and boolean columns).
+    """
+
+    def __init__(self, df, columns=None):
+        if columns is None:
+            columns = [col for col in df.columns if isinstance(df[col].dtype, pd.CategoricalDtype) or df[col].dtype == bool]
+        self.df = df
+        self.n_rows = len(df)
+        self.columns = list(columns)
+        self.values = {}
+        self.codes = {}
+        self.containers = {}
+        self._positions = {}
+        for column in self.columns:
+            self._add(column)
+
+    def _add(self, column):
+        """Builds the bitmaps or the row positions of every value of `column`."""
+        codes, uniques = pd.factorize(self.df[column], sort=True)
+        codes = codes.astype(smallest_int(len(uniques)))
+        counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+
+        # Positions of the rows grouped by value, in order inside every value
+        order = np.argsort(codes, kind='stable').astype(smallest_int(self.n_rows))
+        offsets = np.concatenate(([0], np.cumsum(counts))) + (codes < 0).sum()
+
+        containers = []
+        for k, count in enumerate(counts):
+            if count * DENSE_RATIO >= self.n_rows:
+                containers.append({'bits': np.packbits(codes == k)})
+            else:
+                containers.append({'rows': order[offsets[k]:offsets[k + 1]]})
+
+        # The index is shared like the dataset, its arrays are read-only
+        for array in [codes, order] + [container['bits'] for container in containers if 'bits' in container]:
+            array.flags.writeable = False
+
+        self.values[column] = list(uniques)
+        self.codes[column] = codes
+        self.containers[column] = containers
+        self._positions[column] = {value: k for k, value in enumerate(self.values[column])}
+
+    def __contains__(self, column):
+        return column in self.containers
+
+    @property
+    def nbytes(self):
+        """Memory used by the bitmaps, the row positions and the codes, in bytes."""
+        total = sum(codes.nbytes for codes in self.codes.values())
+        for containers in self.containers.values():
+            total += sum(next(iter(container.values())).nbytes for container in containers)
+        return total
+
+    def all(self):
+        """Returns the selection of every row."""
+        return ~Selection(self, rows=np.array([], dtype=np.int64))
+
+    def none(self):
+        """Returns the empty selection."""
+        return Selection(self, rows=np.array([], dtype=np.int64))
+
+    def eq(self, column, value):
+        """Returns the selection of the rows where `column` equals `value` (empty if the value does not appear)."""
+        k = self._positions[column].get(value)
+        return self.none() if k is None else Selection(self, **self.containers[column][k])
+
+    def isin(self, column, values):
+        """Returns the selection of the rows where `column` takes any of `values`."""
+        selection = self.none()
+        for value in values:
+            selection = selection | self.eq(column, value)
+        return selection
+
+    def select(self, conditions):
+        """
+        Selects the rows that meet every condition, like `functions.create_group`.
+
+        Parameters:
+        - conditions (list of tuples): Conditions (column, value) on indexed columns. A list, tuple or set of values
+          selects any of them. Default is every row when the list is empty.
+
+        Returns:
+        Selection: The rows selected.
+        """
+        selection = None
+        for column, value in conditions:
+            if column not in self:
+                raise KeyError(f'{column!r} is not indexed')
+            condition = self.isin(column, value) if isinstance(value, (list, tuple, set)) else self.eq(column, value)
+            selection = condition if selection is None else selection & condition
+        return self.all() if selection is None else selection
@@ -0,0 +1,549 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from grouping import first_rows
+
+
+RAW_CSV = os.path.join('data', 'titanic.csv')
+
+AGE_BINS = [0, 12, 18, 30, 45, 60, 120]
+AGE_LABELS = ['(0-12)', '(13-18)', '(19-30)', '(31-45)', '(46-60)', '(60+)']
+AGE_LABELS_PLOT = ['Infants (0-12)', 'Teens (13-18)', 'Young Adults (19-30)', 'Adults (31-45)',
+                   'Middle Age (46-60)', 'Elderly (60+)']
+
+# Seaborn's titanic dataset only knows the decks A to G
+DECKS = ['A', 'B', 'C', 'D', 'E', 'F', 'G']
+
+FAMILY_KEYS = ['Surname', 'Ticket']
+
+# Types of the text columns of the raw manifest, so every chunk is read the same way. They are kept in Arrow
+# memory, so the string operations of the cleaning run in Arrow without converting them to Python strings
+RAW_DTYPES = {'Name': 'string[pyarrow]', 'Sex': 'string[pyarrow]', 'Ticket': 'string[pyarrow]',
+              'Cabin': 'string[pyarrow]', 'Embarked': 'string[pyarrow]'}
+
+# Categorical columns whose categories are collected while streaming
+STREAM_CATEGORIES = ['Sex', 'Embarked', 'deck', 'Title']
+
+
+def load_raw(path=RAW_CSV):
+    """
+    Reads the raw Titanic manifest.
+
+    Parameters:
+    - path (str): Path of the raw CSV. Default is `RAW_CSV`.
+
+    Returns:
+    pandas.DataFrame: The raw dataset.
+    """
+    return pd.read_csv(path, dtype=RAW_DTYPES, engine='pyarrow')
+
+
+def text_array(column):
+    """
+    Returns a text column as an Arrow string array, without copying the columns already stored in Arrow.
+
+    Parameters:
+    - column (pandas.Series): The text column, of object or `string[pyarrow]` dtype.
+
+    Returns:
+    pyarrow.Array: The strings, with nulls for the missing values.
+    """
+    array = pa.array(column, type=pa.string(), from_pandas=True)
+    return array.combine_chunks() if isinstance(array, pa.ChunkedArray) else array
+
+
+def add_alone_deck(df):
+    """
+    Adds the `alone` and `deck` columns of seaborn's titanic dataset when they are missing.
+
+    They are derived from the raw columns the same way seaborn does: a passenger is alone without siblings,
+    spouses, parents or children aboard, and the deck is the first letter of the cabin (only A to G).
+
+    Parameters:
+    - df (pandas.DataFrame): The raw dataset.
+
+    Returns:
+    pandas.DataFrame: The dataset with the `alone` and `deck` columns.
+    """
+    if 'alone' not in df:
+        df['alone'] = (df['SibSp'] + df['Parch']) == 0
+    if 'deck' not in df:
+        deck = pc.utf8_slice_codeunits(text_array(df['Cabin']), 0, 1)
+        deck = pc.if_else(pc.is_in(deck, pa.array(DECKS)), deck, pa.scalar(None, pa.string()))
+        df['deck'] = pd.Series(pd.arrays.ArrowStringArray(deck), index=df.index)
+    return df
+
+
+def impute_age(df):
+    """
+    Fills the missing ages with the median age of the passengers of the same class and sex.
+
+    Parameters:
+    - df (pandas.DataFrame): The dataset.
+
+    Returns:
+    pandas.Series: The imputed `Age` column.
+    """
+    age_medians = df.groupby(['Pclass', 'Sex'])['Age'].transform('median')
+    return df['Age'].fillna(age_medians)
+
+
+def extract_names(name):
+    """
+    Extracts the surname and the title of every passenger from the `Name` column.
+
+    The surname is the text before the first comma, and the title the text after it up to the first period.
+    The regular expression runs vectorized over the Arrow representation of the column, and the results stay
+    in Arrow memory (`string[pyarrow]` dtype) instead of being converted to Python strings.
+
+    Parameters:
+    - name (pandas.Series): The `Name` column.
+
+    Returns:
+    pandas.DataFrame: The `Surname` and `Title` columns.
+    """
+    parts = pc.extract_regex(text_array(name), r'^(?P<Surname>[^,]*),(?P<Title>[^,.]*)')
+    return pd.DataFrame({
+        'Surname': pd.arrays.ArrowStringArray(pc.utf8_trim_whitespace(pc.struct_field(parts, 'Surname'))),
+        'Title': pd.arrays.ArrowStringArray(pc.utf8_trim_whitespace(pc.struct_field(parts, 'Title'))),
+    }, index=name.index)
+
+
+def verify_families(size, max_n_fam):
+    """
+    Checks which groups of passengers with the same surname and ticket are families.
+
+    A family has more than one member, and its size equals the number of relatives aboard (`n_fam`)
+    of its members plus one.
+
+    Parameters:
+    - size (numpy.ndarray): Number of passengers of every group.
+    - max_n_fam (numpy.ndarray): Maximum `n_fam` of every group.
+
+    Returns:
+    numpy.ndarray: Whether each group is a verified family.
+    """
+    return (size > 1) & (size == max_n_fam + 1)
+
+
+def family_ids(df):
+    """
+    Identifies the families aboard and assigns them an ID.
+
+    The passengers are grouped by surname and ticket with the dictionary encoding of their Arrow representation,
+    so no Python string is hashed or compared, and the size and maximum `n_fam` of every group are computed
+    in a single pass over the integer codes. The verified families (see `verify_families`) are numbered in
+    order of (surname, ticket); passengers without a family get -1, like those with a missing surname or
+    ticket, which the grouping of the notebook leaves out.
+
+    Parameters:
+    - df (pandas.DataFrame): The dataset with the `Surname`, `Ticket` and `n_fam` columns.
+
+    Returns:
+    pandas.Series: The `FamilyID` column.
+    """
+    key = np.zeros(len(df), dtype=np.int64)
+    has_key = np.ones(len(df), dtype=bool)
+    dictionaries, indices = [], []
+    for col in FAMILY_KEYS:
+        encoded = pc.dictionary_encode(text_array(df[col]))
+        codes = pc.fill_null(encoded.indices, 0).to_numpy().astype(np.int64)
+        has_key &= encoded.is_valid().to_numpy(zero_copy_only=False)
+        key = key * len(encoded.dictionary) + codes
+        dictionaries.append(encoded.dictionary)
+        indices.append(codes)
+
+    rows = np.flatnonzero(has_key)
+    codes, uniques = pd.factorize(key[rows])
+    size = np.bincount(codes, minlength=len(uniques))
+    max_n_fam = np.full(len(uniques), np.iinfo(np.int64).min)
+    np.maximum.at(max_n_fam, codes, df['n_fam'].to_numpy(dtype=np.int64)[rows])
+    verified = np.flatnonzero(verify_families(size, max_n_fam))
+
+    # Only the verified families are sorted to number them, by the strings of their first member
+    first = rows[first_rows(codes)[verified]]
+    families = pa.table({col: dictionary.take(pa.array(codes_col[first]))
+                         for col, dictionary, codes_col in zip(FAMILY_KEYS, dictionaries, indices)})
+    order = pc.sort_indices(families, sort_keys=[(col, 'ascending') for col in FAMILY_KEYS])
+    group_ids = np.full(len(uniques), -1, dtype=np.int64)
+    group_ids[verified[order.to_numpy()]] = np.arange(len(verified))
+    family_id = np.full(len(df), -1, dtype=np.int64)
+    family_id[rows] = group_ids[codes]
+    return pd.Series(family_id, index=df.index, name='FamilyID')
+
+
+def family_survival_rate(df):
+    """
+    Computes the survival rate of the family of every passenger, -1 for passengers without a family.
+
+    As in the original analysis, the rate is truncated to an integer, so it is 1 only when every member survived.
+
+    Parameters:
+    - df (pandas.DataFrame): The dataset with the `FamilyID` and numeric `Survived` columns.
+
+    Returns:
+    pandas.Series: The `Family_Survival_Rate` column.
+    """
+    family_id = df['FamilyID'].to_numpy()
+    members = np.flatnonzero(family_id >= 0)
+    size = np.bincount(family_id[members])
+    survived = np.bincount(family_id[members], weights=df['Survived'].to_numpy()[members], minlength=len(size))
+    rate = np.full(len(df), -1, dtype=int)
+    rate[members] = (survived / np.maximum(size, 1))[family_id[members]].astype(int)
+    return pd.Series(rate, index=df.index, name='Family_Survival_Rate')
+
+
+def plot_labels(df):
+    """
+    Replaces the codes of `Survived`, `Pclass` and `Group_Age` with readable labels for the visualizations.
+
+    Parameters:
+    - df (pandas.DataFrame): The cleaned dataset.
+
+    Returns:
+    pandas.DataFrame: The dataset with readable labels.
+    """
+    df['Survived'] = df['Survived'].map({0: 'No', 1: 'Yes'})
+    df['Pclass'] = df['Pclass'].map({1: 'First', 2: 'Second', 3: 'Third'})
+    df['Group_Age'] = pd.cut(df['Age'], bins=AGE_BINS, labels=AGE_LABELS_PLOT, right=True)
+    return df
+
+
+def clean_titanic(df, labels=True, stats=None):
+    """
+    Cleans the raw Titanic manifest and engineers the features used in the analysis.
+
+    This is the pipeline of the notebook, written with vectorized operations: the ages are imputed with
+    a grouped transform, and the string work (decks, surnames, titles and family keys) runs on Arrow arrays:
+    the families are dictionary encoded and verified with a single bincount pass. The text columns of the
+    result are `string[pyarrow]`. With `labels=True` the result is the dataset used by the
+    app (`data/titanic_clean.csv`); with `labels=False` `Survived` and `Pclass` keep their numeric codes
+    and `Group_Age` the short labels used in the notebook.
+
+    When `stats` is given, `df` is only a part of the manifest: the imputation medians, the `Embarked` mode
+    and the families are taken from the statistics of the whole manifest instead of from `df`.
+
+    Parameters:
+    - df (pandas.DataFrame): The raw dataset. `alone` and `deck` are derived when missing.
+    - labels (bool): Whether to use readable labels for `Survived`, `Pclass` and `Group_Age`. Default is True.
+    - stats (CleaningStats): Statistics of the whole manifest, with its families indexed. Default is None.
+
+    Returns:
+    pandas.DataFrame: The cleaned dataset.
+    """
+    df = add_alone_deck(df.copy())
+
+    # Missing values
+    if stats is None:
+        df['Age'] = impute_age(df)
+        embarked_mode = df['Embarked'].mode()[0]
+    else:
+        df['Age'] = df['Age'].fillna(stats.age_fill(df))
+        embarked_mode = stats.embarked_mode()
+    df['Cabin'] = df['Cabin'].fillna('UNK')
+    has_deck = df['deck'].notna()
+    df['deck'] = df['deck'].astype('string[pyarrow]').fillna('UNK')
+    df['Embarked'] = df['Embarked'].fillna(embarked_mode)
+
+    # New features
+    df['Group_Age'] = pd.cut(df['Age'], bins=AGE_BINS, labels=AGE_LABELS, right=True)
+    df['has_deck'] = has_deck.astype(int)
+    names = extract_names(df['Name'])
+    df['Surname'] = names['Surname']
+    df['Title'] = names['Title']
+    df['n_fam'] = df['SibSp'] + df['Parch']
+
+    # Families
+    if stats is None:
+        df['FamilyID'] = family_ids(df)
+        df['Family_Survival_Rate'] = family_survival_rate(df)
+    else:
+        df['FamilyID'], df['Family_Survival_Rate'] = stats.family_columns(df)
+
+    if labels:
+        df = plot_labels(df)
+    return df
+
+
+def family_hash(df):
+    """
+    Hashes the (surname, ticket) key of every passenger to a 64-bit integer.
+
+    Parameters:
+    - df (pandas.DataFrame): The dataset with the `Surname` and `Ticket` columns.
+
+    Returns:
+    numpy.ndarray: The uint64 hash of every row.
+    """
+    return pd.util.hash_pandas_object(df[FAMILY_KEYS], index=False).to_numpy()
+
+
+def merge_counts(counts, new):
+    """
+    Adds two count series, aligning them on their index.
+
+    Parameters:
+    - counts (pandas.Series): The counts so far, or None.
+    - new (pandas.Series): The new counts.
+
+    Returns:
+    pandas.Series: The sum of both.
+    """
+    if counts is None:
+        return new
+    return pd.concat([counts, new]).groupby(level=list(range(new.index.nlevels)), observed=True).sum()
+
+
+def merge_families(parts):
+    """
+    Adds up the aggregates of the (surname, ticket) groups of several parts of a manifest.
+
+    Parameters:
+    - parts (list): Dataframes with the 'size', 'max_n_fam' and 'survived' of every group, indexed by hash.
+
+    Returns:
+    pandas.DataFrame: The aggregates of every group.
+    """
+    return pd.concat(parts).groupby(level=0).agg({'size': 'sum', 'max_n_fam': 'max', 'survived': 'sum'})
+
+
+class CleaningStats:
+    """
+    Mergeable statistics of a raw manifest, needed to clean it one chunk at a time.
+
+    The statistics that the cleaning takes from the whole manifest are kept as aggregates that can be updated
+    with new chunks and merged between readers:
+    - the number of passengers of every (Pclass, Sex, Age), from which the exact median ages are computed,
+    - the number of passengers of every port of embarkation, for the `Embarked` mode,
+    - the size, maximum `n_fam` and number of survivors of every (surname, ticket) group, keyed by a hash,
+    - the categories of the categorical columns, so every chunk is encoded the same way.
+
+    Their size depends on the number of distinct values and groups, not on the number of rows.
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.age_counts = None
+        self.embarked_counts = None
+        self.families = None
+        self.categories = {col: set() for col in STREAM_CATEGORIES}
+        self.family_table = None
+        self._pending = []
+
+    def update(self, chunk):
+        """Adds a chunk of the raw manifest to the statistics and returns them."""
+        chunk = add_alone_deck(chunk.copy())
+        self.age_counts = merge_counts(self.age_counts, chunk.groupby(['Pclass', 'Sex'])['Age'].value_counts())
+        self.embarked_counts = merge_counts(self.embarked_counts, chunk['Embarked'].value_counts())
+
+        names = extract_names(chunk['Name'])
+        keys = pd.DataFrame({'Surname': names['Surname'], 'Ticket': chunk['Ticket']})
+        # Passengers with a missing surname or ticket are in no group, as in `family_ids`
+        has_key = keys.notna().all(axis=1).to_numpy()
+        groups = pd.DataFrame({'n_fam': chunk['SibSp'] + chunk['Parch'], 'Survived': chunk['Survived']})[has_key]
+        groups = groups.groupby(family_hash(keys[has_key]))
+        self.rows += len(chunk)
+        self._pending.append(pd.DataFrame({
+            'size': groups.size(),
+            'max_n_fam': groups['n_fam'].max(),
+            'survived': groups['Survived'].sum(),
+        }))
+        self._settle()
+
+        self.categories['Sex'].update(chunk['Sex'].dropna().unique())
+        self.categories['Embarked'].update(chunk['Embarked'].dropna().unique())
+        self.categories['deck'].update(chunk['deck'].astype(object).fillna('UNK').unique())
+        self.categories['Title'].update(names['Title'].dropna().unique())
+        self.family_table = None
+        return self
+
+    def merge(self, other):
+        """Adds the statistics of another part of the manifest to these ones and returns them."""
+        other._compact()
+        self.rows += other.rows
+        self.age_counts = merge_counts(self.age_counts, other.age_counts)
+        self.embarked_counts = merge_counts(self.embarked_counts, other.embarked_counts)
+        if other.families is not None:
+            self._pending.append(other.families)
+        self._compact()
+        for col in STREAM_CATEGORIES:
+            self.categories[col].update(other.categories[col])
+        self.family_table = None
+        return self
+
+    def _compact(self):
+        """Merges the pending family aggregates into the family table."""
+        if not self._pending:
+            return
+        parts = self._pending if self.families is None else [self.families] + self._pending
+        self.families = merge_families(parts)
+        self._pending = []
+
+    def _settle(self):
+        """
+        Merges the newest pending family aggregates while they are at least half the size of the part below.
+
+        The parts are log-structured: their sizes decrease geometrically, so there are O(log n) of them and every
+        group is merged O(log n) times, whatever the size of the chunks.
+        """
+        while self._pending:
+            below = self._pending[-2] if len(self._pending) > 1 else self.families
+            if below is not None and 2 * len(self._pending[-1]) < len(below):
+                break
+            if len(self._pending) > 1:
+                self._pending[-2:] = [merge_families(self._pending[-2:])]
+            else:
+                self._compact()
+
+    def n_rows(self):
+        """Returns the number of passengers added to the statistics."""
+        return self.rows
+
+    def family_stats(self, hashes):
+        """
+        Returns the size, maximum `n_fam` and number of survivors of some (surname, ticket) groups.
+
+        Only the given groups are looked up in every part of the family aggregates, so the cost depends on the
+        number of hashes and not on the number of groups.
+
+        Parameters:
+        - hashes (numpy.ndarray): The hashes of the groups (see `family_hash`).
+
+        Returns:
+        pandas.DataFrame: The aggregates of every hash, indexed by hash (0 for groups without passengers).
+        """
+        parts = ([] if self.families is None else [self.families]) + self._pending
+        found = [part.reindex(hashes).dropna() for part in parts]
+        stats = merge_families(found) if found else pd.DataFrame(columns=['size', 'max_n_fam', 'survived'])
+        return stats.reindex(hashes, fill_value=0).astype(int)
+
+    def age_medians(self):
+        """Returns the exact median age of every (Pclass, Sex), computed from the age counts."""
+        medians = {}
+        for (pclass, sex), counts in self.age_counts.groupby(level=[0, 1]):
+            counts = counts.droplevel([0, 1]).sort_index()
+            cumulative = counts.cumsum().to_numpy()
+            total = cumulative[-1]
+            ages = counts.index.to_numpy()
+            low = ages[np.searchsorted(cumulative, (total - 1) // 2, side='right')]
+            high = ages[np.searchsorted(cumulative, total // 2, side='right')]
+            medians[(pclass, sex)] = (low + high) / 2
+        return pd.Series(medians, dtype=float)
+
+    def age_fill(self, df):
+        """Returns the median age of the class and sex of every passenger of `df`."""
+        keys = pd.MultiIndex.from_arrays([df['Pclass'], df['Sex']])
+        return pd.Series(self.age_medians().reindex(keys).to_numpy(), index=df.index)
+
+    def embarked_mode(self):
+        """Returns the most common port of embarkation (the first one in order on ties, like `Series.mode`)."""
+        counts = self.embarked_counts.sort_index()
+        return counts.idxmax()
+
+    def verified_families(self):
+        """Returns the hashes of the (surname, ticket) groups that are verified families."""
+        self._compact()
+        verified = verify_families(self.families['size'].to_numpy(), self.families['max_n_fam'].to_numpy())
+        return self.families.index[verified]
+
+    def index_families(self, chunks):
+        """
+        Numbers the verified families in order of (surname, ticket), reading the manifest once more.
+
+        Only the surname and ticket of the verified families are kept, so the memory used depends on the
+        number of families.
+
+        Parameters:
+        - chunks (iterable): The chunks of the raw manifest.
+
+        Returns:
+        CleaningStats: These statistics.
+        """
+        verified = self.verified_families()
+        parts = []
+        for chunk in chunks:
+            keys = pd.DataFrame({'Surname': extract_names(chunk['Name'])['Surname'], 'Ticket': chunk['Ticket']})
+            hashes = family_hash(keys)
+            found = np.isin(hashes, verified)
+            parts.append(keys[found].set_axis(hashes[found]))
+        keys = pd.concat(parts)
+        keys = keys[~keys.index.duplicated()].sort_values(FAMILY_KEYS)
+
+        families = self.families.loc[keys.index]
+        self.family_table = pd.DataFrame({
+            'FamilyID': np.arange(len(keys)),
+            'Family_Survival_Rate': (families['survived'] / families['size']).astype(int).to_numpy(),
+        }, index=keys.index)
+        return self
+
+    def family_columns(self, df):
+        """Returns the `FamilyID` and `Family_Survival_Rate` columns of the passengers of `df`."""
+        if self.family_table is None:
+            raise ValueError('The families have not been indexed, call index_families first')
+        table = self.family_table.reindex(family_hash(df))
+        has_key = df[FAMILY_KEYS].notna().all(axis=1).to_numpy()
+        family_id = np.where(has_key, table['FamilyID'].fillna(-1).astype(int).to_numpy(), -1)
+        rate = np.where(has_key, table['Family_Survival_Rate'].fillna(-1).astype(int).to_numpy(), -1)
+        return pd.Series(family_id, index=df.index), pd.Series(rate, index=df.index)
+
+
+def iter_chunks(source, chunksize=100_000):
+    """
+    Iterates over the chunks of a raw manifest.
+
+    Parameters:
+    - source (str or callable): Path of the raw CSV, or a function returning a new iterator of dataframes.
+    - chunksize (int): Number of rows of every chunk read from a CSV. Default is 100,000.
+
+    Returns:
+    iterator: The chunks of the manifest.
+    """
+    if callable(source):
+        return iter(source())
+    return pd.read_csv(source, dtype=RAW_DTYPES, chunksize=chunksize)
+
+
+def clean_titanic_chunked(source, out_path, chunksize=100_000):
+    """
+    Cleans a manifest too large for memory, writing the result incrementally to a columnar file.
+
+    The manifest is read three times: the first pass builds the mergeable `CleaningStats`, the second one
+    numbers the verified families, and the third one cleans every chunk with those global statistics and
+    appends it to `out_path` (Parquet, or Arrow IPC for other extensions) with the schema of `loader.SCHEMA`.
+    The peak memory depends on the chunk size and on the size of the statistics, not on the number of rows,
+    and the output is identical to cleaning the whole manifest at once.
+
+    A CSV source is therefore parsed three times. The reads cannot be shared without keeping the keys of every
+    family, verified or not, in memory: when parsing dominates, convert the manifest to a columnar file first
+    and pass a `source` function that reads its batches.
+
+    Parameters:
+    - source (str or callable): Path of the raw CSV, or a function returning a new iterator of dataframes.
+    - out_path (str): Path of the columnar file to write.
+    - chunksize (int): Number of rows of every chunk read from a CSV. Default is 100,000.
+
+    Returns:
+    CleaningStats: The statistics of the manifest.
+    """
+    # Imported here so the cleaning does not depend on the columnar loader unless it is used
+    from loader import SCHEMA, open_writer, to_arrow
+
+    stats = CleaningStats()
+    for chunk in iter_chunks(source, chunksize):
+        stats.update(chunk)
+    stats.index_families(iter_chunks(source, chunksize))
+
+    categories = {col: sorted(map(str, values)) for col, values in stats.categories.items()}
+    with open_writer(out_path, SCHEMA) as writer:
+        for chunk in iter_chunks(source, chunksize):
+            writer.write_table(to_arrow(clean_titanic(chunk, stats=stats), categories=categories))
+    return stats
+
+
+if __name__ == '__main__':
+    df = clean_titanic(load_raw())
+    print(df.head())
@@ -0,0 +1,90 @@
+import numpy as np
+
+
+# Distance of the group labels below each cluster, depending on the row of the cluster
+LABEL_OFFSETS = np.array([1.3, 1.8, 2.5, 3, 3.5, 4])
+
+
+def order_groups(codes, n_groups=None):
+    """
+    Sorts the rows of a dataset by group, with the biggest groups first.
+
+    This function takes the integer group code of every row (as returned by `pd.factorize`) and computes,
+    in a single pass, the size of each group, the order in which the groups are displayed (descending size,
+    like `value_counts`) and a permutation of the rows that places the members of each group contiguously.
+
+    Parameters:
+    - codes (numpy.ndarray): Integer group code of every row, in the range [0, n_groups).
+    - n_groups (int): Number of groups. Default is `codes.max() + 1`.
+
+    Returns:
+    tuple: (group_order, counts, row_order, offsets) where `group_order` are the group codes in display order,
+    `counts` the size of each displayed group, `row_order` the row permutation and `offsets` the boundaries
+    of every group inside `row_order` (group i is `row_order[offsets[i]:offsets[i + 1]]`).
+    """
+    codes = np.asarray(codes)
+    if n_groups is None:
+        n_groups = int(codes.max()) + 1 if len(codes) else 0
+
+    sizes = np.bincount(codes, minlength=n_groups)
+    group_order = np.argsort(-sizes, kind='stable')
+
+    # Rank of every group in the display order, so sorting the rows by rank groups them in that order
+    rank = np.empty(n_groups, dtype=np.int64)
+    rank[group_order] = np.arange(n_groups)
+    row_order = np.argsort(rank[codes], kind='stable')
+
+    counts = sizes[group_order]
+    offsets = np.concatenate(([0], np.cumsum(counts)))
+    return group_order, counts, row_order, offsets
+
+
+def cluster_layout(counts, max_clusters_per_row=5, row_height=5, cluster_spacing_x=5, rng=None):
+    """
+    Computes the positions of the clusters, their labels and their points for all the groups at once.
+
+    The groups are placed in a grid of `max_clusters_per_row` columns. The points of every group are spread
+    around the center of their cluster at evenly spaced angles and random radii in [0, 1).
+    Everything is computed as NumPy arrays in one batch, so the cost is linear in the number of points.
+
+    Parameters:
+    - counts (numpy.ndarray): Number of points of each group, in display order.
+    - max_clusters_per_row (int): Number of clusters in every row of the grid. Default is 5.
+    - row_height (float): Vertical space between rows. Default is 5.
+    - cluster_spacing_x (float): Horizontal space between clusters. Default is 5.
+    - rng (numpy.random.Generator): Random generator for the radii. Default is a new unseeded generator.
+
+    Returns:
+    dict: Arrays `center_x`, `center_y`, `label_y` and `label_size` with one value per group,
+    and `x`, `y` with one value per point, ordered by group.
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+    counts = np.asarray(counts, dtype=np.int64)
+    n_groups = len(counts)
+
+    # Center of every cluster given its row and column in the grid
+    index = np.arange(n_groups)
+    row = index // max_clusters_per_row
+    col = index % max_clusters_per_row
+    center_x = col * cluster_spacing_x
+    center_y = -row * row_height
+
+    # The further the row, the bigger the offset of the label
+    pos = LABEL_OFFSETS[np.minimum(row, len(LABEL_OFFSETS) - 1)]
+
+    # Position of every point inside its cluster
+    group_of_point = np.repeat(index, counts)
+    starts = np.cumsum(counts) - counts
+    rank_in_group = np.arange(counts.sum()) - starts[group_of_point]
+    angles = 2 * np.pi * rank_in_group / counts[group_of_point]
+    radii = rng.uniform(0, 1, size=len(angles))
+
+    return {
+        'center_x': center_x,
+        'center_y': center_y,
+        'label_y': center_y - (0.2 + pos),
+        'label_size': 12 - (pos * 0.7),
+        'x': center_x[group_of_point] + radii * np.cos(angles),
+        'y': center_y[group_of_point] + radii * np.sin(angles),
+    }
@@ -0,0 +1,330 @@
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+
+
+def _grow(array, size, axis=0):
+    """Pads `array` with zeros along `axis` up to `size`."""
+    missing = size - array.shape[axis]
+    if missing <= 0:
+        return array
+    pad = [(0, 0)] * array.ndim
+    pad[axis] = (0, missing)
+    return np.pad(array, pad)
+
+
+class CorrelationStats:
+    """
+    Mergeable sufficient statistics of the correlations between numerical and categorical columns.
+
+    The categorical columns are never expanded to dummy columns: the statistics of their indicators
+    (e.g. `Sex_male`) are computed from their integer codes:
+    - the means, the centred sums of squares and the centred cross-products of every pair of numerical
+      columns, over the rows where both are present,
+    - the number of rows of every category, and the number of rows and the sums of every numerical column
+      present in every category,
+    - the contingency table of every pair of categorical columns.
+
+    Their size depends on the number of columns and categories, not on the number of rows, so they can be
+    updated chunk by chunk and merged between processes. Missing values are handled like `pandas.DataFrame.corr`
+    on the dummy columns of `pandas.get_dummies`: every pair of columns uses the rows where both are present,
+    and a missing category has every indicator at 0. Ordered categorical columns can be used as numerical
+    columns, with the position of their category.
+
+    Parameters:
+    - numeric (list): The numerical (or boolean, or ordered categorical) columns.
+    - categorical (list): The categorical columns. Default is no column.
+    """
+
+    def __init__(self, numeric, categorical=()):
+        self.numeric = list(numeric)
+        self.categorical = list(categorical)
+        p = len(self.numeric)
+        self.n = 0
+        # [i, j]: statistics of the column i over the rows where the columns i and j are present
+        self.pair_n = np.zeros((p, p))
+        self.pair_mean = np.zeros((p, p))
+        self.pair_m2 = np.zeros((p, p))
+        self.comoment = np.zeros((p, p))
+        self.levels = {col: [] for col in self.categorical}
+        self.level_counts = {col: np.zeros(0) for col in self.categorical}
+        self.level_present = {col: np.zeros((0, p)) for col in self.categorical}
+        self.level_sums = {col: np.zeros((0, p)) for col in self.categorical}
+        self.contingency = {pair: np.zeros((0, 0)) for pair in combinations(self.categorical, 2)}
+
+    def _add_levels(self, col, values):
+        """Registers new categories of `col` and returns the position of every value among the categories."""
+        levels = self.levels[col]
+        positions = pd.Index(levels, dtype=object).get_indexer(pd.Index(values, dtype=object))
+        new = positions < 0
+        if new.any():
+            positions[new] = len(levels) + np.arange(new.sum())
+            levels.extend(np.asarray(values, dtype=object)[new].tolist())
+            size = len(levels)
+            self.level_counts[col] = _grow(self.level_counts[col], size)
+            self.level_present[col] = _grow(self.level_present[col], size)
+            self.level_sums[col] = _grow(self.level_sums[col], size)
+            for (a, b), table in self.contingency.items():
+                if col in (a, b):
+                    self.contingency[(a, b)] = _grow(table, size, axis=0 if col == a else 1)
+        return positions
+
+    def _merge_moments(self, n, mean, m2, comoment):
+        """Adds the moments of other rows to the pairwise moments (parallel algorithm of Chan et al.)."""
+        total = self.pair_n + n
+        with np.errstate(divide='ignore', invalid='ignore'):
+            weight = np.where(total > 0, self.pair_n * n / total, 0)
+            share = np.where(total > 0, n / total, 0)
+        delta = mean - self.pair_mean
+        self.comoment += comoment + delta * delta.T * weight
+        self.pair_m2 += m2 + delta ** 2 * weight
+        self.pair_mean += delta * share
+        self.pair_n = total
+
+    def update(self, chunk):
+        """Adds the rows of a dataframe to the statistics and returns them."""
+        values = np.empty((len(chunk), len(self.numeric)))
+        for j, col in enumerate(self.numeric):
+            column = chunk[col]
+            if isinstance(column.dtype, pd.CategoricalDtype):
+                codes = column.cat.codes.to_numpy()
+                values[:, j] = np.where(codes >= 0, codes, np.nan)
+            else:
+                values[:, j] = column.to_numpy(dtype=float, na_value=np.nan)
+        present = ~np.isnan(values)
+
+        # Shifted by a value of every column for precision, the centred moments do not depend on it
+        shift = np.array([values[present[:, j], j][0] if present[:, j].any() else 0.0 for j in range(values.shape[1])])
+        x = np.where(present, values - shift, 0.0)
+        w = present.astype(float)
+        n = w.T @ w
+        sums = x.T @ w
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = np.where(n > 0, sums / n, 0)
+        self._merge_moments(n, mean + shift[:, None], (x ** 2).T @ w - sums * mean, x.T @ x - sums * mean.T)
+
+        codes = {}
+        for col in self.categorical:
+            local, uniques = pd.factorize(chunk[col])
+            positions = self._add_levels(col, uniques)
+            # A missing category has no indicator, like in `pandas.get_dummies`
+            known = local >= 0
+            codes[col] = np.full(len(local), -1)
+            codes[col][known] = positions[local[known]]
+            size = len(self.levels[col])
+            self.level_counts[col] += np.bincount(codes[col][known], minlength=size)
+            for j in range(len(self.numeric)):
+                rows = known & present[:, j]
+                self.level_present[col][:, j] += np.bincount(codes[col][rows], minlength=size)
+                self.level_sums[col][:, j] += np.bincount(codes[col][rows], weights=values[rows, j], minlength=size)
+
+        for (a, b), table in self.contingency.items():
+            known = (codes[a] >= 0) & (codes[b] >= 0)
+            shape = table.shape
+            table += np.bincount(codes[a][known] * shape[1] + codes[b][known], minlength=shape[0] * shape[1]).reshape(shape)
+        self.n += len(chunk)
+        return self
+
+    def merge(self, other):
+        """Adds the statistics of other rows, with the same columns, to these ones and returns them."""
+        self.n += other.n
+        self._merge_moments(other.pair_n, other.pair_mean, other.pair_m2, other.comoment)
+        positions = {col: self._add_levels(col, other.levels[col]) for col in self.categorical}
+        for col in self.categorical:
+            self.level_counts[col][positions[col]] += other.level_counts[col]
+            self.level_present[col][positions[col]] += other.level_present[col]
+            self.level_sums[col][positions[col]] += other.level_sums[col]
+        for (a, b), table in other.contingency.items():
+            self.contingency[(a, b)][np.ix_(positions[a], positions[b])] += table
+        return self
+
+    def features(self):
+        """Returns the names of every numerical column and every category indicator, such as 'Sex_male'."""
+        return self.numeric + [f'{col}_{level}' for col in self.categorical for level in self.levels[col]]
+
+    def _feature(self, name):
+        """
+        Finds a numerical column, as ('num', position), or a category indicator, as ('ind', column, position).
+
+        The indicator of a category without rows (like 'Sex_female' in a group of men) is constant, as ('zero',).
+        """
+        if name in self.numeric:
+            return ('num', self.numeric.index(name))
+        for col in self.categorical:
+            if name.startswith(f'{col}_'):
+                level = name[len(col) + 1:]
+                names = [str(value) for value in self.levels[col]]
+                if level in names:
+                    return ('ind', col, names.index(level))
+        for col in self.categorical:
+            if name.startswith(f'{col}_'):
+                return ('zero',)
+        raise KeyError(name)
+
+    def _indicator_moments(self, indicator, j):
+        """Centred cross-product and sums of squares of an indicator and the numerical column j, where j is present."""
+        _, col, level = indicator
+        n = self.pair_n[j, j]
+        count = self.level_present[col][level, j]
+        comoment = self.level_sums[col][level, j] - count * self.pair_mean[j, j]
+        return comoment, count * (n - count) / n, self.comoment[j, j]
+
+    def _pair(self, a, b):
+        """Centred cross-product and sums of squares of two features, over the rows where both are present."""
+        if a[0] == 'zero' or b[0] == 'zero':
+            return 0.0, 0.0, 0.0
+        if a[0] == 'num' and b[0] == 'num':
+            return self.comoment[a[1], b[1]], self.pair_m2[a[1], b[1]], self.pair_m2[b[1], a[1]]
+        if a[0] == 'num':
+            comoment, m2_b, m2_a = self._indicator_moments(b, a[1])
+            return comoment, m2_a, m2_b
+        if b[0] == 'num':
+            return self._indicator_moments(a, b[1])
+        (_, col, level), (_, other_col, other_level) = a, b
+        count = self.level_counts[col][level]
+        other_count = self.level_counts[other_col][other_level]
+        if col == other_col:
+            joint = count if level == other_level else 0
+        elif (col, other_col) in self.contingency:
+            joint = self.contingency[(col, other_col)][level, other_level]
+        else:
+            joint = self.contingency[(other_col, col)][other_level, level]
+        return (joint - count * other_count / self.n, count * (self.n - count) / self.n,
+                other_count * (self.n - other_count) / self.n)
+
+    def correlation(self, columns=None):
+        """
+        Computes the Pearson correlation matrix of numerical columns and category indicators.
+
+        Parameters:
+        - columns (list): Numerical columns and indicators, such as 'Sex_male'. Default is every feature.
+
+        Returns:
+        pandas.DataFrame: The correlation matrix, NaN for constant features.
+        """
+        columns = self.features() if columns is None else list(columns)
+        features = [self._feature(name) for name in columns]
+        matrix = np.empty((len(features), len(features)))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for i, a in enumerate(features):
+                for j, b in enumerate(features):
+                    comoment, m2_a, m2_b = self._pair(a, b)
+                    matrix[i, j] = comoment / np.sqrt(m2_a * m2_b) if m2_a * m2_b > 0 else np.nan
+        return pd.DataFrame(np.clip(matrix, -1, 1), index=columns, columns=columns)
+
+    def cramers_v(self, columns=None):
+        """
+        Computes Cramér's V between every pair of categorical columns, from their contingency tables.
+
+        Parameters:
+        - columns (list): Categorical columns. Default is every categorical column.
+
+        Returns:
+        pandas.DataFrame: The matrix of Cramér's V, between 0 (independent) and 1.
+        """
+        columns = self.categorical if columns is None else list(columns)
+        matrix = pd.DataFrame(np.eye(len(columns)), index=columns, columns=columns)
+        for a, b in combinations(columns, 2):
+            table = self.contingency[(a, b)] if (a, b) in self.contingency else self.contingency[(b, a)].T
+            # Categories without rows do not count, nor the rows missing one of the categories
+            table = table[table.sum(axis=1) > 0][:, table.sum(axis=0) > 0]
+            n = table.sum()
+            expected = np.outer(table.sum(axis=1), table.sum(axis=0)) / n
+            chi2 = ((table - expected) ** 2 / expected).sum()
+            k = min(table.shape) - 1
+            matrix.loc[a, b] = matrix.loc[b, a] = np.sqrt(chi2 / (n * k)) if k > 0 else np.nan
+        return matrix
+
+    def point_biserial(self, categorical=None, numeric=None):
+        """
+        Computes the point-biserial correlation between binary categorical columns and numerical columns.
+
+        It is the Pearson correlation of the numerical column with the indicator of the second category.
+
+        Parameters:
+        - categorical (list): Categorical columns with two categories. Default is every such column.
+        - numeric (list): Numerical columns. Default is every numerical column.
+
+        Returns:
+        pandas.DataFrame: One row per categorical column and one column per numerical column.
+        """
+        if categorical is None:
+            categorical = [col for col in self.categorical if len(self.levels[col]) == 2]
+        numeric = self.numeric if numeric is None else list(numeric)
+        rows = {}
+        for col in categorical:
+            if len(self.levels[col]) != 2:
+                raise ValueError(f"Point-biserial correlation needs two categories, {col!r} has {len(self.levels[col])}")
+            indicator = f'{col}_{self.levels[col][1]}'
+            rows[indicator] = self.correlation([indicator] + numeric).iloc[0, 1:]
+        return pd.DataFrame(rows, index=numeric).T
+
+
+def split_columns(df, columns):
+    """
+    Splits the columns of a correlation matrix into numerical columns and categorical columns to encode.
+
+    A name that is not a column of `df` is taken as the indicator of a category of a categorical column,
+    such as 'Sex_male' or 'Embarked_S', which is computed from the codes instead of a dummy column.
+
+    Parameters:
+    - df (pandas.DataFrame): The input dataframe containing the data.
+    - columns (list): The columns of the correlation matrix.
+
+    Returns:
+    tuple: (numeric, categorical) lists of columns of `df`.
+    """
+    numeric, categorical = [], []
+    for name in columns:
+        if name in df.columns:
+            column = df[name]
+            if isinstance(column.dtype, pd.CategoricalDtype) and not column.cat.ordered:
+                raise ValueError(f"{name!r} is not ordered, use the indicators of its categories such as '{name}_{column.cat.categories[0]}'")
+            numeric.append(name)
+            continue
+        prefixes = [name[:i] for i in range(len(name)) if name[i] == '_' and name[:i] in df.columns]
+        if not prefixes:
+            raise KeyError(name)
+        if prefixes[-1] not in categorical:
+            categorical.append(prefixes[-1])
+    return numeric, categorical
+
+
+def iter_frames(source, chunksize=100_000):
+    """
+    Iterates over the chunks of a dataset.
+
+    Parameters:
+    - source (pandas.DataFrame, str or iterable): A dataframe, the path of a columnar file (see `loader`), or an iterable of dataframes.
+    - chunksize (int): Number of rows of every chunk of a dataframe or a file. Default is 100,000.
+
+    Returns:
+    iterator: The chunks of the dataset.
+    """
+    if isinstance(source, pd.DataFrame):
+        return (source.iloc[start:start + chunksize] for start in range(0, len(source), chunksize))
+    if isinstance(source, str):
+        from loader import read_table, table_to_pandas
+        import pyarrow as pa
+        return (table_to_pandas(pa.Table.from_batches([batch])) for batch in read_table(source).to_batches(chunksize))
+    return iter(source)
+
+
+def correlation_stats(source, numeric, categorical=(), chunksize=100_000):
+    """
+    Computes the `CorrelationStats` of a dataset one chunk at a time.
+
+    Parameters:
+    - source (pandas.DataFrame, str or iterable): A dataframe, the path of a columnar file, or an iterable of dataframes.
+    - numeric (list): The numerical columns.
+    - categorical (list): The categorical columns. Default is no column.
+    - chunksize (int): Number of rows of every chunk. Default is 100,000.
+
+    Returns:
+    CorrelationStats: The statistics of the dataset.
+    """
+    stats = CorrelationStats(numeric, categorical)
+    for chunk in iter_frames(source, chunksize):
+        stats.update(chunk)
+    return stats
@@ -0,0 +1,115 @@
+import numpy as np
+import pandas as pd
+
+from grouping import composite_codes
+
+
+# Categorical dimensions of the cleaned dataset
+CUBE_DIMENSIONS = ['Survived', 'Pclass', 'Sex', 'Group_Age', 'Embarked', 'deck', 'alone', 'n_fam']
+
+
+def count_cube(df, dimensions=CUBE_DIMENSIONS):
+    """
+    Counts the passengers of every combination of the categorical dimensions.
+
+    The cube is sparse: only the combinations that appear in the data are stored, as a series indexed by
+    the dimensions. It is built with one pass over the rows, and any count chart of one or two variables
+    can then be computed from it with `marginalize`, without going back to the rows.
+
+    Parameters:
+    - df (pandas.DataFrame): The input dataframe containing the data.
+    - dimensions (list): The categorical columns of the cube. Default is `CUBE_DIMENSIONS`.
+
+    Returns:
+    pandas.Series: The number of passengers of every combination, indexed by `dimensions`.
+    """
+    dimensions = list(dimensions)
+    codes, uniques = composite_codes(df, dimensions)
+    counts = np.bincount(codes, minlength=len(uniques))
+    index = pd.MultiIndex.from_frame(uniques, names=dimensions)
+    return pd.Series(counts, index=index, name='count')
+
+
+def selection_cube(selection, dimensions):
+    """
+    Counts the rows of a selection of every combination of the categorical dimensions, from its bitmap index.
+
+    The rows are not built: the selection is intersected with the rows of every combination of values of the
+    first dimensions, and the values of the last one are counted with `Selection.value_counts`. Missing values
+    are kept as a value of their own, like in `count_cube`.
+
+    Parameters:
+    - selection (bitmap_index.Selection): The rows selected. Every dimension must be indexed.
+    - dimensions (list): The categorical columns of the cube.
+
+    Returns:
+    pandas.Series: The number of rows of every combination that appears, indexed by `dimensions`.
+    """
+    dimensions = list(dimensions)
+    index = selection.index
+    parts = [((), selection)]
+    for column in dimensions[:-1]:
+        values = [(value, index.eq(column, value)) for value in index.values[column]]
+        present = index.isin(column, index.values[column])
+        if present.count() < index.n_rows:
+            values.append((np.nan, ~present))
+        parts = [(key + (value,), part & rows) for key, part in parts for value, rows in values]
+        parts = [(key, part) for key, part in parts if part.count() > 0]
+
+    keys, counts = [], []
+    for key, part in parts:
+        value_counts = part.value_counts(dimensions[-1])
+        value_counts = value_counts[value_counts > 0]
+        keys.extend(key + (value,) for value in value_counts.index)
+        counts.extend(value_counts.tolist())
+        missing = part.count() - sum(value_counts)
+        if missing > 0:
+            keys.append(key + (np.nan,))
+            counts.append(missing)
+    return pd.Series(counts, index=pd.MultiIndex.from_tuples(keys, names=dimensions), name='count', dtype=np.int64)
+
+
+def has_dimensions(cube, variables):
+    """
+    Checks whether a cube can be marginalized over the given variables.
+
+    Parameters:
+    - cube (pandas.Series): The count cube, or None.
+    - variables (list): The variables needed.
+
+    Returns:
+    bool: Whether every variable is a dimension of the cube.
+    """
+    return cube is not None and all(var in cube.index.names for var in variables)
+
+
+def marginalize(cube, variables):
+    """
+    Sums the cube over every dimension except `variables`.
+
+    Combinations with a missing value in any of `variables` are dropped, like in a count plot.
+
+    Parameters:
+    - cube (pandas.Series): The count cube, as returned by `count_cube`.
+    - variables (str or list): The dimension(s) to keep.
+
+    Returns:
+    pandas.Series: The counts indexed by `variables`.
+    """
+    if isinstance(variables, str):
+        variables = [variables]
+    counts = cube.groupby(level=variables, observed=True, dropna=True).sum()
+    return counts[counts > 0]
+
+
+def category_order(counts):
+    """
+    Orders the categories of a one-variable count from the most to the least common, like `value_counts`.
+
+    Parameters:
+    - counts (pandas.Series): The counts of every category.
+
+    Returns:
+    pandas.Index: The categories in order.
+    """
+    return counts.sort_values(ascending=False, kind='stable').index
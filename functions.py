@@ -1,42 +1,139 @@
 import pandas as pd
 import numpy as np
 
-import matplotlib.pyplot as plt
-import seaborn as sns
+from grouping import combined_column
+from cube import count_cube, has_dimensions, marginalize, selection_cube, category_order as category_order_of
+from kde import kde_by
+from correlation import correlation_stats, split_columns
+from regression import RegressionStats
+from sampling import density_downsample
+from violin import violin_summary, violin_traces
+from bitmap_index import Selection
+from profiling import profiled
+
+# Los backends (matplotlib y seaborn, plotly) se importan dentro de cada función que los usa, para que importar
+# el módulo no los cargue: ver benchmarks/import_check.py
 
-import plotly.graph_objects as go
-import plotly.express as px
-
-from scipy import stats
-
-from jupyter_dash import JupyterDash
-import dash
-from dash import dcc, html
-from dash.dependencies import Input, Output
 #Paleta de colores
 
 palette = ['#00bcFF', '#ff9b00', '#06ae1f', '#ef57b3', '#c8cf00', '#0e4fc8', '#22cf81', '#ac1cde', '#a17e17', '#e70b00']
 
 
+def combine_variables(df, var):
+    """
+    Allows grouping a plot by several categorical variables at once.
+
+    If `var` is a list of columns, a categorical column combining them (e.g. "male-Third") is added to a copy
+    of the dataframe, built from integer group codes so the labels are only created once per group.
+
+    Parameters:
+    - df (pandas.DataFrame): The input dataframe containing the data.
+    - var (str or list): A column name, or a list of column names to combine.
+
+    Returns:
+    tuple: (df, name) with the dataframe to plot and the name of the column to use.
+    """
+    if isinstance(var, (list, tuple)):
+        column = combined_column(df, list(var))
+        return df.assign(**{column.name: column}), column.name
+    return df, var
+
+
+#Function to select a group of passengers
+def create_group(df, conditions):
+    """
+    Filters a DataFrame based on multiple conditions.
+
+    Parameters:
+    - df (pandas.DataFrame): The DataFrame to filter.
+    - conditions (list of tuples): A list of conditions where each condition is a tuple containing a column name and a value to filter by.
+
+    Returns:
+    pandas.DataFrame: A DataFrame filtered by the specified conditions.
+    """
+    query_str = ' & '.join([f"`{col}` == {repr(val)}" for col, val in conditions])
+    return df.query(query_str) if query_str else df
+
+
+def as_frame(df, columns=None, mask=None):
+    """
+    Returns the rows given to a plotter as a dataframe.
+
+    The plotters accept a selection of the rows of an indexed dataset (see `bitmap_index.BitmapIndex`) in place of
+    the filtered dataframe: only the columns they need are taken from the dataset.
+
+    A boolean mask over the rows of the dataset (see `outliers.inlier_mask`) keeps only some of them, so the plotters
+    filter the rows once instead of receiving a filtered copy of the whole dataframe.
+
+    Parameters:
+    - df (pandas.DataFrame or bitmap_index.Selection): The dataframe, or the selection of rows.
+    - columns (list): The variables needed, the only columns taken for a selection or a mask. Combined variables (lists)
+      count as all their columns. Default is None (every column).
+    - mask (numpy.ndarray or pandas.Series): Boolean mask of the rows kept, by position in the dataset. Default is None.
+
+    Returns:
+    pandas.DataFrame: `df` itself, or the rows of the selection and of the mask.
+    """
+    if columns is not None:
+        columns = list(dict.fromkeys(col for var in columns for col in (var if isinstance(var, (list, tuple)) else [var])))
+    if mask is not None:
+        mask = np.asarray(mask, dtype=bool)
+        if isinstance(df, Selection):
+            df = df & Selection(df.index, bits=np.packbits(mask))
+        else:
+            return (df if columns is None else df[columns])[mask]
+    if not isinstance(df, Selection):
+        return df
+    return df.to_frame(columns)
+
+
+def count_cube_of(df, variables):
+    """
+    Builds the count cube of the rows given to a plotter (see `cube.count_cube`).
+
+    A selection whose variables are all indexed is counted from its bitmap index (see `cube.selection_cube`),
+    without building its rows.
+
+    Parameters:
+    - df (pandas.DataFrame or bitmap_index.Selection): The dataframe, or the selection of rows.
+    - variables (list): The categorical variables of the cube.
+
+    Returns:
+    pandas.Series: The count cube with `variables` as dimensions.
+    """
+    if isinstance(df, Selection) and all(var in df.index for var in variables):
+        return selection_cube(df, variables)
+    return count_cube(as_frame(df, variables), variables)
+
+
 #Functions to create graphs for univariate analysis with:
 
 #Cathegorical variables:
-def cathegorical_simple(df, variables, color = '#00bcFF'):
+@profiled()
+def cathegorical_simple(df, variables, color = '#00bcFF', cube=None):
     """
     Generates count plots for categorical variables.
 
     This function creates a grid of count plots for the given categorical variables (`variables`) from the dataframe (`df`).
     Each plot shows the distribution of the categories within the variable, with the percentage of each category displayed above the bars.
     The plots are displayed in a grid layout.
+    The counts are taken from a count cube (see `cube.count_cube`), so the cost of drawing depends on the number of categories and not on the number of rows.
 
     Parameters:
-    - df (pandas.DataFrame): The input dataframe containing the data.
+    - df (pandas.DataFrame or bitmap_index.Selection): The input dataframe containing the data, or a selection of its rows (see `as_frame`).
     - variables (list): A list of categorical variables to be plotted.
-    - palette (list): A list of colors to be used for the bars in the plots. Default is the provided `palette`.
+    - color (str): The color to be used for the bars. Default is '#00bcFF'.
+    - cube (pandas.Series): A precomputed count cube of `df` with `variables` among its dimensions. Default is None (built from `df`).
 
     Returns:
     None: Displays the count plots with percentages.
     """
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    if not has_dimensions(cube, variables):
+        cube = count_cube_of(df, variables)
+
     # Get the dimensions of the grid
     num_rows = len(variables) // 2
     if len(variables) % 2 == 1:
@@ -49,21 +146,24 @@ def cathegorical_simple(df, variables, color = '#00bcFF'):
     for i, var in enumerate(variables):
         plt.subplot(num_rows, 2, i + 1)
 
-        # Take the order
-        category_order = df[var].value_counts().index
-        # Plot the countplot
-        plot = sns.countplot(data=df, x=var, color=color, edgecolor='black', order=category_order, legend=True)
-
-        # Calculate percentage using the actual height of the bar, so we don't have to calculate them previously
-        total_count = len(df[var])
-        slots = df[var].nunique()
-        for p in plot.patches:
-            height = p.get_height()
+        # Take the counts and the order from the cube
+        counts = marginalize(cube, var)
+        category_order = category_order_of(counts)
+        heights = counts.reindex(category_order).to_numpy()
+        positions = np.arange(len(category_order))
+
+        # Plot the bars
+        plt.bar(positions, heights, width=0.8, color=color, edgecolor='black')
+        plt.xticks(positions, [str(c) for c in category_order])
+        plt.xlabel(var)
+
+        # Show the count and percentage over every bar, out of every row (missing values included)
+        total_count = len(df)
+        slots = len(category_order)
+        for x, height in zip(positions, heights):
             if height > 0:  # Only display percentage if height is greater than zero
                 percentage = (height / total_count) * 100
-                # Show the % over the bar
-                width = p.get_width()
-                plt.text(p.get_x() + width / 2., height + (total_count*(1/300)), f'{height} ({percentage:.1f}%)', ha="center", fontsize=11-(slots*0.45))
+                plt.text(x, height + (total_count*(1/300)), f'{height} ({percentage:.1f}%)', ha="center", fontsize=11-(slots*0.45))
 
         #Remove top and right spines
         sns.despine()
@@ -81,7 +181,8 @@ def cathegorical_simple(df, variables, color = '#00bcFF'):
 
 
 #Numerical variables
-def numerical_simple(df, variables, color='#00bcFF'):
+@profiled()
+def numerical_simple(df, variables, color='#00bcFF', mask=None):
     """
     Generates histograms and boxplots for numerical variables.
 
@@ -90,13 +191,18 @@ def numerical_simple(df, variables, color='#00bcFF'):
     The plots are displayed in a grid layout with histograms on the top row and boxplots on the bottom row.
 
     Parameters:
-    - df (pandas.DataFrame): The input dataframe containing the data.
+    - df (pandas.DataFrame or bitmap_index.Selection): The input dataframe containing the data, or a selection of its rows (see `as_frame`).
     - variables (list): A list of numerical variables to be plotted.
     - color (str): The color to be used for the plots. Default is '#00bcFF'.
+    - mask (numpy.ndarray or pandas.Series): Boolean mask of the rows plotted, like the masks of `outliers.inlier_mask`. Default is None (every row).
 
     Returns:
     None: Displays the histograms and boxplots.
     """
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    df = as_frame(df, variables, mask=mask)
     # Create the grid
     fig, axis = plt.subplots(2, len(variables), figsize=(12, 8), gridspec_kw={'height_ratios': [5, 1]})
 
@@ -141,24 +247,44 @@ def numerical_simple(df, variables, color='#00bcFF'):
     plt.show()
 
 
-def px_violin_simple(df, y):
+@profiled()
+def px_violin_simple(df, y, show=True, summary=False, max_outliers=1_000, hover_columns=None, mask=None):
     """
     Generates a violin plot for the distribution of a specified column.
 
     This function creates a violin plot for the given numerical variable (`y`) from the dataframe (`df`).
     The plot includes a box plot and individual points within the violins.
+    With `summary=True`, the KDE profile, the quartiles and the whiskers are computed here (see `violin.violin_summary`)
+    and only a sample of the outliers is drawn, so the size of the figure does not depend on the number of rows.
 
     Parameters:
-    - df (pandas.DataFrame): The input dataframe containing the data.
+    - df (pandas.DataFrame or bitmap_index.Selection): The input dataframe containing the data, or a selection of its rows (see `as_frame`).
     - y (str): The numerical variable to be represented on the y-axis.
+    - show (bool): Whether to display the figure. Default is True.
+    - summary (bool): Whether to draw the precomputed summary instead of every point. Default is False.
+    - max_outliers (int): Maximum number of outliers drawn with `summary=True`. Default is 1,000.
+    - hover_columns (list): Columns shown when hovering the outliers with `summary=True`. Default is None (`y`).
+    - mask (numpy.ndarray or pandas.Series): Boolean mask of the rows plotted, like the masks of `outliers.inlier_mask`. Default is None (every row).
 
     Returns:
-    None: Displays the violin plot.
+    plotly.graph_objects.Figure: The violin plot, displayed if `show` is True.
     """
-    fig = px.violin(df, y=y, box=True, points="all", hover_data=df.columns)
+    import plotly.graph_objects as go
+    import plotly.express as px
+
+    df = as_frame(df, mask=mask)
+    if summary:
+        stats_summary = violin_summary(df, y, max_outliers=max_outliers, hover_columns=hover_columns)
+        traces, tickvals, ticktext = violin_traces(stats_summary, y)
+        fig = go.Figure(traces)
+        fig.update_layout(showlegend=False, xaxis=dict(tickvals=tickvals, ticktext=ticktext), yaxis_title=y)
+    else:
+        fig = px.violin(df, y=y, box=True, points="all", hover_data=df.columns)
     fig.update_layout(width=800, height=600)  # Adjust the width and height as needed
     fig.update_layout(title_text=f'Distribution of {y}', title_x=0.5)
-    fig.show()
+    if show:
+        fig.show()
+    return fig
 
 
 
@@ -167,25 +293,39 @@ def px_violin_simple(df, y):
 #Cathegorical variables:
 
 #       I define a function to create a series of graphs representing the distribution of different variables in regards to another given variable
-def cathegorical_pairs(df, dep_var, ind_vars, palette=palette):
+@profiled()
+def cathegorical_pairs(df, dep_var, ind_vars, palette=palette, cube=None):
     """
     Generates count plots for categorical variables with respect to a dependent variable.
 
     This function creates a series of count plots for the given independent categorical variables (`ind_vars`).
     Each plot shows the distribution of the dependent variable (`dep_var`) within each category of the independent variable.
     The plots are displayed in a grid layout.
+    The counts are taken from a count cube (see `cube.count_cube`), so the cost of drawing depends on the number of categories and not on the number of rows.
 
     Parameters:
-    - df (pandas.DataFrame): The input dataframe containing the data.
-    - dep_var (str): The dependent variable to be represented in the count plots.
+    - df (pandas.DataFrame or bitmap_index.Selection): The input dataframe containing the data, or a selection of its rows (see `as_frame`).
+    - dep_var (str or list): The dependent variable to be represented in the count plots. A list of variables is combined into one.
     - ind_vars (list): A list of independent categorical variables to be plotted.
     - palette (list): A list of colors to be used for the different categories of `dep_var`. Default is the global `palette` variable.
+    - cube (pandas.Series): A precomputed count cube of `df` with `dep_var` and `ind_vars` among its dimensions. Default is None (built from `df`).
 
     Returns:
     None: Displays the count plots.
     """
-    # Reorder the df to have color consistency
-    df = df.sort_values(by=dep_var, ascending=True)
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    if isinstance(dep_var, (list, tuple)):
+        df, dep_var = combine_variables(as_frame(df, [dep_var] + list(ind_vars)), dep_var)
+        cube = None
+    if not has_dimensions(cube, [dep_var] + list(ind_vars)):
+        cube = count_cube_of(df, [dep_var] + list(ind_vars))
+
+    # Sort the categories of dep_var by value (not by the order of a categorical) to have color consistency
+    hue_order = pd.Index(sorted(marginalize(cube, dep_var).index))
+    n_hue = len(hue_order)
+    width = 0.8 / n_hue
     
     # Select the number of rows given the number of variables
     num_rows = len(ind_vars) // 2
@@ -201,23 +341,32 @@ def cathegorical_pairs(df, dep_var, ind_vars, palette=palette):
         plt.subplot(num_rows, 2, i + 1)
 
         # Take the order
-        category_order = df[var].value_counts().index
+        category_order = category_order_of(marginalize(cube, var))
+        positions = np.arange(len(category_order))
 
-        #set the palette to use
-        palette_plot = palette[:len(df[dep_var].unique())]
-
-        # Plot the countplot
-        plot = sns.countplot(data=df, x=var, hue=dep_var, palette=palette_plot, edgecolor='black', order=category_order)
-        
-        total_count = len(df[var])
-        slots = df[var].nunique()
-        for p in plot.patches:
-            height = p.get_height()
-            if height > 0:  # Only display percentage if height is greater than zero
-                # Show the % over the bar
-                width = p.get_width()
-                plt.text(p.get_x() + width / 2., height + (total_count*(1/300)), f'{int(height)}', ha="center", fontsize=11-(slots*0.5))
+        # Counts of every category of dep_var within every category of var
+        counts = marginalize(cube, [var, dep_var]).unstack(fill_value=0).reindex(index=category_order, columns=hue_order, fill_value=0)
 
+        #set the palette to use
+        palette_plot = palette[:n_hue]
+
+        total_count = len(df)
+        slots = len(category_order)
+        for j, hue in enumerate(hue_order):
+            # Plot the bars of this category of dep_var next to the others
+            x = positions + (j - (n_hue - 1) / 2) * width
+            heights = counts[hue].to_numpy()
+            plt.bar(x, heights, width=width, color=palette_plot[j], edgecolor='black', label=str(hue))
+
+            for x_bar, height in zip(x, heights):
+                if height > 0:  # Only display percentage if height is greater than zero
+                    # Show the count over the bar
+                    plt.text(x_bar, height + (total_count*(1/300)), f'{int(height)}', ha="center", fontsize=11-(slots*0.5))
+
+        plt.xticks(positions, [str(c) for c in category_order])
+        plt.xlabel(var)
+        plt.ylabel('count')
+        plt.legend(title=dep_var)
         plt.title(f'Countplot of {dep_var} as a function of {var}')
     
     sns.despine()
@@ -226,75 +375,154 @@ def cathegorical_pairs(df, dep_var, ind_vars, palette=palette):
 
 
 #Mixed variables
-def mixed_pairs(df, num_var, cath_var, palette=palette):
+@profiled()
+def mixed_pairs(df, num_var, cath_var, palette=palette, mask=None):
     """
     Generates density distribution plots for a numerical variable, separated by a categorical variable.
 
     This function creates a series of density distribution plots for a given numerical variable (`num_var`).
     The plots are separated into different columns based on the categorical variable (`cath_var`).
     Vertical dashed lines are added to indicate the points of maximum density for each distribution.
+    The densities are estimated for every category at once with the binned FFT KDE of `kde.kde_by`, and the histograms with a single pass over the rows.
 
     Parameters:
-    - df (pandas.DataFrame): The input dataframe containing the data.
+    - df (pandas.DataFrame or bitmap_index.Selection): The input dataframe containing the data, or a selection of its rows (see `as_frame`).
     - num_var (str): The numerical variable to be represented in the density plots.
-    - cath_var (str): The categorical variable used to separate the data into different columns.
+    - cath_var (str or list): The categorical variable used to separate the data into different columns. A list of variables is combined into one.
     - palette (list): A list of colors to be used for the different categories of `cath_var`. Default is the provided `palette`.
+    - mask (numpy.ndarray or pandas.Series): Boolean mask of the rows plotted, like the masks of `outliers.inlier_mask`. Default is None (every row).
 
     Returns:
-    None: Displays the density distribution plots.
+    pandas.DataFrame: The point of maximum density of every category (see `kde.density_peaks`).
     """
-    palette_plot = palette[:len(df[cath_var].unique())]
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    df = as_frame(df, [num_var, cath_var], mask=mask)
+    df, cath_var = combine_variables(df, cath_var)
+    kde = kde_by(df, num_var, cath_var)
+    groups = kde['groups'][cath_var]
+    n_groups = len(groups)
+
+    # Histograms of every category with the same bins
+    values = df.loc[kde['index'], num_var].to_numpy(dtype=float)
+    edges = np.histogram_bin_edges(values, bins='auto')
+    bins = np.clip(np.searchsorted(edges, values, side='right') - 1, 0, len(edges) - 2)
+    hist = np.bincount(kde['codes'] * (len(edges) - 1) + bins, minlength=n_groups * (len(edges) - 1))
+    hist = hist.reshape(n_groups, len(edges) - 1)
+    bin_width = np.diff(edges)
+
     # Create the plot
-    g = sns.displot(data=df, x=num_var, kde=True, col=cath_var, hue=cath_var, palette=palette_plot, zorder=3)
+    fig, axes = plt.subplots(1, n_groups, figsize=(5 * n_groups, 5), sharex=True, sharey=True, squeeze=False)
+    for i, (ax, group) in enumerate(zip(axes.flat, groups)):
+        color = palette[i % len(palette)]
+        ax.bar(edges[:-1], hist[i], width=bin_width, align='edge', color=color, alpha=0.5, edgecolor=color, zorder=3)
+
+        # Scale the density to the counts of the histogram, only inside its support
+        low, high = kde['support'][i]
+        inside = (kde['grid'] >= low) & (kde['grid'] <= high)
+        ax.plot(kde['grid'][inside], kde['density'][i, inside] * kde['counts'][i] * bin_width.mean(), color=color, zorder=4)
+
+        x_max = kde['peaks'][i]
+        ax.axvline(x=x_max, color=color, linestyle='--', alpha=0.7, label=f'Max Density at {x_max:.2f}')
+        ax.legend()
 
-    # Apply the grid to every subplot
-    for ax in g.axes.flat:
-        ax.grid(True, axis='y', zorder=0)  
+        ax.set_title(f'{cath_var} = {group}')
+        ax.set_xlabel(num_var)
+        # Apply the grid to every subplot
+        ax.grid(True, axis='y', zorder=0)
+    axes.flat[0].set_ylabel('Count')
+    sns.despine()
 
     # Apply a main title
-    g.figure.suptitle(f'Density distribution of {num_var} according to {cath_var}', fontsize=16)
+    fig.suptitle(f'Density distribution of {num_var} according to {cath_var}', fontsize=16)
     plt.subplots_adjust(top=0.85, hspace=0.4)
     plt.show()
 
+    return kde['groups'].assign(peak=kde['peaks'], density=kde['peak_density'], count=kde['counts'], bandwidth=kde['bandwidth'])
+
 
 
 #Numerical_variables
 
-def numerical_pairs(df, x_var, y_var, color = '#00bcFF'):
+@profiled()
+def numerical_pairs(df, x_var, y_var, color = '#00bcFF', mode='full', max_points=5_000, gridsize=40, confidence=0.95, regression=None):
     """
     Generates a scatter plot with a regression line for two numerical variables.
 
     This function creates a scatter plot for the given numerical variables `x_var` and `y_var` from the dataframe `df`.
     A regression line is added to the plot to show the relationship between the two variables.
+    In the 'fast' and 'hexbin' modes the line is fitted from sufficient statistics (see `regression.RegressionStats`) with an
+    analytic confidence band instead of a bootstrap, and the points are downsampled (see `sampling.density_downsample`) or
+    drawn as a hexbin density, so the cost of drawing does not grow with the number of rows.
 
     Parameters:
-    - df (pandas.DataFrame): The input dataframe containing the data.
+    - df (pandas.DataFrame or bitmap_index.Selection): The input dataframe containing the data, or a selection of its rows (see `as_frame`).
      -x_var (str): The name of the column to be used as the x-axis variable.
      -y_var (str): The name of the column to be used as the y-axis variable.
      -color (str): The color to be used for the scatter points. Default is '#00bcFF'.
+     -mode (str): 'full' draws every point with `sns.lmplot`, 'fast' draws at most `max_points` points and 'hexbin' draws
+      a hexbin of every point. Default is 'full'.
+     -max_points (int): Maximum number of points drawn in the 'fast' mode. Default is 5,000.
+     -gridsize (int): Number of hexagons along x in the 'hexbin' mode. Default is 40.
+     -confidence (float): Confidence level of the band in the 'fast' and 'hexbin' modes. Default is 0.95.
+     -regression (regression.RegressionStats): Precomputed statistics of `x_var` and `y_var`, e.g. accumulated by chunks. Default is None (computed from `df`).
 
     Returns:
-    None: Displays the scatter plot with a regression line.
+    regression.LinearFit: The slope, intercept, R² and p-value of the regression.
     """
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    df = as_frame(df, [x_var, y_var])
+    if mode not in ('full', 'fast', 'hexbin'):
+        raise ValueError(f"Unknown mode {mode!r}, expected 'full', 'fast' or 'hexbin'")
+
     #calculate linear regression and R squared value 
-    slope, intercept, r_value, p_value, std_err = stats.linregress(df[x_var], df[y_var])
-    r_squared = r_value**2
+    if regression is None:
+        regression = RegressionStats().update(df[x_var].to_numpy(dtype=float, na_value=np.nan), df[y_var].to_numpy(dtype=float, na_value=np.nan))
+    fit = regression.fit()
     
-    #Plot the data
-    sns.lmplot(data= df, x=x_var, y = y_var, height=4, aspect=4, scatter_kws={'color': color}, line_kws={'color': 'red'})
-
     #Represent linear regression equation and R squared value 
-    equation_text = f"y = {slope:.2f}x + {intercept:.2f}"
-    r_squared_text = f"R² = {r_value**2:.3f}"
+    equation_text = f"y = {fit.slope:.2f}x + {fit.intercept:.2f}"
+    r_squared_text = f"R² = {fit.r_squared:.3f}"
+
+    if mode == 'full':
+        #Plot the data
+        sns.lmplot(data= df, x=x_var, y = y_var, height=4, aspect=4, scatter_kws={'color': color}, line_kws={'color': 'red'})
 
-    height = df[y_var].max()
-    plt.text(x=0.5, y=(0.8*height), s=equation_text, fontsize=12)
-    plt.text(x=3, y=(0.73*height)-15, s=r_squared_text, fontsize=12)
+        height = df[y_var].max()
+        plt.text(x=0.5, y=(0.8*height), s=equation_text, fontsize=12)
+        plt.text(x=3, y=(0.73*height)-15, s=r_squared_text, fontsize=12)
+    else:
+        x = df[x_var].to_numpy(dtype=float, na_value=np.nan)
+        y = df[y_var].to_numpy(dtype=float, na_value=np.nan)
+        fig, ax = plt.subplots(figsize=(16, 4))
+        if mode == 'fast':
+            sample = density_downsample(x, y, max_points=max_points)
+            ax.scatter(x[sample], y[sample], color=color, alpha=0.8, edgecolors='white', linewidths=0.5)
+        else:
+            valid = ~(np.isnan(x) | np.isnan(y))
+            ax.hexbin(x[valid], y[valid], gridsize=gridsize, cmap='Blues', mincnt=1)
+
+        # Regression line with its analytic confidence band
+        line_x = np.linspace(np.nanmin(x), np.nanmax(x), 100)
+        lower, upper = fit.confidence_band(line_x, level=confidence)
+        ax.plot(line_x, fit.predict(line_x), color='red')
+        ax.fill_between(line_x, lower, upper, color='red', alpha=0.15)
+
+        ax.text(0.01, 0.9, equation_text, transform=ax.transAxes, fontsize=12)
+        ax.text(0.01, 0.8, r_squared_text, transform=ax.transAxes, fontsize=12)
+        ax.set_xlabel(x_var)
+        ax.set_ylabel(y_var)
+        sns.despine()
 
     # plt.grid(True)
     plt.title(f'Scatterplot of {x_var} vs {y_var}')
     plt.show()
 
+    return fit
+
 
 
 
@@ -302,6 +530,7 @@ def numerical_pairs(df, x_var, y_var, color = '#00bcFF'):
 
 
 #mixed variables
+@profiled()
 def mixed_trios(df, num_var, cath_inter, cath_intra, palette = palette):
     """
     Generates density distribution plots for a numerical variable, separated by two categorical variables.
@@ -310,46 +539,63 @@ def mixed_trios(df, num_var, cath_inter, cath_intra, palette = palette):
     The plots are separated into different columns based on the first categorical variable (`cath_inter`),
     and within each column, the density distributions are further separated by the second categorical variable (`cath_intra`).
     Vertical dashed lines are added to indicate the points of maximum density for each distribution.
+    The densities and their maxima are estimated for every pair of categories at once with the binned FFT KDE of `kde.kde_by`.
 
     Parameters:
-    - df (pandas.DataFrame): The input dataframe containing the data.
+    - df (pandas.DataFrame or bitmap_index.Selection): The input dataframe containing the data, or a selection of its rows (see `as_frame`).
      -num_var (str): The numerical variable to be represented in the density plots.
-     -cath_inter (str): The categorical variable used to separate the data into different columns.
-     -cath_intra (str): The categorical variable used to separate the density distributions within each column.
+     -cath_inter (str or list): The categorical variable used to separate the data into different columns. A list of variables is combined into one.
+     -cath_intra (str or list): The categorical variable used to separate the density distributions within each column. A list of variables is combined into one.
      -palette (list): A list of colors to be used for the different categories of `cath_intra`. Default is the provided `palette`.
 
     Returns:
-    None: Displays the density distribution plots.
+    pandas.DataFrame: The point of maximum density of every pair of categories (see `kde.density_peaks`).
     """
-
-    palette_plot = palette[:len(df[cath_intra].unique())]
-    g = sns.displot(data=df, x=num_var, kind='kde', col=cath_inter, hue=cath_intra, palette=palette_plot)
-
-    for ax in g.axes.flat:
-        # Get the density line info from the graph
-        for line in ax.get_lines():
-            data = line.get_data()
-            x_values = data[0]
-            y_values = data[1]
-
-            # Find the max value
-            x_max = x_values[y_values.argmax()]
-
-            # Get the color of the line
-            line_color = line.get_color()
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    df = as_frame(df, [num_var, cath_inter, cath_intra])
+    df, cath_inter = combine_variables(df, cath_inter)
+    df, cath_intra = combine_variables(df, cath_intra)
+
+    kde = kde_by(df, num_var, [cath_inter, cath_intra])
+    groups = kde['groups']
+    columns = groups[cath_inter].drop_duplicates().tolist()
+    hues = groups[cath_intra].drop_duplicates().sort_values().tolist()
+    # Normalize the densities over the whole data, like seaborn does with common_norm
+    weights = kde['counts'] / kde['counts'].sum()
+
+    fig, axes = plt.subplots(1, len(columns), figsize=(5 * len(columns), 5), sharex=True, sharey=True, squeeze=False)
+    for ax, column in zip(axes.flat, columns):
+        for i in np.flatnonzero((groups[cath_inter] == column).to_numpy()):
+            hue = groups[cath_intra].iloc[i]
+            line_color = palette[hues.index(hue) % len(palette)]
+
+            # Draw the density inside its support
+            low, high = kde['support'][i]
+            inside = (kde['grid'] >= low) & (kde['grid'] <= high)
+            ax.plot(kde['grid'][inside], kde['density'][i, inside] * weights[i], color=line_color, label=str(hue))
 
             # Draw the vertical line at max density
+            x_max = kde['peaks'][i]
             ax.axvline(x=x_max, color=line_color, linestyle='--', alpha=0.7, label=f'Max Density at {x_max:.2f}')
-            
+
+        ax.set_title(f'{cath_inter} = {column}')
+        ax.set_xlabel(num_var)
         ax.legend()
+    axes.flat[0].set_ylabel('Density')
+    sns.despine()
 
-    g.figure.suptitle(f'Density distribution of {num_var} according to {cath_inter} and {cath_intra}', fontsize=16)
+    fig.suptitle(f'Density distribution of {num_var} according to {cath_inter} and {cath_intra}', fontsize=16)
     plt.subplots_adjust(top=0.85, hspace=0.4)
 
     plt.show()
 
+    return groups.assign(peak=kde['peaks'], density=kde['peak_density'], count=kde['counts'], bandwidth=kde['bandwidth'])
+
 
-def px_violin_multiple(dataframe, y, x, color):
+@profiled()
+def px_violin_multiple(dataframe, y, x, color, show=True, summary=False, max_outliers=1_000, hover_columns=None, mask=None):
     """
     Generates a violin plot for a numerical variable, separated by a categorical variable and colored by another categorical variable.
 
@@ -358,38 +604,69 @@ def px_violin_multiple(dataframe, y, x, color):
     Box plots and individual points are also displayed within the violins.
 
     Parameters:
-    - dataframe (pandas.DataFrame): The input dataframe containing the data.
+    - dataframe (pandas.DataFrame or bitmap_index.Selection): The input dataframe containing the data, or a selection of its rows (see `as_frame`).
     - y (str): The numerical variable to be represented on the y-axis.
-    - x (str): The categorical variable used to separate the data into different columns.
-    - color (str): The categorical variable used to color the violins.
+    - x (str or list): The categorical variable used to separate the data into different columns. A list of variables is combined into one.
+    - color (str or list): The categorical variable used to color the violins. A list of variables is combined into one.
+    - show (bool): Whether to display the figure. Default is True.
+    - summary (bool): Whether to draw the precomputed summary instead of every point (see `px_violin_simple`). Default is False.
+    - max_outliers (int): Maximum number of outliers drawn with `summary=True`, sampled from every violin alike. Default is 1,000.
+    - hover_columns (list): Columns shown when hovering the outliers with `summary=True`. Default is None (`y`, `x` and `color`).
+    - mask (numpy.ndarray or pandas.Series): Boolean mask of the rows plotted, like the masks of `outliers.inlier_mask`. Default is None (every row).
 
     Returns:
-    None: Displays the violin plot.
+    plotly.graph_objects.Figure: The violin plot, displayed if `show` is True.
     """
-    fig = px.violin(dataframe, y=y, x=x, color=color, box=True, points="all", hover_data=dataframe.columns, template="plotly_dark")
+    import plotly.graph_objects as go
+    import plotly.express as px
+
+    dataframe = as_frame(dataframe, mask=mask)
+    dataframe, x = combine_variables(dataframe, x)
+    dataframe, color = combine_variables(dataframe, color)
+    if summary:
+        stats_summary = violin_summary(dataframe, y, by=list(dict.fromkeys([x, color])), max_outliers=max_outliers, hover_columns=hover_columns)
+        traces, tickvals, ticktext = violin_traces(stats_summary, y, x=x, color=color)
+        fig = go.Figure(traces)
+        fig.update_layout(template="plotly_dark", legend_title_text=color, xaxis=dict(title=x, tickvals=tickvals, ticktext=ticktext), yaxis_title=y)
+    else:
+        fig = px.violin(dataframe, y=y, x=x, color=color, box=True, points="all", hover_data=dataframe.columns, template="plotly_dark")
     fig.update_layout(title_text='Violin plot of Age vs Survived colored by Sex', title_x=0.5)
-    fig.show()
+    if show:
+        fig.show()
+    return fig
 
 
 # Correlation matrix
+@profiled()
 def corr_matrix(df, palette='coolwarm', corr_columns=["Age", "Fare", "Sex_male", "Sex_female", "Pclass", 
-                                "Embarked_S", "Embarked_Q", "Embarked_C", 'n_fam', 'alone', 'has_deck', "Survived"]):
+                                "Embarked_S", "Embarked_Q", "Embarked_C", 'n_fam', 'alone', 'has_deck', "Survived"], stats=None):
     """
     Generates and displays a correlation matrix heatmap for the specified columns in the dataframe.
 
+    Columns such as "Sex_male" do not need to exist: if `df` has a categorical column "Sex", the indicator of its category
+    "male" is computed from the codes, without building dummy columns (see `correlation.CorrelationStats`).
+    Ordered categorical columns such as "Pclass" are correlated by the position of their category. As with `DataFrame.corr`,
+    every pair of columns uses the rows where both are present.
+
     Parameters:
-    - df (pandas.DataFrame): The input dataframe containing the data.
-    - colors (str): The colormap to be used for the heatmap. Default is 'inferno'.
-    - encoding_cols (list): List of categorical columns to be one-hot encoded. Default is ['Sex', 'Embarked'].
+    - df (pandas.DataFrame or bitmap_index.Selection): The input dataframe containing the data, or a selection of its rows (see `as_frame`).
+    - palette (str): The colormap to be used for the heatmap. Default is 'coolwarm'.
     - corr_columns (list): List of columns for which the correlation matrix is to be computed. Default includes 
                          ["Age", "Fare", "Sex_male", "Sex_female", "Pclass", "Embarked_S", "Embarked_Q", "Embarked_C", 
                          'n_fam', 'alone', 'has_deck', "Survived"].
+    - stats (correlation.CorrelationStats): Precomputed statistics of `df` including `corr_columns`, e.g. accumulated by chunks. Default is None (computed from `df`).
 
     Returns:
-    None: Displays a heatmap of the correlation matrix.
+    pandas.DataFrame: The correlation matrix.
     """
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    df = as_frame(df)
     # Create correlation matrix
-    correlation_matrix = df[corr_columns].corr()
+    if stats is None:
+        stats = correlation_stats(df, *split_columns(df, corr_columns))
+    correlation_matrix = stats.correlation(corr_columns)
 
     #Represent the heatmap
     plt.figure(figsize=(10, 8))
@@ -398,4 +675,4 @@ def corr_matrix(df, palette='coolwarm', corr_columns=["Age", "Fare", "Sex_male",
     plt.title("Correlation Matrix")
     plt.show()
 
-
+    return correlation_matrix
@@ -0,0 +1,148 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+def dataset_fingerprint(df):
+    """
+    Computes a fingerprint that identifies the content of a dataframe.
+
+    The fingerprint is a hash of the column names, the dtypes and the row hashes of the dataframe,
+    so two dataframes with the same data share the same fingerprint.
+
+    Parameters:
+    - df (pandas.DataFrame): The input dataframe.
+
+    Returns:
+    str: The hexadecimal fingerprint.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr(list(zip(df.columns, df.dtypes.astype(str)))).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def grouping_key(fingerprint, selected_vars):
+    """
+    Builds the cache key of a grouping: the dataset fingerprint plus the sorted grouping variables.
+
+    Parameters:
+    - fingerprint (str): The fingerprint of the dataset, as returned by `dataset_fingerprint`.
+    - selected_vars (list): The variables used to group the passengers.
+
+    Returns:
+    tuple: The cache key.
+    """
+    return (fingerprint, tuple(sorted(selected_vars)))
+
+
+def entry_nbytes(entry):
+    """
+    Estimates the memory used by a cache entry.
+
+    NumPy arrays count their buffer size, lists of strings their text length plus the object overhead.
+    An integer stored under the key 'nbytes' is the size of the other values of its dict estimated by the code
+    that built them, for objects that cannot be measured here (like plotly figures).
+
+    Parameters:
+    - entry (dict): The cache entry.
+
+    Returns:
+    int: The estimated size in bytes.
+    """
+    total = 0
+    for key, value in entry.items():
+        if key == 'nbytes' and isinstance(value, (int, np.integer)):
+            total += int(value)
+        elif isinstance(value, np.ndarray):
+            total += value.nbytes
+        elif isinstance(value, dict):
+            total += entry_nbytes(value)
+        elif isinstance(value, (list, tuple)):
+            total += sum(len(v) for v in value if isinstance(v, str)) + 56 * len(value)
+    return total
+
+
+def freeze(entry):
+    """
+    Flags the NumPy arrays of a cache entry as non-writeable, since the entry is shared by every session.
+
+    Parameters:
+    - entry (dict): The cache entry.
+
+    Returns:
+    dict: The same entry.
+    """
+    for value in entry.values():
+        if isinstance(value, np.ndarray):
+            value.flags.writeable = False
+        elif isinstance(value, dict):
+            freeze(value)
+    return entry
+
+
+class GroupingCache:
+    """
+    Thread-safe LRU cache of the grouping results of the interactive space.
+
+    Every entry stores the group codes, counts, percentages, labels and layout of one grouping, and the figures
+    already built from it. The entries are shared by every session of the app, so their arrays are made
+    read-only when they are stored.
+    When the total estimated size goes over `max_bytes`, the least recently used entries are evicted.
+
+    Parameters:
+    - max_bytes (int): Memory cap of the cache in bytes. Default is 256 MB.
+    """
+
+    def __init__(self, max_bytes=256 * 1024 ** 2):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key):
+        """Returns the entry stored under `key` (marking it as recently used), or None if it is not cached."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, entry):
+        """Stores `entry` under `key` and evicts the least recently used entries that do not fit in the cap."""
+        size = entry_nbytes(freeze(entry))
+        with self._lock:
+            if key in self._entries:
+                self.nbytes -= self._sizes.pop(key)
+                del self._entries[key]
+            # An entry bigger than the whole cap is not stored
+            if size > self.max_bytes:
+                return
+            self._entries[key] = entry
+            self._sizes[key] = size
+            self.nbytes += size
+            while self.nbytes > self.max_bytes:
+                old_key, _ = self._entries.popitem(last=False)
+                self.nbytes -= self._sizes.pop(old_key)
+
+    def clear(self):
+        """Removes every entry of the cache."""
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self.nbytes = 0
@@ -0,0 +1,145 @@
+import numpy as np
+import pandas as pd
+
+
+def group_codes(df, columns):
+    """
+    Computes an integer group code for every row from the combination of several columns.
+
+    Each column is factorized to integer codes, and the codes are combined into a single int64 key
+    with mixed-radix encoding (key = key * cardinality + code). When the product of the cardinalities
+    could overflow int64, the key built so far is factorized again to dense codes before going on.
+    No string is built for the rows, so the cost stays low even with many columns selected.
+
+    Parameters:
+    - df (pandas.DataFrame): The input dataframe containing the data.
+    - columns (list): The columns used to group the rows.
+
+    Returns:
+    numpy.ndarray: The dense group code (0 to n_groups - 1) of every row, in order of first appearance.
+    """
+    n_rows = len(df)
+    if not columns:
+        return np.zeros(n_rows, dtype=np.intp)
+
+    key = np.zeros(n_rows, dtype=np.int64)
+    size = 1
+    for col in columns:
+        # NaN values are kept as a group of their own
+        codes, levels = pd.factorize(df[col], use_na_sentinel=False)
+        cardinality = max(len(levels), 1)
+        if size * cardinality >= 2 ** 63:
+            key, key_levels = pd.factorize(key)
+            size = len(key_levels)
+        key = key * cardinality + codes
+        size *= cardinality
+
+    codes, _ = pd.factorize(key)
+    return codes
+
+
+def composite_codes(df, columns):
+    """
+    Computes the group code of every row (see `group_codes`) and the values of every group.
+
+    Parameters:
+    - df (pandas.DataFrame): The input dataframe containing the data.
+    - columns (list): The columns used to group the rows.
+
+    Returns:
+    tuple: (codes, uniques) where `codes` is an array with the dense group code (0 to n_groups - 1) of every row,
+    in order of first appearance, and `uniques` is a dataframe with the values of `columns` for every group.
+    """
+    codes = group_codes(df, columns)
+    if not columns:
+        return codes, pd.DataFrame(index=range(1 if len(df) else 0))
+    return codes, group_values(df, columns, codes)
+
+
+def first_rows(codes):
+    """
+    Returns the position of the first row of every group.
+
+    The codes must be numbered in order of first appearance, as returned by `pandas.factorize`,
+    so a new group starts exactly where the running maximum of the codes increases.
+
+    Parameters:
+    - codes (numpy.ndarray): Dense group code of every row.
+
+    Returns:
+    numpy.ndarray: The position of the first row of each group.
+    """
+    codes = np.asarray(codes)
+    if len(codes) == 0:
+        return np.zeros(0, dtype=np.intp)
+    running_max = np.maximum.accumulate(codes)
+    return np.flatnonzero(np.concatenate(([True], running_max[1:] > running_max[:-1])))
+
+
+def group_values(df, columns, codes):
+    """
+    Returns the values of `columns` for every group, taken from the first row of the group.
+
+    Parameters:
+    - df (pandas.DataFrame): The input dataframe containing the data.
+    - columns (list): The columns used to group the rows.
+    - codes (numpy.ndarray): Dense group code of every row.
+
+    Returns:
+    pandas.DataFrame: One row per group with the values of `columns`.
+    """
+    return df[list(columns)].take(first_rows(codes)).reset_index(drop=True)
+
+
+def format_labels(uniques, columns=None, sep='-'):
+    """
+    Builds a readable label for every group, such as "Yes-Adults-First".
+
+    The labels are built once per unique group, so the cost does not depend on the number of rows.
+
+    Parameters:
+    - uniques (pandas.DataFrame): The values of every group, as returned by `composite_codes`.
+    - columns (list): The columns to include in the label, in that order. Default is every column of `uniques`.
+    - sep (str): The separator between the values. Default is '-'.
+
+    Returns:
+    list: The label of every group.
+    """
+    if columns is None:
+        columns = list(uniques.columns)
+    if not columns:
+        return ['All Passengers'] * len(uniques)
+    labels = uniques[columns[0]].astype(str)
+    for col in columns[1:]:
+        labels = labels + sep + uniques[col].astype(str)
+    return labels.tolist()
+
+
+def combined_column(df, columns, sep='-'):
+    """
+    Builds a categorical column that combines several columns, to be used as hue or col of a plot.
+
+    The column is a `pandas.Categorical` built from the integer group codes, so the labels are only
+    stored once per group. The categories are sorted by the values of `columns`, and groups that format to
+    the same label are merged into one category.
+
+    Parameters:
+    - df (pandas.DataFrame): The input dataframe containing the data.
+    - columns (list): The columns to combine.
+    - sep (str): The separator between the values in the labels. Default is '-'.
+
+    Returns:
+    pandas.Series: The combined categorical column, aligned with `df`.
+    """
+    codes, uniques = composite_codes(df, columns)
+
+    # Sort the groups by their values so the order of the categories is stable between calls
+    order = uniques.sort_values(list(columns)).index.to_numpy()
+    rank = np.empty(len(order), dtype=np.intp)
+    rank[order] = np.arange(len(order))
+    labels = format_labels(uniques.take(order), list(columns), sep=sep)
+
+    # Groups with the same label (such as NaN and the string 'nan') share one category
+    label_codes, categories = pd.factorize(pd.Index(labels, dtype=object))
+    categorical = pd.Categorical.from_codes(label_codes[rank[codes]], categories=categories)
+    return pd.Series(categorical, index=df.index, name=sep.join(columns))
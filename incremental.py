@@ -0,0 +1,197 @@
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from cleaning import CleaningStats, clean_titanic, extract_names, family_hash, merge_counts, verify_families
+from cube import CUBE_DIMENSIONS, count_cube
+from loader import CLEAN_ARROW, UPDATE_SCHEMA, apply_deltas, delta_dir, read_table, table_to_pandas, to_arrow, write_delta
+
+
+class HashIndex:
+    """
+    Log-structured multimap from 64-bit hashes to integers, kept as a few segments sorted by hash.
+
+    Every batch of entries is added as a new segment, and the newest segments are merged while they are at
+    least half the size of the segment below, so there are O(log n) segments and every entry is merged O(log n)
+    times. Looking up some keys costs a binary search in every segment, so it depends on the number of keys and
+    not on the number of entries. The entries of a key are returned from the oldest to the newest.
+    """
+
+    def __init__(self):
+        self.segments = []
+
+    def __len__(self):
+        return sum(len(keys) for keys, _ in self.segments)
+
+    def add(self, keys, values):
+        """Adds the entries (keys[i], values[i])."""
+        order = np.argsort(keys, kind='stable')
+        self.segments.append((keys[order], values[order]))
+        while len(self.segments) > 1 and 2 * len(self.segments[-1][0]) >= len(self.segments[-2][0]):
+            (old_keys, old_values), (new_keys, new_values) = self.segments[-2:]
+            keys = np.concatenate([old_keys, new_keys])
+            order = np.argsort(keys, kind='stable')  # Older entries stay first
+            self.segments[-2:] = [(keys[order], np.concatenate([old_values, new_values])[order])]
+
+    def find(self, keys):
+        """
+        Finds the entries of some keys.
+
+        Parameters:
+        - keys (numpy.ndarray): The unique keys looked up.
+
+        Returns:
+        tuple: (keys, values) of every entry found, from the oldest to the newest for every key.
+        """
+        found_keys, found_values = [np.array([], dtype=np.uint64)], [np.array([], dtype=np.int64)]
+        for segment_keys, segment_values in self.segments:
+            start = np.searchsorted(segment_keys, keys, side='left')
+            counts = np.searchsorted(segment_keys, keys, side='right') - start
+            positions = np.repeat(start - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+            found_keys.append(segment_keys[positions])
+            found_values.append(segment_values[positions])
+        return np.concatenate(found_keys), np.concatenate(found_values)
+
+
+class IncrementalCleaner:
+    """
+    Appends batches of new passengers to a cleaned dataset without cleaning it again.
+
+    Every batch of the raw manifest is cleaned with the statistics of the whole manifest (see `CleaningStats`),
+    updated with the batch: the imputation medians and the `Embarked` mode, and the size, maximum `n_fam` and
+    survivors of the (surname, ticket) groups of the batch. Only those groups are verified again:
+    - a group that becomes a family gets a new `FamilyID`, after the last one,
+    - a family that is no longer verified loses its `FamilyID` (-1), which is not used again,
+    - the other families keep their `FamilyID`, and their survival rate is updated.
+    The batch and the new family columns of the earlier members of the changed groups are appended to the
+    columnar file as a delta (see `loader.write_delta`), and the count cube is updated with the batch.
+    Every step looks up only the groups of the batch, so the cost depends on the size of the batch and not
+    on the size of the dataset.
+
+    Unlike cleaning the whole manifest again, the `FamilyID` of the existing families never change (new
+    families are numbered in order of arrival), and the ages imputed earlier keep the medians of their time.
+
+    Parameters:
+    - stats (CleaningStats): Statistics of the raw manifest of the cleaned dataset, as returned by
+      `cleaning.clean_titanic_chunked`. They are updated with every batch, so they can be kept to open the
+      dataset again later.
+    - path (str): Path of the columnar file of the cleaned dataset. Default is `CLEAN_ARROW`.
+    - cube_dimensions (list): Dimensions of the count cube kept up to date. Default is `cube.CUBE_DIMENSIONS`.
+    """
+
+    def __init__(self, stats, path=CLEAN_ARROW, cube_dimensions=CUBE_DIMENSIONS):
+        self.stats = stats
+        self.path = path
+        self.cube_dimensions = list(cube_dimensions)
+
+        # One pass over the dataset to index the members and the ID of every family. A file rebuilt after its
+        # deltas were written is rejected by `apply_deltas`, since their positions would point at other rows
+        table = apply_deltas(path, read_table(path))
+        df = table_to_pandas(table.select(['Surname', 'Ticket', 'FamilyID'] + self.cube_dimensions))
+        hashes = family_hash(df)
+        family_id = df['FamilyID'].to_numpy()
+        self.n_rows = len(df)
+        if stats.n_rows() != self.n_rows:
+            raise ValueError(f'The statistics describe {stats.n_rows()} passengers, but {path!r} and its deltas have {self.n_rows}')
+        self.members = HashIndex()
+        self.members.add(hashes, np.arange(self.n_rows))
+
+        in_family = np.flatnonzero(family_id >= 0)
+        _, first = np.unique(hashes[in_family], return_index=True)
+        self.family_ids = HashIndex()
+        self.family_ids.add(hashes[in_family[first]], family_id[in_family[first]].astype(np.int64))
+        self.next_family_id = int(family_id.max()) + 1 if len(in_family) else 0
+
+        self.cube = count_cube(df, self.cube_dimensions)
+
+    @classmethod
+    def from_raw(cls, raw, path=CLEAN_ARROW, cube_dimensions=CUBE_DIMENSIONS):
+        """
+        Cleans a raw manifest that fits in memory, writes it to a columnar file and opens it for appending.
+
+        Parameters:
+        - raw (pandas.DataFrame): The raw manifest.
+        - path (str): Path of the columnar file to write. Default is `CLEAN_ARROW`.
+        - cube_dimensions (list): See `IncrementalCleaner`. Default is `cube.CUBE_DIMENSIONS`.
+
+        Returns:
+        IncrementalCleaner: The cleaner of the new file.
+        """
+        feather.write_feather(to_arrow(clean_titanic(raw)), path, compression='uncompressed')
+        shutil.rmtree(delta_dir(path), ignore_errors=True)
+        return cls(CleaningStats().update(raw), path, cube_dimensions)
+
+    def _current_family_ids(self, groups):
+        """Returns the `FamilyID` of some (surname, ticket) groups, -1 for the groups that are not a family."""
+        keys, values = self.family_ids.find(groups)
+        latest = pd.Series(values, index=keys).groupby(level=0).last()
+        return latest.reindex(groups, fill_value=-1).to_numpy()
+
+    def append(self, batch):
+        """
+        Cleans a batch of new passengers and appends it to the dataset as a delta.
+
+        Parameters:
+        - batch (pandas.DataFrame): The new rows of the raw manifest.
+
+        Returns:
+        pandas.DataFrame: The cleaned batch.
+        """
+        batch = batch.reset_index(drop=True)
+        keys = pd.DataFrame({'Surname': extract_names(batch['Name'])['Surname'], 'Ticket': batch['Ticket']})
+        groups = np.unique(family_hash(keys))
+
+        # The (surname, ticket) groups of the batch, before and after it
+        before = self.stats.family_stats(groups)
+        self.stats.update(batch)
+        after = self.stats.family_stats(groups)
+
+        old_ids = self._current_family_ids(groups)
+        old_rates = np.where(old_ids >= 0, before['survived'].to_numpy() // np.maximum(before['size'].to_numpy(), 1), -1)
+        verified = verify_families(after['size'].to_numpy(), after['max_n_fam'].to_numpy())
+        new_ids = np.where(verified, old_ids, -1)
+        joining = verified & (old_ids < 0)
+        new_ids[joining] = self.next_family_id + np.arange(joining.sum())
+        self.next_family_id += int(joining.sum())
+        # The rate is truncated like in `family_survival_rate`: 1 only when every member survived
+        new_rates = np.where(verified, after['survived'].to_numpy() // after['size'].to_numpy(), -1)
+
+        # The new passengers are cleaned with the statistics of the whole manifest and the families of their groups
+        self.stats.family_table = pd.DataFrame({'FamilyID': new_ids, 'Family_Survival_Rate': new_rates}, index=groups)
+        clean = clean_titanic(batch, stats=self.stats)
+        self.stats.family_table = None
+
+        # Earlier members of the groups whose family changed
+        changed = (new_ids != old_ids) | (new_rates != old_rates)
+        member_keys, positions = self.members.find(groups[changed])
+        group = np.searchsorted(groups, member_keys)
+        updates = pa.table({
+            'position': positions.astype(np.int64),
+            'FamilyID': new_ids[group].astype(np.int32),
+            'Family_Survival_Rate': new_rates[group].astype(np.int8),
+        }, schema=UPDATE_SCHEMA)
+        write_delta(self.path, to_arrow(clean), updates, self.n_rows)
+
+        moved = new_ids != old_ids
+        self.family_ids.add(groups[moved], new_ids[moved].astype(np.int64))
+        self.members.add(family_hash(clean), self.n_rows + np.arange(len(clean)))
+        self.n_rows += len(clean)
+        self.cube = merge_counts(self.cube, count_cube(clean, self.cube_dimensions))
+        return clean
+
+    def compact(self):
+        """
+        Rewrites the columnar file with its deltas applied and removes them.
+
+        Returns:
+        str: The path of the columnar file.
+        """
+        table = apply_deltas(self.path, read_table(self.path))
+        feather.write_feather(table, self.path + '.tmp', compression='uncompressed')
+        os.replace(self.path + '.tmp', self.path)
+        shutil.rmtree(delta_dir(self.path), ignore_errors=True)
+        return self.path
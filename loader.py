@@ -0,0 +1,365 @@
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+
+from cleaning import AGE_LABELS
+
+
+CLEAN_CSV = os.path.join('data', 'titanic_clean.csv')
+CLEAN_ARROW = os.path.join('data', 'titanic_clean.arrow')
+
+# Categories with a meaningful order, the rest are taken from the data
+CATEGORIES = {
+    'Survived': ['No', 'Yes'],
+    'Pclass': ['First', 'Second', 'Third'],
+    'Group_Age': ['Infants (0-12)', 'Teens (13-18)', 'Young Adults (19-30)', 'Adults (31-45)',
+                  'Middle Age (46-60)', 'Elderly (60+)'],
+}
+
+# Numeric codes and short labels of `cleaning.clean_titanic(..., labels=False)`, as the categories above
+CATEGORY_CODES = {
+    'Survived': {0: 'No', 1: 'Yes'},
+    'Pclass': {1: 'First', 2: 'Second', 3: 'Third'},
+    'Group_Age': dict(zip(AGE_LABELS, CATEGORIES['Group_Age'])),
+}
+
+CATEGORICAL_COLUMNS = ['Survived', 'Pclass', 'Sex', 'Embarked', 'deck', 'Group_Age', 'Title']
+
+# The categories of the ordered columns are fixed (`CATEGORIES`), the others come from the data and can be many
+# more on large manifests (titles, decks), so their codes are wider
+_dictionary = pa.dictionary(pa.int16(), pa.string())
+_ordered = pa.dictionary(pa.int8(), pa.string(), ordered=True)
+
+# Explicit schema of the cleaned dataset
+SCHEMA = pa.schema([
+    ('PassengerId', pa.int32()),
+    ('Survived', _ordered),
+    ('Pclass', _ordered),
+    ('Name', pa.string()),
+    ('Sex', _dictionary),
+    ('Age', pa.float32()),
+    ('SibSp', pa.int8()),
+    ('Parch', pa.int8()),
+    ('Ticket', pa.string()),
+    ('Fare', pa.float32()),
+    ('Cabin', pa.string()),
+    ('Embarked', _dictionary),
+    ('alone', pa.bool_()),
+    ('deck', _dictionary),
+    ('Group_Age', _ordered),
+    ('has_deck', pa.int8()),
+    ('Surname', pa.string()),
+    ('Title', _dictionary),
+    ('n_fam', pa.int8()),
+    ('FamilyID', pa.int32()),
+    ('Family_Survival_Rate', pa.int8()),
+])
+
+
+def to_arrow(df, categories=None):
+    """
+    Converts a cleaned dataframe to an Arrow table with the explicit `SCHEMA`.
+
+    The categorical columns are dictionary-encoded, keeping the order of `CATEGORIES`; the numeric codes and
+    short labels of `clean_titanic(..., labels=False)` are mapped to them (see `CATEGORY_CODES`), and any other
+    value outside the categories raises a ValueError instead of being lost. Columns that are not in the schema
+    (like the `Group` column left by older versions of the app) are dropped.
+
+    Parameters:
+    - df (pandas.DataFrame): The cleaned dataframe.
+    - categories (dict): Categories of the other categorical columns, so that several parts of a dataset are
+      encoded the same way. Default is None (the sorted values found in `df`).
+
+    Returns:
+    pyarrow.Table: The typed table.
+    """
+    df = df[SCHEMA.names].copy()
+    for col in CATEGORICAL_COLUMNS:
+        values = df[col].astype(object)
+        if col in CATEGORY_CODES:
+            values = values.replace(CATEGORY_CODES[col])
+        categories_col = CATEGORIES.get(col, (categories or {}).get(col))
+        if categories_col is None:
+            categories_col = sorted(values.dropna().astype(str).unique())
+        encoded = pd.Categorical(values.astype(str), categories=categories_col, ordered=col in CATEGORIES)
+        unknown = (encoded.codes == -1) & values.notna().to_numpy()
+        if unknown.any():
+            raise ValueError(f"{col!r} has values outside its categories {list(categories_col)}: {sorted(set(values[unknown].astype(str)))[:5]}")
+        df[col] = encoded
+    return pa.Table.from_pandas(df, schema=SCHEMA, preserve_index=False)
+
+
+def convert_clean(csv_path=CLEAN_CSV, out_path=CLEAN_ARROW):
+    """
+    Converts the cleaned CSV once to a columnar file with the explicit `SCHEMA`.
+
+    The format is chosen by the extension of `out_path`: '.parquet' writes Parquet, anything else writes an
+    uncompressed Arrow IPC (Feather v2) file, which can be memory-mapped without decoding.
+
+    Parameters:
+    - csv_path (str): Path of the cleaned CSV. Default is `CLEAN_CSV`.
+    - out_path (str): Path of the columnar file. Default is `CLEAN_ARROW`.
+
+    Returns:
+    str: The path of the columnar file.
+    """
+    table = to_arrow(pd.read_csv(csv_path))
+    if out_path.endswith('.parquet'):
+        pq.write_table(table, out_path)
+    else:
+        feather.write_feather(table, out_path, compression='uncompressed')
+    return out_path
+
+
+def open_writer(path, schema=SCHEMA):
+    """
+    Opens a writer to append tables to a columnar file, chosen by extension like in `convert_clean`.
+
+    Parameters:
+    - path (str): Path of the Parquet or Arrow IPC file.
+    - schema (pyarrow.Schema): Schema of the tables. Default is `SCHEMA`.
+
+    Returns:
+    pyarrow.parquet.ParquetWriter or pyarrow.ipc.RecordBatchFileWriter: The writer, to be closed after use.
+    """
+    if path.endswith('.parquet'):
+        return pq.ParquetWriter(path, schema)
+    return pa.ipc.new_file(path, schema)
+
+
+# Schema of the rows of a dataset changed by a delta: their new family columns
+UPDATE_SCHEMA = pa.schema([
+    ('position', pa.int64()),
+    ('FamilyID', pa.int32()),
+    ('Family_Survival_Rate', pa.int8()),
+])
+
+
+def delta_dir(path):
+    """Returns the directory of the deltas appended to a columnar file (see `incremental.IncrementalCleaner`)."""
+    return path + '.deltas'
+
+
+def delta_paths(path):
+    """
+    Lists the deltas appended to a columnar file, in order.
+
+    Every delta is a pair of Arrow IPC files: the new rows, with the schema of `SCHEMA`, and the updates of
+    the family columns of earlier rows, with the schema of `UPDATE_SCHEMA`.
+
+    Parameters:
+    - path (str): Path of the columnar file.
+
+    Returns:
+    list: The (rows, updates) paths of every delta.
+    """
+    directory = delta_dir(path)
+    if not os.path.isdir(directory):
+        return []
+    names = sorted(name for name in os.listdir(directory) if name.endswith('.rows.arrow'))
+    return [(os.path.join(directory, name), os.path.join(directory, name.replace('.rows.', '.updates.'))) for name in names]
+
+
+def write_delta(path, rows, updates, first_row):
+    """
+    Appends a delta to a columnar file without rewriting it.
+
+    The rows file is written last, under a temporary name that is then renamed, so a delta is either
+    complete or ignored. The updates record the number of rows the delta follows, so it is never applied
+    to another version of the file (see `apply_deltas`).
+
+    Parameters:
+    - path (str): Path of the columnar file.
+    - rows (pyarrow.Table): The new rows, with the schema of `SCHEMA`.
+    - updates (pyarrow.Table): The new family columns of earlier rows, with the schema of `UPDATE_SCHEMA`.
+    - first_row (int): Number of rows of the file and its earlier deltas, the position of the first new row.
+
+    Returns:
+    str: The path of the rows of the delta.
+    """
+    directory = delta_dir(path)
+    os.makedirs(directory, exist_ok=True)
+    rows_path = os.path.join(directory, f'{len(delta_paths(path)) + 1:06d}.rows.arrow')
+    updates = updates.replace_schema_metadata({'first_row': str(first_row)})
+    feather.write_feather(updates, rows_path.replace('.rows.', '.updates.'), compression='uncompressed')
+    feather.write_feather(rows, rows_path + '.tmp', compression='uncompressed')
+    os.replace(rows_path + '.tmp', rows_path)
+    return rows_path
+
+
+def apply_deltas(path, table):
+    """
+    Appends the rows of the deltas of a columnar file to its table and applies their updates, in order.
+
+    The updates point at rows by position, so every delta must follow exactly the rows it was written after:
+    a file rebuilt since (from the CSV, or by another cleaner) is rejected instead of being updated at the
+    wrong rows.
+
+    Parameters:
+    - path (str): Path of the columnar file.
+    - table (pyarrow.Table): The table of the file.
+
+    Returns:
+    pyarrow.Table: The table with the deltas, or `table` itself when there are none.
+    """
+    deltas = delta_paths(path)
+    if not deltas:
+        return table
+    tables, all_updates = [table], []
+    for rows_path, updates_path in deltas:
+        updates = read_table(updates_path)
+        first_row = int(updates.schema.metadata[b'first_row'])
+        n_rows = sum(part.num_rows for part in tables)
+        if first_row != n_rows:
+            raise ValueError(f"The delta {rows_path!r} follows {first_row} rows, but {path!r} and the deltas before it have {n_rows}")
+        tables.append(read_table(rows_path))
+        all_updates.append(updates)
+    # Files written with older versions of `SCHEMA` (like int8 codes) are cast to the current one
+    table = pa.concat_tables([part.cast(SCHEMA) for part in tables])
+    columns = {name: table[name].to_numpy().copy() for name in ['FamilyID', 'Family_Survival_Rate']}
+    for updates in all_updates:
+        positions = updates['position'].to_numpy()
+        for name, values in columns.items():
+            values[positions] = updates[name].to_numpy()
+    for name, values in columns.items():
+        table = table.set_column(table.schema.get_field_index(name), SCHEMA.field(name), pa.array(values, SCHEMA.field(name).type))
+    return table
+
+
+def read_table(path):
+    """
+    Reads a columnar file as an Arrow table, memory-mapping it.
+
+    Parameters:
+    - path (str): Path of the Parquet or Arrow IPC file.
+
+    Returns:
+    pyarrow.Table: The table.
+    """
+    if path.endswith('.parquet'):
+        return pq.read_table(path, memory_map=True)
+    return feather.read_table(path, memory_map=True)
+
+
+def table_to_pandas(table):
+    """
+    Converts an Arrow table to pandas keeping the strings in Arrow memory.
+
+    Dictionary columns become `pandas.Categorical`, and string columns use the pyarrow-backed string dtype,
+    so they are not copied into Python objects and stay in the memory-mapped file.
+
+    Parameters:
+    - table (pyarrow.Table): The table.
+
+    Returns:
+    pandas.DataFrame: The dataframe.
+    """
+    return table.to_pandas(types_mapper={pa.string(): pd.StringDtype('pyarrow')}.get)
+
+
+def table_to_read_only(table):
+    """
+    Converts an Arrow table to a read-only pandas dataframe, safe to share between threads.
+
+    Every column is converted on its own and kept as its own block, instead of being consolidated with the
+    columns of the same dtype into a writeable copy: numerical columns without missing values stay in the
+    memory-mapped file, and the buffers of every column are flagged as non-writeable, so writing a value
+    raises instead of changing the data seen by every other reader.
+
+    Parameters:
+    - table (pyarrow.Table): The table.
+
+    Returns:
+    pandas.DataFrame: The read-only dataframe.
+    """
+    columns = {}
+    for name, column in zip(table.column_names, table.columns):
+        series = table_to_pandas(pa.table({name: column}))[name]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            codes = series.cat.codes.to_numpy()  # Non-writeable view of the codes
+            columns[name] = pd.Categorical.from_codes(codes, dtype=series.dtype)
+        elif isinstance(series.dtype, np.dtype):
+            values = series.to_numpy()
+            values.flags.writeable = False
+            columns[name] = values
+        else:
+            columns[name] = series.array  # Immutable strings in Arrow memory
+    return pd.DataFrame(columns, copy=False)
+
+
+def build_clean(path=CLEAN_ARROW, csv_path=CLEAN_CSV):
+    """
+    Creates the columnar file of the cleaned dataset from the CSV when needed.
+
+    The columnar file is (re)built when it does not exist or is older than the CSV. A file with deltas is never
+    rebuilt, since the deltas would no longer match its rows: it raises a ValueError until the deltas are
+    compacted or removed.
+
+    Parameters:
+    - path (str): Path of the columnar file. Default is `CLEAN_ARROW`.
+    - csv_path (str): Path of the cleaned CSV. Default is `CLEAN_CSV`.
+
+    Returns:
+    str: The path of the columnar file.
+    """
+    if not os.path.exists(path) or (os.path.exists(csv_path) and os.path.getmtime(csv_path) > os.path.getmtime(path)):
+        if delta_paths(path):
+            raise ValueError(f"{path!r} needs to be rebuilt from {csv_path!r} but has deltas appended, "
+                             f"compact them (see `incremental.IncrementalCleaner.compact`) or remove {delta_dir(path)!r} first")
+        convert_clean(csv_path, path)
+    return path
+
+
+def load_clean(path=CLEAN_ARROW, csv_path=CLEAN_CSV, read_only=False):
+    """
+    Loads the cleaned dataset from its columnar file, creating it from the CSV when needed.
+
+    The columnar file is built with `build_clean`, and the deltas appended to it since are applied (see
+    `apply_deltas`).
+
+    Parameters:
+    - path (str): Path of the columnar file. Default is `CLEAN_ARROW`.
+    - csv_path (str): Path of the cleaned CSV. Default is `CLEAN_CSV`.
+    - read_only (bool): Whether to return a read-only dataframe, to be shared between sessions (see `table_to_read_only`). Default is False.
+
+    Returns:
+    pandas.DataFrame: The cleaned dataset with typed columns.
+    """
+    table = apply_deltas(build_clean(path, csv_path), read_table(path))
+    return table_to_read_only(table) if read_only else table_to_pandas(table)
+
+
+def compare_loads(csv_path=CLEAN_CSV, path=CLEAN_ARROW, repeat=5):
+    """
+    Measures the load time and memory of the CSV path against the columnar path.
+
+    Parameters:
+    - csv_path (str): Path of the cleaned CSV. Default is `CLEAN_CSV`.
+    - path (str): Path of the columnar file. Default is `CLEAN_ARROW`.
+    - repeat (int): Number of loads timed for each path, the best one is kept. Default is 5.
+
+    Returns:
+    pandas.DataFrame: Best load time (seconds) and memory of the dataframe (bytes) for each path.
+    """
+    if not os.path.exists(path):
+        convert_clean(csv_path, path)
+
+    results = {}
+    for name, load in [('csv', lambda: pd.read_csv(csv_path)), ('columnar', lambda: load_clean(path, csv_path))]:
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            df = load()
+            times.append(time.perf_counter() - start)
+        results[name] = {'seconds': min(times), 'bytes': int(df.memory_usage(deep=True).sum())}
+    return pd.DataFrame(results).T
+
+
+if __name__ == '__main__':
+    print(f'Converted to {convert_clean()}')
+    print(compare_loads())
@@ -0,0 +1,221 @@
+import numpy as np
+import pandas as pd
+
+
+# Numerical columns with outliers in the notebook
+OUTLIER_COLUMNS = ['Age', 'Fare', 'n_fam']
+
+# Width of the fences, in interquartile ranges beyond the quartiles
+IQR_FACTOR = 1.5
+
+# Compression of the quantile digests: about half as many centroids are kept
+DIGEST_COMPRESSION = 200
+
+
+def fences(quartiles, factor=IQR_FACTOR):
+    """
+    Computes the IQR fences of some columns from their quartiles.
+
+    Parameters:
+    - quartiles (pandas.DataFrame): The first ('q1') and third ('q3') quartile of every column, indexed by column.
+    - factor (float): Width of the fences, in interquartile ranges. Default is `IQR_FACTOR`.
+
+    Returns:
+    pandas.DataFrame: The 'q1', 'q3', 'lower' and 'upper' bounds of every column, indexed by column.
+    """
+    iqr = quartiles['q3'] - quartiles['q1']
+    return quartiles[['q1', 'q3']].assign(lower=quartiles['q1'] - factor * iqr, upper=quartiles['q3'] + factor * iqr)
+
+
+def iqr_bounds(df, columns=OUTLIER_COLUMNS, factor=IQR_FACTOR):
+    """
+    Computes the exact IQR fences of several columns of a dataframe that fits in memory.
+
+    Both quartiles of a column are found with a single partial sort of its values (not a full sort per quantile),
+    with the linear interpolation of `pandas.Series.quantile`.
+
+    Parameters:
+    - df (pandas.DataFrame): The input dataframe containing the data.
+    - columns (list): The numerical columns. Default is `OUTLIER_COLUMNS`.
+    - factor (float): Width of the fences, in interquartile ranges. Default is `IQR_FACTOR`.
+
+    Returns:
+    pandas.DataFrame: The bounds of every column (see `fences`).
+    """
+    quartiles = {}
+    for col in columns:
+        values = df[col].to_numpy(dtype=float, na_value=np.nan)
+        quartiles[col] = np.nanquantile(values, [0.25, 0.75])
+    return fences(pd.DataFrame.from_dict(quartiles, orient='index', columns=['q1', 'q3']), factor)
+
+
+class QuantileDigest:
+    """
+    Mergeable approximate quantiles of a stream of values (a merging t-digest).
+
+    The values are summarized as centroids (mean, weight) sorted by mean. Every update sorts the centroids with the
+    new values and merges the neighbours that fall in the same unit of the scale k = compression / (2 pi) *
+    arcsin(2q - 1), so the centroids are small near the extremes and large near the median, and there are
+    about `compression` / 2 of them whatever the number of values. Digests of different chunks are merged the same
+    way, so the quantiles of a manifest can be computed in parallel or one chunk at a time.
+
+    Parameters:
+    - compression (int): The accuracy of the digest. Default is `DIGEST_COMPRESSION`.
+    """
+
+    def __init__(self, compression=DIGEST_COMPRESSION):
+        self.compression = compression
+        self.means = np.array([], dtype=float)
+        self.weights = np.array([], dtype=float)
+        self.count = 0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def __len__(self):
+        return len(self.means)
+
+    def _compress(self, means, weights):
+        """Merges the centroids with some new ones, in a single vectorized pass."""
+        means = np.concatenate([self.means, means])
+        weights = np.concatenate([self.weights, weights])
+        order = np.argsort(means, kind='stable')
+        means, weights = means[order], weights[order]
+
+        # Every centroid joins the cluster of the unit of k where its first value falls
+        total = weights.sum()
+        before = np.cumsum(weights) - weights
+        k = np.floor(self.compression / (2 * np.pi) * np.arcsin(np.clip(2 * before / total - 1, -1, 1)))
+        cluster = np.concatenate(([0], np.cumsum(k[1:] != k[:-1])))
+
+        self.weights = np.bincount(cluster, weights=weights)
+        self.means = np.bincount(cluster, weights=weights * means) / self.weights
+        self.count = int(round(total))
+
+    def update(self, values):
+        """Adds some values to the digest (missing values are ignored) and returns it."""
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        if len(values):
+            self.min = min(self.min, values.min())
+            self.max = max(self.max, values.max())
+            self._compress(values, np.ones(len(values)))
+        return self
+
+    def merge(self, other):
+        """Adds the values of another digest and returns this one."""
+        if other.count:
+            self.min = min(self.min, other.min)
+            self.max = max(self.max, other.max)
+            self._compress(other.means, other.weights)
+        return self
+
+    def quantile(self, q):
+        """
+        Estimates some quantiles of the values.
+
+        The centroids are placed at the middle of their weight, and the quantiles are interpolated between them,
+        and between the extreme centroids and the minimum and maximum.
+
+        Parameters:
+        - q (float or list): The quantiles, between 0 and 1.
+
+        Returns:
+        numpy.ndarray: The estimate of every quantile (NaN when the digest is empty).
+        """
+        q = np.atleast_1d(np.asarray(q, dtype=float))
+        if not self.count:
+            return np.full(len(q), np.nan)
+        centers = np.cumsum(self.weights) - self.weights / 2
+        positions = np.concatenate(([0], centers, [self.count]))
+        values = np.concatenate(([self.min], self.means, [self.max]))
+        return np.interp(q * self.count, positions, values)
+
+
+class OutlierStats:
+    """
+    Mergeable quartiles of several numerical columns, to compute their IQR fences one chunk at a time.
+
+    Every column keeps a `QuantileDigest`, so a single pass over the chunks (or the merge of the statistics of
+    several readers) gives the fences of every column, with a memory that does not depend on the number of rows.
+    The fences are approximate: use `iqr_bounds` for the exact ones of a dataframe that fits in memory.
+
+    Parameters:
+    - columns (list): The numerical columns. Default is `OUTLIER_COLUMNS`.
+    - compression (int): The accuracy of the digests (see `QuantileDigest`). Default is `DIGEST_COMPRESSION`.
+    """
+
+    def __init__(self, columns=OUTLIER_COLUMNS, compression=DIGEST_COMPRESSION):
+        self.columns = list(columns)
+        self.digests = {col: QuantileDigest(compression) for col in self.columns}
+
+    def update(self, chunk):
+        """Adds a chunk of the data to the statistics and returns them."""
+        for col in self.columns:
+            self.digests[col].update(chunk[col].to_numpy(dtype=float, na_value=np.nan))
+        return self
+
+    def merge(self, other):
+        """Adds the statistics of another part of the data and returns these."""
+        for col in self.columns:
+            self.digests[col].merge(other.digests[col])
+        return self
+
+    def bounds(self, factor=IQR_FACTOR):
+        """
+        Computes the approximate IQR fences of every column.
+
+        Parameters:
+        - factor (float): Width of the fences, in interquartile ranges. Default is `IQR_FACTOR`.
+
+        Returns:
+        pandas.DataFrame: The bounds of every column (see `fences`).
+        """
+        quartiles = {col: self.digests[col].quantile([0.25, 0.75]) for col in self.columns}
+        return fences(pd.DataFrame.from_dict(quartiles, orient='index', columns=['q1', 'q3']), factor)
+
+
+def _inside(df, col, lower, upper):
+    """Returns whether every value of `col` is strictly between `lower` and `upper` (False for missing values)."""
+    values = df[col].to_numpy(dtype=float, na_value=np.nan)
+    return (values > lower) & (values < upper)
+
+
+def inlier_masks(df, bounds):
+    """
+    Flags the rows of a dataframe inside the fences of every column, without copying the rows.
+
+    Like the notebook's `remove_outliers`, a value is kept when it is strictly between the fences, so missing
+    values are flagged as outliers.
+
+    Parameters:
+    - df (pandas.DataFrame): The input dataframe containing the data.
+    - bounds (pandas.DataFrame): The fences of the columns, as returned by `iqr_bounds` or `OutlierStats.bounds`.
+
+    Returns:
+    pandas.DataFrame: A boolean column for every column of `bounds`, True for the rows inside its fences.
+    """
+    masks = {col: _inside(df, col, lower, upper) for col, lower, upper in zip(bounds.index, bounds['lower'], bounds['upper'])}
+    return pd.DataFrame(masks, index=df.index)
+
+
+def inlier_mask(df, bounds, columns=None):
+    """
+    Flags the rows of a dataframe inside the fences of every given column at once.
+
+    The mask can be passed to the violin and histogram plotters of `functions.py` (their `mask` parameter)
+    in place of a filtered copy of the dataframe.
+
+    Parameters:
+    - df (pandas.DataFrame): The input dataframe containing the data.
+    - bounds (pandas.DataFrame): The fences of the columns, as returned by `iqr_bounds` or `OutlierStats.bounds`.
+    - columns (list): The columns whose outliers are removed. Default is None (every column of `bounds`).
+
+    Returns:
+    numpy.ndarray: True for the rows inside the fences of every column.
+    """
+    if columns is not None:
+        bounds = bounds.loc[list(columns)]
+    mask = np.ones(len(df), dtype=bool)
+    for col, lower, upper in zip(bounds.index, bounds['lower'], bounds['upper']):
+        mask &= _inside(df, col, lower, upper)
+    return mask
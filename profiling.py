@@ -0,0 +1,190 @@
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+
+
+# Profiling is enabled by setting TITANIC_PROFILE to the path of the JSON lines file (or to 1 for 'profile.jsonl'),
+# and TITANIC_PROFILE_MEMORY=1 also measures the peak allocations with tracemalloc
+ENV_PATH = 'TITANIC_PROFILE'
+ENV_MEMORY = 'TITANIC_PROFILE_MEMORY'
+DEFAULT_PATH = 'profile.jsonl'
+
+# Last records, kept in memory for the debug panel of the app
+RECORDS = deque(maxlen=1_000)
+
+_settings = {'enabled': False, 'path': None, 'memory': False}
+_lock = threading.Lock()
+_local = threading.local()
+
+
+def enable(path=DEFAULT_PATH, memory=False):
+    """
+    Enables the profiling of the stages.
+
+    Parameters:
+    - path (str): Path of the JSON lines file where every record is appended. Default is 'profile.jsonl' (None keeps them in memory only).
+    - memory (bool): Whether to measure the peak allocations of every stage with `tracemalloc`, which slows down the code. Default is False.
+    """
+    _settings.update(enabled=True, path=path, memory=memory)
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def disable():
+    """Disables the profiling of the stages."""
+    _settings['enabled'] = False
+    if _settings['memory'] and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    _settings['memory'] = False
+
+
+def is_enabled():
+    """Returns whether the stages are being profiled."""
+    return _settings['enabled']
+
+
+def _stack():
+    """Returns the stack of open stages of the current thread."""
+    if not hasattr(_local, 'stack'):
+        _local.stack = []
+        _local.collectors = []
+    return _local.stack
+
+
+def _write(record):
+    """Keeps a record in memory, in the open collectors of the thread and in the JSON lines file."""
+    RECORDS.append(record)
+    for collector in _local.collectors:
+        collector.append(record)
+    if _settings['path']:
+        line = json.dumps(record, default=str)
+        with _lock, open(_settings['path'], 'a') as f:
+            f.write(line + '\n')
+
+
+class _NullStage:
+    """Stage used when the profiling is disabled: it does nothing."""
+
+    def __enter__(self):
+        return {}
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    """Measures the wall time (and the peak allocations) of a block of code."""
+
+    def __init__(self, name, fields):
+        self.record = {'stage': name, **fields}
+
+    def __enter__(self):
+        stack = _stack()
+        if stack:
+            self.record['stage'] = f"{stack[-1].record['stage']}/{self.record['stage']}"
+        self.memory = _settings['memory'] and tracemalloc.is_tracing()
+        if self.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            # The peak is reset for this stage, so the parent keeps the peak reached so far
+            if stack:
+                stack[-1].peak = max(stack[-1].peak, peak)
+            tracemalloc.reset_peak()
+            self.start_memory = current
+            self.peak = current
+        stack.append(self)
+        self.start = time.perf_counter()
+        return self.record
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self.start
+        stack = _stack()
+        stack.pop()
+        self.record['seconds'] = seconds
+        if self.memory:
+            self.peak = max(self.peak, tracemalloc.get_traced_memory()[1])
+            self.record['peak_bytes'] = self.peak - self.start_memory
+            if stack:
+                stack[-1].peak = max(stack[-1].peak, self.peak)
+        if exc_type is not None:
+            self.record['error'] = exc_type.__name__
+        self.record['time'] = time.time()
+        _write(self.record)
+        return False
+
+
+def stage(name, **fields):
+    """
+    Context manager that profiles a stage of the code.
+
+    It records the wall time and, when enabled, the peak allocations of the block, plus the given fields
+    (like the number of rows or groups). Counts known only inside the block can be added to the record
+    returned by `with`. Stages opened inside another one are named 'parent/child'.
+    When the profiling is disabled it does nothing.
+
+    Parameters:
+    - name (str): Name of the stage.
+    - **fields: Values stored with the record, e.g. rows=len(df).
+
+    Returns:
+    context manager: Yields the record (a dict) of the stage.
+    """
+    if not _settings['enabled']:
+        return _NULL_STAGE
+    return _Stage(name, fields)
+
+
+def profiled(name=None):
+    """
+    Decorator that profiles every call of a function as a stage (see `stage`).
+
+    When the first argument has a length (like a dataframe), it is recorded as the number of rows.
+
+    Parameters:
+    - name (str): Name of the stage. Default is None (the name of the function).
+
+    Returns:
+    callable: The decorator.
+    """
+    def decorator(function):
+        stage_name = name or function.__name__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _settings['enabled']:
+                return function(*args, **kwargs)
+            fields = {'rows': len(args[0])} if args and hasattr(args[0], '__len__') else {}
+            with _Stage(stage_name, fields):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def collect():
+    """
+    Context manager that collects the records of the stages that end inside it, in the current thread.
+
+    Used by the app to show the stages of the last rerun.
+
+    Returns:
+    context manager: Yields the list of records.
+    """
+    _stack()
+    records = []
+    _local.collectors.append(records)
+    try:
+        yield records
+    finally:
+        _local.collectors.remove(records)
+
+
+if os.environ.get(ENV_PATH):
+    enable(DEFAULT_PATH if os.environ[ENV_PATH] == '1' else os.environ[ENV_PATH], memory=os.environ.get(ENV_MEMORY) == '1')
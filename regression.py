@@ -0,0 +1,140 @@
+import numpy as np
+
+from correlation import iter_frames
+
+
+class LinearFit:
+    """
+    Result of a simple linear regression, with the same fields as `scipy.stats.linregress`.
+
+    Attributes:
+    - slope, intercept (float): The regression line.
+    - r_value, r_squared (float): The correlation coefficient and the coefficient of determination.
+    - p_value (float): Two-sided p-value of the test that the slope is zero.
+    - std_err, intercept_stderr (float): Standard errors of the slope and of the intercept.
+    - n (int): Number of points.
+    """
+
+    def __init__(self, n, mean_x, mean_y, sxx, syy, sxy):
+        self.n = n
+        self.mean_x = mean_x
+        self.sxx = sxx
+        self.slope = sxy / sxx if sxx > 0 else np.nan
+        self.intercept = mean_y - self.slope * mean_x
+        self.r_value = sxy / np.sqrt(sxx * syy) if sxx > 0 and syy > 0 else np.nan
+        self.r_squared = self.r_value ** 2
+
+        # Residual variance, with n - 2 degrees of freedom
+        self.dof = n - 2
+        residual = max(syy - self.slope * sxy, 0.0) if sxx > 0 else np.nan
+        self.residual_std = np.sqrt(residual / self.dof) if self.dof > 0 else np.nan
+        self.std_err = self.residual_std / np.sqrt(sxx) if sxx > 0 else np.nan
+        self.intercept_stderr = self.std_err * np.sqrt(sxx / n + mean_x ** 2) if n > 0 else np.nan
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.t_value = self.slope / self.std_err
+
+    def __repr__(self):
+        return (f'LinearFit(slope={self.slope:.4g}, intercept={self.intercept:.4g}, r_squared={self.r_squared:.4g}, '
+                f'p_value={self.p_value:.3g}, n={self.n})')
+
+    @property
+    def p_value(self):
+        """Two-sided p-value of the test that the slope is zero (scipy is only imported here and in `confidence_band`)."""
+        from scipy import stats as sps
+
+        return 2 * sps.t.sf(abs(self.t_value), self.dof) if self.dof > 0 else np.nan
+
+    def predict(self, x):
+        """Returns the values of the regression line at `x`."""
+        return self.intercept + self.slope * np.asarray(x, dtype=float)
+
+    def confidence_band(self, x, level=0.95):
+        """
+        Computes the analytic confidence band of the regression line (the mean response) at `x`.
+
+        Parameters:
+        - x (numpy.ndarray): The points where the band is computed.
+        - level (float): Confidence level. Default is 0.95.
+
+        Returns:
+        tuple: (lower, upper) limits of the band at `x`.
+        """
+        from scipy import stats as sps
+
+        x = np.asarray(x, dtype=float)
+        t = sps.t.ppf(0.5 + level / 2, self.dof)
+        margin = t * self.residual_std * np.sqrt(1 / self.n + (x - self.mean_x) ** 2 / self.sxx)
+        y = self.predict(x)
+        return y - margin, y + margin
+
+
+class RegressionStats:
+    """
+    Mergeable sufficient statistics of a simple linear regression of y on x.
+
+    Keeps the number of points, the means and the centred sums of squares and cross-products, updated
+    chunk by chunk and merged between processes with the parallel algorithm of Chan et al., so the fit does
+    not need the points. Points with a missing x or y are skipped.
+    """
+
+    def __init__(self):
+        self.n = 0
+        self.mean_x = 0.0
+        self.mean_y = 0.0
+        self.sxx = 0.0
+        self.syy = 0.0
+        self.sxy = 0.0
+
+    def _merge(self, n, mean_x, mean_y, sxx, syy, sxy):
+        """Adds the statistics of other points."""
+        if n == 0:
+            return
+        total = self.n + n
+        dx, dy = mean_x - self.mean_x, mean_y - self.mean_y
+        factor = self.n * n / total
+        self.sxx += sxx + dx * dx * factor
+        self.syy += syy + dy * dy * factor
+        self.sxy += sxy + dx * dy * factor
+        self.mean_x += dx * n / total
+        self.mean_y += dy * n / total
+        self.n = total
+
+    def update(self, x, y):
+        """Adds points to the statistics and returns them."""
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        valid = ~(np.isnan(x) | np.isnan(y))
+        x, y = x[valid], y[valid]
+        if len(x):
+            mean_x, mean_y = x.mean(), y.mean()
+            dx, dy = x - mean_x, y - mean_y
+            self._merge(len(x), mean_x, mean_y, dx @ dx, dy @ dy, dx @ dy)
+        return self
+
+    def merge(self, other):
+        """Adds the statistics of other points to these ones and returns them."""
+        self._merge(other.n, other.mean_x, other.mean_y, other.sxx, other.syy, other.sxy)
+        return self
+
+    def fit(self):
+        """Returns the `LinearFit` of the points."""
+        return LinearFit(self.n, self.mean_x, self.mean_y, self.sxx, self.syy, self.sxy)
+
+
+def regression_stats(source, x_var, y_var, chunksize=100_000):
+    """
+    Computes the `RegressionStats` of two columns of a dataset one chunk at a time.
+
+    Parameters:
+    - source (pandas.DataFrame, str or iterable): A dataframe, the path of a columnar file (see `loader`), or an iterable of dataframes.
+    - x_var (str): The column of the independent variable.
+    - y_var (str): The column of the dependent variable.
+    - chunksize (int): Number of rows of every chunk. Default is 100,000.
+
+    Returns:
+    RegressionStats: The statistics of the dataset.
+    """
+    stats = RegressionStats()
+    for chunk in iter_frames(source, chunksize):
+        stats.update(chunk[x_var].to_numpy(dtype=float, na_value=np.nan), chunk[y_var].to_numpy(dtype=float, na_value=np.nan))
+    return stats
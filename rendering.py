@@ -0,0 +1,118 @@
+import numpy as np
+import pandas as pd
+import plotly.graph_objs as go
+
+# datashader is optional: when it is not installed the density is rasterized with NumPy
+try:
+    import datashader as ds
+except ImportError:
+    ds = None
+
+
+RENDER_MODES = ['auto', 'svg', 'webgl', 'raster']
+
+
+def choose_render_mode(n_points, mode='auto', webgl_threshold=10_000, raster_threshold=500_000):
+    """
+    Chooses how to draw the points of a figure depending on how many there are.
+
+    - 'svg': one `go.Scatter` trace per group, fine for small datasets.
+    - 'webgl': one `go.Scattergl` trace per group, drawn by the GPU of the browser.
+    - 'raster': the density of points is rasterized on the server and sent as a single heatmap.
+
+    Parameters:
+    - n_points (int): Number of points to draw.
+    - mode (str): One of `RENDER_MODES`. With 'auto' the mode is chosen with the thresholds. Default is 'auto'.
+    - webgl_threshold (int): Number of points from which WebGL is used. Default is 10,000.
+    - raster_threshold (int): Number of points from which the density is rasterized. Default is 500,000.
+
+    Returns:
+    str: The render mode, 'svg', 'webgl' or 'raster'.
+    """
+    if mode not in RENDER_MODES:
+        raise ValueError(f"Unknown render mode {mode!r}, expected one of {RENDER_MODES}")
+    if mode != 'auto':
+        return mode
+    if n_points >= raster_threshold:
+        return 'raster'
+    if n_points >= webgl_threshold:
+        return 'webgl'
+    return 'svg'
+
+
+def density_raster(x, y, width=300, height=200):
+    """
+    Counts the points that fall in every pixel of a `width` x `height` grid covering all of them.
+
+    datashader is used when it is installed, otherwise the counts are computed with `numpy.histogram2d`.
+
+    Parameters:
+    - x (numpy.ndarray): The x coordinates of the points.
+    - y (numpy.ndarray): The y coordinates of the points.
+    - width (int): Number of pixels of the grid along x. Default is 300.
+    - height (int): Number of pixels of the grid along y. Default is 200.
+
+    Returns:
+    tuple: (counts, x_centers, y_centers) with the counts as a (height, width) array and the pixel centers.
+    """
+    x_range = (float(np.min(x)), float(np.max(x)) + 1e-9)
+    y_range = (float(np.min(y)), float(np.max(y)) + 1e-9)
+
+    if ds is not None:
+        canvas = ds.Canvas(plot_width=width, plot_height=height, x_range=x_range, y_range=y_range)
+        counts = canvas.points(pd.DataFrame({'x': x, 'y': y}), 'x', 'y', agg=ds.count()).values
+    else:
+        counts, _, _ = np.histogram2d(y, x, bins=(height, width), range=(y_range, x_range))
+
+    x_step = (x_range[1] - x_range[0]) / width
+    y_step = (y_range[1] - y_range[0]) / height
+    x_centers = x_range[0] + x_step * (np.arange(width) + 0.5)
+    y_centers = y_range[0] + y_step * (np.arange(height) + 0.5)
+    return counts, x_centers, y_centers
+
+
+def density_trace(x, y, width=300, height=200):
+    """
+    Builds a heatmap trace with the density of points, whose size does not depend on the number of points.
+
+    Parameters:
+    - x (numpy.ndarray): The x coordinates of the points.
+    - y (numpy.ndarray): The y coordinates of the points.
+    - width (int): Number of pixels of the raster along x. Default is 300.
+    - height (int): Number of pixels of the raster along y. Default is 200.
+
+    Returns:
+    plotly.graph_objs.Heatmap: The density trace. Empty pixels are transparent.
+    """
+    counts, x_centers, y_centers = density_raster(x, y, width=width, height=height)
+    z = np.where(counts > 0, counts, np.nan)
+    return go.Heatmap(
+        x=x_centers,
+        y=y_centers,
+        z=z,
+        colorscale='Blues',
+        showscale=False,
+        name='Passengers',
+        hovertemplate='Passengers: %{z}<extra></extra>',
+    )
+
+
+def points_in_box(x, y, box, max_points=5_000):
+    """
+    Returns the positions of the points inside a selected rectangle, up to `max_points`.
+
+    Used to show the hover of single passengers only after zooming into a region of the raster.
+
+    Parameters:
+    - x (numpy.ndarray): The x coordinates of the points.
+    - y (numpy.ndarray): The y coordinates of the points.
+    - box (dict): The selected rectangle, with the 'x' and 'y' ranges as returned by the Streamlit selection.
+    - max_points (int): Maximum number of points returned. Default is 5,000.
+
+    Returns:
+    numpy.ndarray: The positions of the points inside the rectangle.
+    """
+    x0, x1 = sorted(box['x'])
+    y0, y1 = sorted(box['y'])
+    inside = np.flatnonzero((x >= x0) & (x <= x1) & (y >= y0) & (y <= y1))
+    return inside[:max_points]
@@ -0,0 +1,167 @@
+import os
+import tempfile
+import warnings
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from bitmap_index import BitmapIndex
+from loader import CLEAN_ARROW, CLEAN_CSV, apply_deltas, build_clean, read_table, table_to_read_only
+
+
+FORMATS = ['png', 'svg', 'pdf', 'html']
+
+# Dataframe of every worker and the bitmap index of its categorical columns, built once by `_init_worker`
+_frame = None
+_index = None
+# Last group selected by the worker, as several specs usually share the same group
+_group = (None, None)
+
+
+def _init_worker(path):
+    """
+    Loads the dataset once per worker process, memory-mapping the columnar file.
+
+    The rows appended to the file since it was compacted are included (see `loader.apply_deltas`), like in
+    `loader.load_clean`. The dataframe is read-only (see `loader.table_to_read_only`): its numerical columns stay
+    in the mapped pages shared by every worker and its strings in Arrow memory, instead of a pandas copy per worker.
+    """
+    global _frame, _index
+    import matplotlib
+    matplotlib.use('Agg')
+    warnings.filterwarnings('ignore')
+    _frame = table_to_read_only(apply_deltas(path, read_table(path)))
+    _index = BitmapIndex(_frame)
+
+
+def _select_group(conditions):
+    """
+    Returns the rows of the worker dataset that match `conditions`, reusing the last group.
+
+    Conditions on indexed columns are resolved with the bitmap index, as a selection that the plotters accept,
+    the rest with `functions.create_group`.
+    """
+    global _group
+    from functions import create_group
+
+    key = tuple(map(tuple, conditions or []))
+    if _group[0] != key:
+        if all(col in _index for col, _ in key):
+            _group = (key, _index.select(key))
+        else:
+            _group = (key, create_group(_frame, list(key)))
+    return _group[1]
+
+
+def _render(task):
+    """Renders one plot spec in a worker and saves it. Returns the path of the file."""
+    import matplotlib.pyplot as plt
+    import functions
+
+    spec, path = task
+    plot = getattr(functions, spec['plot'])
+    kwargs = dict(spec.get('kwargs', {}))
+    df = _select_group(spec.get('group'))
+
+    if spec['plot'].startswith('px_'):
+        # Plotly helpers return the figure instead of showing it
+        fig = plot(df, show=False, **kwargs)
+        if path.endswith('.html'):
+            fig.write_html(path)
+        else:
+            fig.write_image(path)
+    else:
+        # Matplotlib helpers draw on the current figure, `plt.show` does nothing with Agg
+        plot(df, **kwargs)
+        plt.gcf().savefig(path, bbox_inches='tight', dpi=spec.get('dpi', 100))
+        plt.close('all')
+    return path
+
+
+def spec_path(spec, i, out_dir, fmt='png'):
+    """
+    Builds the output path of a plot spec.
+
+    Parameters:
+    - spec (dict): The plot spec.
+    - i (int): Position of the spec in the report, used when it has no name.
+    - out_dir (str): Directory of the report.
+    - fmt (str): Default file format, one of `FORMATS`. Default is 'png'.
+
+    Returns:
+    str: The path of the file.
+    """
+    name = spec.get('name', f"{i:04d}_{spec['plot']}")
+    return os.path.join(out_dir, f"{name}.{spec.get('format', fmt)}")
+
+
+def render_report(specs, source=CLEAN_ARROW, out_dir='reports', fmt='png', processes=None, chunksize=4, csv_path=CLEAN_CSV):
+    """
+    Renders a batch of plots headless (Agg backend) across a pool of processes.
+
+    Every spec is a dict with:
+    - 'plot' (str): Name of a plotting function of `functions`, e.g. 'cathegorical_simple' or 'px_violin_simple'.
+    - 'kwargs' (dict): Arguments of the function besides the dataframe.
+    - 'group' (list): Optional conditions of `functions.create_group`, e.g. [('Sex', 'male')].
+    - 'name' (str): Optional file name without extension.
+    - 'format' (str): Optional file format, one of `FORMATS`.
+
+    The dataset is not pickled with every task: each worker memory-maps the columnar file once when it
+    starts, so the pages are shared between the processes through the OS cache. A columnar file is built from
+    the CSV first when needed, like in `loader.load_clean`, and a dataframe is written once to a temporary
+    Arrow file. Plotly figures need `kaleido` for the image formats.
+
+    Parameters:
+    - specs (list): The plot specs.
+    - source (str or pandas.DataFrame): Path of a columnar file (see `loader`), or a dataframe. Default is `CLEAN_ARROW`.
+    - out_dir (str): Directory where the files are written. Default is 'reports'.
+    - fmt (str): File format of the specs without one, one of `FORMATS`. Default is 'png'.
+    - processes (int): Number of worker processes. Default is None (the number of CPUs).
+    - chunksize (int): Number of specs sent to a worker at once. Default is 4.
+    - csv_path (str): Path of the cleaned CSV the columnar file is built from (see `loader.build_clean`). Default is `CLEAN_CSV`.
+
+    Returns:
+    list: The paths of the files, in the order of `specs`.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    tasks = [(spec, spec_path(spec, i, out_dir, fmt)) for i, spec in enumerate(specs)]
+    for spec, path in tasks:
+        if os.path.splitext(path)[1][1:] not in FORMATS:
+            raise ValueError(f"Unknown format of {path!r}, expected one of {FORMATS}")
+
+    tmp_path = None
+    if isinstance(source, pd.DataFrame):
+        # Write the dataframe once so that the workers can map it
+        fd, tmp_path = tempfile.mkstemp(suffix='.arrow')
+        os.close(fd)
+        feather.write_feather(pa.Table.from_pandas(source, preserve_index=False), tmp_path, compression='uncompressed')
+        source = tmp_path
+    else:
+        build_clean(source, csv_path)
+
+    try:
+        # spawn: the workers do not inherit the state (threads, figures) of the calling process
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=processes, mp_context=context,
+                                 initializer=_init_worker, initargs=(source,)) as executor:
+            return list(executor.map(_render, tasks, chunksize=chunksize))
+    finally:
+        if tmp_path is not None:
+            os.remove(tmp_path)
+
+
+if __name__ == '__main__':
+    variables = ['Survived', 'Pclass', 'Group_Age', 'n_fam', 'Embarked', 'alone', 'deck']
+    groups = {'all': [], 'male': [('Sex', 'male')], 'female': [('Sex', 'female')]}
+    specs = []
+    for name, group in groups.items():
+        specs += [
+            {'plot': 'cathegorical_simple', 'kwargs': {'variables': variables}, 'group': group, 'name': f'{name}_cathegorical'},
+            {'plot': 'numerical_simple', 'kwargs': {'variables': ['Age', 'Fare']}, 'group': group, 'name': f'{name}_numerical'},
+            {'plot': 'mixed_pairs', 'kwargs': {'num_var': 'Age', 'cath_var': ['Survived', 'Pclass']}, 'group': group, 'name': f'{name}_mixed'},
+        ]
+    for path in render_report(specs):
+        print(path)
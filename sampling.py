@@ -0,0 +1,55 @@
+import numpy as np
+
+
+def density_downsample(x, y, max_points=5_000, bins=64, rng=None):
+    """
+    Selects at most `max_points` points of a scatter plot, keeping its shape and its sparse regions.
+
+    The points are binned on a `bins` x `bins` grid and every cell keeps about the same maximum number of
+    points, chosen at random: the cap is the largest one that fits in `max_points`. Sparse cells (like outliers)
+    keep all their points, while dense cells are thinned, so the sample shows where there are points
+    instead of only the densest region.
+
+    Parameters:
+    - x (numpy.ndarray): The x coordinates of the points.
+    - y (numpy.ndarray): The y coordinates of the points.
+    - max_points (int): Maximum number of points kept. Default is 5,000.
+    - bins (int): Number of cells of the grid along each axis. Default is 64.
+    - rng (numpy.random.Generator): Random generator, for reproducible samples. Default is None (a new one).
+
+    Returns:
+    numpy.ndarray: The sorted positions of the points kept (points with a missing coordinate are dropped).
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    positions = np.flatnonzero(~(np.isnan(x) | np.isnan(y)))
+    if len(positions) <= max_points:
+        return positions
+    rng = np.random.default_rng() if rng is None else rng
+    x, y = x[positions], y[positions]
+
+    def cell_of(values):
+        low, high = values.min(), values.max()
+        scaled = (values - low) / (high - low) * bins if high > low else np.zeros(len(values))
+        return np.clip(scaled.astype(np.intp), 0, bins - 1)
+
+    cells = cell_of(x) * bins + cell_of(y)
+    counts = np.bincount(cells, minlength=bins * bins)
+
+    # Largest cap with sum(min(counts, cap)) <= max_points
+    sizes = np.sort(counts[counts > 0])
+    kept = np.cumsum(sizes) + sizes * np.arange(len(sizes) - 1, -1, -1)
+    fits = np.flatnonzero(kept <= max_points)
+    if len(fits):
+        last = fits[-1]
+        cap = sizes[last] + (max_points - kept[last]) // (len(sizes) - last - 1 or 1)
+    else:
+        cap = max_points // len(sizes)
+    cap = max(int(cap), 1)
+
+    # Keep every point with probability cap / count of its cell: about min(count, cap) points per cell
+    keep = rng.random(len(cells)) * counts[cells] < cap
+    sample = np.flatnonzero(keep)
+    if len(sample) > max_points:
+        sample = rng.choice(sample, max_points, replace=False)
+    return positions[np.sort(sample)]
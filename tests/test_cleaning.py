@@ -0,0 +1,52 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from cleaning import RAW_CSV, clean_titanic, clean_titanic_chunked, load_raw
+from loader import CLEAN_CSV, read_table, table_to_pandas, to_arrow
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope='module')
+def cleaned():
+    """The manifest cleaned in memory, typed as in its columnar file."""
+    return table_to_pandas(to_arrow(clean_titanic(load_raw(os.path.join(ROOT, RAW_CSV)))))
+
+
+def test_matches_notebook_csv():
+    cleaned = clean_titanic(load_raw(os.path.join(ROOT, RAW_CSV)))
+    # The CSV keeps the `Group` column left by older versions of the app
+    expected = pd.read_csv(os.path.join(ROOT, CLEAN_CSV)).drop(columns='Group')
+    text = cleaned.select_dtypes(exclude=['number', 'bool']).columns
+    cleaned[text] = cleaned[text].astype(object).where(cleaned[text].notna(), np.nan)
+    pd.testing.assert_frame_equal(cleaned, expected)
+
+
+@pytest.mark.parametrize('extension', ['arrow', 'parquet'])
+@pytest.mark.parametrize('chunksize', [37, 100, 891])
+def test_chunked_matches_in_memory(cleaned, tmp_path, chunksize, extension):
+    out_path = str(tmp_path / f'titanic_clean.{extension}')
+    clean_titanic_chunked(os.path.join(ROOT, RAW_CSV), out_path, chunksize)
+    chunked = table_to_pandas(read_table(out_path))
+    pd.testing.assert_frame_equal(chunked, cleaned)
+
+
+@pytest.mark.parametrize('col', ['Ticket', 'Name'])
+def test_missing_family_key_has_no_family(tmp_path, col):
+    raw = load_raw(os.path.join(ROOT, RAW_CSV))
+    family_id = clean_titanic(raw)['FamilyID']
+    # Two families lose their ticket, or their surname with a name without comma
+    members = family_id.isin(family_id[family_id >= 0].unique()[:2]).to_numpy()
+    raw[col] = raw[col].mask(members, None if col == 'Ticket' else 'Nobody')
+
+    cleaned = clean_titanic(raw)
+    assert (cleaned.loc[members, 'FamilyID'] == -1).all()
+    assert (cleaned.loc[members, 'Family_Survival_Rate'] == -1).all()
+
+    out_path = str(tmp_path / 'titanic_clean.arrow')
+    clean_titanic_chunked(lambda: (raw[start:start + 100] for start in range(0, len(raw), 100)), out_path)
+    pd.testing.assert_frame_equal(table_to_pandas(read_table(out_path)), table_to_pandas(to_arrow(cleaned)))
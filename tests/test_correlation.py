@@ -0,0 +1,46 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from cleaning import RAW_CSV, load_raw
+from correlation import CorrelationStats, correlation_stats
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+NUMERIC = ['Age', 'Fare', 'Pclass', 'SibSp', 'Survived']
+CATEGORICAL = ['Sex', 'Embarked']
+COLUMNS = NUMERIC + ['Sex_male', 'Sex_female', 'Embarked_S', 'Embarked_Q', 'Embarked_C']
+
+
+@pytest.fixture(scope='module')
+def raw():
+    """The raw manifest, with missing ages and ports of embarkation."""
+    return load_raw(os.path.join(ROOT, RAW_CSV)).astype({col: object for col in CATEGORICAL})
+
+
+def dummies_corr(df):
+    """The correlation matrix of the notebook: `DataFrame.corr` on the dummy columns."""
+    dummies = pd.get_dummies(df[CATEGORICAL]).astype(int)
+    return pd.concat([df[NUMERIC], dummies], axis=1).reindex(columns=COLUMNS).corr()
+
+
+@pytest.mark.parametrize('chunksize', [7, 100, 891])
+def test_matches_pairwise_corr(raw, chunksize):
+    stats = correlation_stats(raw, NUMERIC, CATEGORICAL, chunksize=chunksize)
+    pd.testing.assert_frame_equal(stats.correlation(COLUMNS), dummies_corr(raw), atol=1e-12)
+
+
+def test_merge(raw):
+    stats = CorrelationStats(NUMERIC, CATEGORICAL).update(raw[400:])
+    stats.merge(CorrelationStats(NUMERIC, CATEGORICAL).update(raw[:400]))
+    pd.testing.assert_frame_equal(stats.correlation(COLUMNS), dummies_corr(raw), atol=1e-12)
+
+
+def test_missing_category_is_nan(raw):
+    men = raw[raw['Sex'] == 'male']
+    matrix = correlation_stats(men, NUMERIC, CATEGORICAL).correlation(COLUMNS)
+    assert matrix.loc['Sex_female'].isna().all()
+    pd.testing.assert_frame_equal(matrix, dummies_corr(men), atol=1e-12)
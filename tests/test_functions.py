@@ -0,0 +1,62 @@
+import os
+
+import matplotlib
+import matplotlib.pyplot as plt
+import pytest
+
+import functions
+from bitmap_index import BitmapIndex, Selection
+from cleaning import RAW_CSV, clean_titanic, load_raw
+
+
+matplotlib.use('Agg')
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope='module')
+def df():
+    """The cleaned manifest, with the port of embarkation of a few passengers missing."""
+    df = clean_titanic(load_raw(os.path.join(ROOT, RAW_CSV))).astype({'Embarked': object})
+    df.loc[:5, 'Embarked'] = None
+    return df
+
+
+@pytest.fixture(autouse=True)
+def figures(monkeypatch):
+    monkeypatch.setattr(plt, 'show', lambda *args, **kwargs: None)
+    yield
+    plt.close('all')
+
+
+def test_simple_percentages_count_missing_values(df):
+    functions.cathegorical_simple(df, ['Embarked'])
+    counts = df['Embarked'].value_counts()
+    expected = [f'{count} ({count / len(df) * 100:.1f}%)' for count in counts]
+    assert [text.get_text() for text in plt.gcf().axes[0].texts] == expected
+
+
+def test_pairs_hue_order_is_sorted(df):
+    functions.cathegorical_pairs(df, 'Group_Age', ['Sex'])
+    labels = [text.get_text() for text in plt.gcf().axes[0].get_legend().get_texts()]
+    assert labels == sorted(df['Group_Age'].dropna().astype(str).unique())
+
+
+@pytest.mark.parametrize('plot', ['simple', 'pairs'])
+def test_selection_is_counted_from_the_index(df, monkeypatch, plot):
+    index = BitmapIndex(df, ['Sex', 'Embarked', 'Group_Age', 'Pclass'])
+    selection = index.select([('Pclass', ['First', 'Second'])])
+    rows = df[df['Pclass'].isin(['First', 'Second'])]
+
+    def draw(data):
+        if plot == 'simple':
+            functions.cathegorical_simple(data, ['Embarked', 'Sex'])
+        else:
+            functions.cathegorical_pairs(data, 'Group_Age', ['Embarked', 'Sex'])
+        texts = [[text.get_text() for text in ax.texts] for ax in plt.gcf().axes]
+        plt.close('all')
+        return texts
+
+    expected = draw(rows)
+    monkeypatch.setattr(Selection, 'to_frame', lambda *args, **kwargs: pytest.fail('the rows were built'))
+    assert draw(selection) == expected
@@ -0,0 +1,19 @@
+import numpy as np
+import pandas as pd
+
+from grouping import combined_column
+
+
+def test_combined_column_matches_string_join():
+    df = pd.DataFrame({'Sex': ['male', 'female', 'male', 'female'], 'Pclass': [3, 1, 1, 3]})
+    column = combined_column(df, ['Sex', 'Pclass'])
+    assert column.astype(str).tolist() == (df['Sex'] + '-' + df['Pclass'].astype(str)).tolist()
+    assert list(column.cat.categories) == ['female-1', 'female-3', 'male-1', 'male-3']
+
+
+def test_combined_column_merges_equal_labels():
+    # NaN and the string 'nan' are two groups with the same label
+    df = pd.DataFrame({'Cabin': ['C85', np.nan, 'nan', 'C85'], 'Pclass': [1, 3, 3, 1]})
+    column = combined_column(df, ['Cabin', 'Pclass'])
+    assert column.astype(str).tolist() == ['C85-1', 'nan-3', 'nan-3', 'C85-1']
+    assert list(column.cat.categories) == ['C85-1', 'nan-3']
@@ -0,0 +1,40 @@
+import json
+import os
+import subprocess
+import sys
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Backends that `import functions` must not load: every plotter imports its own stack when it is called
+BACKENDS = ['seaborn', 'matplotlib', 'scipy', 'plotly', 'datashader']
+
+# Cold `import functions` (pandas and numpy included) measured on a single core: about 0.5 s
+MAX_IMPORT_SECONDS = 1.0
+
+PROBE = '''
+import json, sys, time
+start = time.perf_counter()
+import functions
+seconds = time.perf_counter() - start
+print(json.dumps([seconds, sorted({name.split('.')[0] for name in sys.modules})]))
+'''
+
+
+def cold_import():
+    """Imports `functions` in a new interpreter and returns (seconds, top-level packages loaded)."""
+    env = dict(os.environ, MPLBACKEND='Agg')
+    env.pop('TITANIC_PROFILE', None)
+    result = subprocess.run([sys.executable, '-c', PROBE], cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    seconds, modules = json.loads(result.stdout.strip().splitlines()[-1])
+    return seconds, set(modules)
+
+
+def test_import_loads_no_backend():
+    _, modules = cold_import()
+    assert sorted(modules & set(BACKENDS)) == []
+
+
+def test_import_time():
+    seconds = min(cold_import()[0] for _ in range(3))
+    assert seconds < MAX_IMPORT_SECONDS
@@ -0,0 +1,86 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow.feather as feather
+import pytest
+
+from cleaning import RAW_CSV, CleaningStats, clean_titanic, load_raw
+from cube import CUBE_DIMENSIONS, count_cube
+from incremental import IncrementalCleaner
+from loader import load_clean, read_table, table_to_pandas, to_arrow
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The cube dimensions that do not depend on the imputed ages, which keep the medians of their time
+FIXED_DIMENSIONS = [col for col in CUBE_DIMENSIONS if col != 'Group_Age']
+
+
+@pytest.fixture(scope='module')
+def raw():
+    """The manifest in a random order, so the families are split between the base and the batches."""
+    raw = load_raw(os.path.join(ROOT, RAW_CSV))
+    return raw.sample(frac=1, random_state=0).reset_index(drop=True)
+
+
+def family_partition(family_id):
+    """Numbers the families of some rows in order of first appearance, keeping -1 for the rows without one."""
+    family_id = np.asarray(family_id)
+    partition = np.full(len(family_id), -1)
+    in_family = family_id >= 0
+    partition[in_family] = pd.factorize(family_id[in_family])[0]
+    return partition
+
+
+def cube_counts(cube, dimensions):
+    """The non-zero counts of a cube summed over `dimensions`, with the categories as strings."""
+    counts = cube[cube > 0].groupby(level=dimensions, observed=True).sum()
+    counts.index = pd.MultiIndex.from_frame(counts.index.to_frame(index=False).astype(str))
+    return counts.sort_index()
+
+
+@pytest.mark.parametrize('batch_size', [91, 300])
+def test_append_and_compact_match_full_clean(raw, tmp_path, batch_size):
+    path = str(tmp_path / 'titanic_clean.arrow')
+    cleaner = IncrementalCleaner.from_raw(raw[:300], path)
+    for start in range(300, len(raw), batch_size):
+        cleaner.append(raw[start:start + batch_size])
+    cleaner.compact()
+
+    incremental = table_to_pandas(read_table(path))
+    full = table_to_pandas(to_arrow(clean_titanic(raw)))
+    assert len(incremental) == len(full)
+    np.testing.assert_array_equal(family_partition(incremental['FamilyID']), family_partition(full['FamilyID']))
+    np.testing.assert_array_equal(incremental['Family_Survival_Rate'], full['Family_Survival_Rate'])
+
+    pd.testing.assert_series_equal(cube_counts(cleaner.cube, CUBE_DIMENSIONS),
+                                   cube_counts(count_cube(incremental, CUBE_DIMENSIONS), CUBE_DIMENSIONS))
+    pd.testing.assert_series_equal(cube_counts(cleaner.cube, FIXED_DIMENSIONS),
+                                   cube_counts(count_cube(full, CUBE_DIMENSIONS), FIXED_DIMENSIONS))
+
+
+def test_rebuilt_base_is_rejected(raw, tmp_path):
+    path = str(tmp_path / 'titanic_clean.arrow')
+    csv_path = str(tmp_path / 'titanic_clean.csv')
+    clean_titanic(raw[:800]).to_csv(csv_path, index=False)
+    cleaner = IncrementalCleaner.from_raw(raw[:800], path)
+    cleaner.append(raw[800:])
+    assert len(load_clean(path, csv_path)) == len(raw)
+
+    # A CSV newer than the file would rebuild it under its deltas
+    os.utime(csv_path, (os.path.getmtime(path) + 10,) * 2)
+    with pytest.raises(ValueError):
+        load_clean(path, csv_path)
+
+    # A base with other rows than the one the deltas were written for
+    feather.write_feather(to_arrow(clean_titanic(raw[:700])), path, compression='uncompressed')
+    with pytest.raises(ValueError):
+        IncrementalCleaner(CleaningStats().update(raw), path)
+
+
+def test_stats_of_other_rows_are_rejected(raw, tmp_path):
+    path = str(tmp_path / 'titanic_clean.arrow')
+    IncrementalCleaner.from_raw(raw[:800], path)
+    with pytest.raises(ValueError):
+        IncrementalCleaner(CleaningStats().update(raw[:700]), path)
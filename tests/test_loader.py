@@ -0,0 +1,35 @@
+import os
+
+import pandas as pd
+import pytest
+
+from cleaning import RAW_CSV, clean_titanic, load_raw
+from loader import table_to_pandas, to_arrow
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope='module')
+def raw():
+    return load_raw(os.path.join(ROOT, RAW_CSV))
+
+
+def test_numeric_codes_are_mapped(raw):
+    labeled = table_to_pandas(to_arrow(clean_titanic(raw)))
+    coded = table_to_pandas(to_arrow(clean_titanic(raw, labels=False)))
+    pd.testing.assert_frame_equal(coded, labeled)
+
+
+def test_unknown_category_raises(raw):
+    df = clean_titanic(raw)
+    df.loc[3, 'Pclass'] = 'Fourth'
+    with pytest.raises(ValueError, match='Pclass'):
+        to_arrow(df)
+
+
+def test_many_categories(raw):
+    df = clean_titanic(pd.concat([raw] * 2, ignore_index=True))
+    df['Title'] = [f'Title {i % 300}' for i in range(len(df))]
+    table = to_arrow(df)
+    assert table_to_pandas(table)['Title'].astype(str).tolist() == df['Title'].tolist()
@@ -0,0 +1,84 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from cleaning import RAW_CSV, load_raw
+from loader import CLEAN_CSV
+from outliers import OUTLIER_COLUMNS, OutlierStats, QuantileDigest, inlier_mask, inlier_masks, iqr_bounds
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Rank error allowed to the quartiles of a digest with the default compression (about 1 / compression)
+MAX_RANK_ERROR = 0.005
+
+
+def remove_outliers(df, col):
+    """The outlier removal of the notebook."""
+    Q1 = df[col].quantile(0.25)
+    Q3 = df[col].quantile(0.75)
+    IQR = Q3 - Q1
+    lower_bound = Q1 - 1.5 * IQR
+    upper_bound = Q3 + 1.5 * IQR
+    df_clean = df[(df[col] > lower_bound) & (df[col] < upper_bound)]
+    return df_clean
+
+
+def rank_error(values, estimate, q):
+    """How far the rank of an estimate is from the quantile `q`, 0 when it is one of the values at `q`."""
+    return max((values < estimate).mean() - q, q - (values <= estimate).mean(), 0)
+
+
+@pytest.fixture(scope='module')
+def samples():
+    """Large samples shaped like the outlier columns: continuous ages, skewed fares with ties, and integer family sizes."""
+    rng = np.random.default_rng(0)
+    return {
+        'Age': rng.uniform(0, 80, 100_000),
+        'Fare': np.round(rng.lognormal(2.5, 1, 100_000), 2),
+        'n_fam': rng.poisson(0.9, 100_000).astype(float),
+    }
+
+
+@pytest.mark.parametrize('path, columns', [(CLEAN_CSV, OUTLIER_COLUMNS), (RAW_CSV, ['Age', 'Fare'])])
+def test_masks_match_remove_outliers(path, columns):
+    df = load_raw(os.path.join(ROOT, path))
+    bounds = iqr_bounds(df, columns)
+    masks = inlier_masks(df, bounds)
+    for col in columns:
+        expected = remove_outliers(df, col)
+        pd.testing.assert_frame_equal(df[masks[col].to_numpy()], expected)
+        pd.testing.assert_frame_equal(df[inlier_mask(df, bounds, [col])], expected)
+
+
+@pytest.mark.parametrize('col', ['Age', 'Fare'])
+def test_digest_quartile_error(samples, col):
+    values = samples[col]
+    digest = QuantileDigest()
+    for chunk in np.array_split(values, 1000):
+        digest.update(chunk)
+    assert digest.count == len(values)
+    assert len(digest) <= digest.compression
+    for q, estimate in zip([0.25, 0.75], digest.quantile([0.25, 0.75])):
+        assert rank_error(values, estimate, q) <= MAX_RANK_ERROR
+
+
+def test_merge_order_insensitive(samples):
+    df = pd.DataFrame(samples)
+    parts = [OutlierStats().update(df[start:start + 2_703]) for start in range(0, len(df), 2_703)]
+    exact = inlier_mask(df, iqr_bounds(df), ['n_fam'])
+    rng = np.random.default_rng(1)
+    for order in [range(37), range(36, -1, -1), rng.permutation(37)]:
+        stats = OutlierStats()
+        for i in order:
+            stats.merge(parts[i])
+        for col in OUTLIER_COLUMNS:
+            digest = stats.digests[col]
+            assert (digest.count, digest.min, digest.max) == (len(df), df[col].min(), df[col].max())
+            if col != 'n_fam':
+                for q, estimate in zip([0.25, 0.75], digest.quantile([0.25, 0.75])):
+                    assert rank_error(df[col].to_numpy(), estimate, q) <= MAX_RANK_ERROR
+        # The integer family sizes are interpolated between the centroids, but their fences flag the same rows
+        np.testing.assert_array_equal(inlier_mask(df, stats.bounds(), ['n_fam']), exact)
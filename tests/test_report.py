@@ -0,0 +1,41 @@
+import os
+
+import pytest
+
+import report
+from cleaning import RAW_CSV, clean_titanic, load_raw
+from incremental import IncrementalCleaner
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SPECS = [{'plot': 'cathegorical_simple', 'kwargs': {'variables': ['Sex', 'Pclass']}, 'group': [('Sex', 'male')], 'name': 'male'}]
+
+
+@pytest.fixture(scope='module')
+def raw():
+    return load_raw(os.path.join(ROOT, RAW_CSV))
+
+
+def test_report_counts_appended_rows(raw, tmp_path):
+    path = str(tmp_path / 'titanic_clean.arrow')
+    cleaner = IncrementalCleaner.from_raw(raw[:800], path)
+    cleaner.append(raw[800:])
+
+    paths = report.render_report(SPECS, source=path, out_dir=str(tmp_path / 'reports'), processes=1)
+    assert all(os.path.getsize(out) > 0 for out in paths)
+
+    # The state of a worker, loaded the same way in this process
+    report._init_worker(path)
+    assert len(report._frame) == len(raw)
+    assert report._select_group([('Sex', 'male')]).count() == (raw['Sex'] == 'male').sum()
+
+
+def test_report_builds_missing_file(raw, tmp_path):
+    path = str(tmp_path / 'titanic_clean.arrow')
+    csv_path = str(tmp_path / 'titanic_clean.csv')
+    clean_titanic(raw).to_csv(csv_path, index=False)
+
+    paths = report.render_report(SPECS, source=path, out_dir=str(tmp_path / 'reports'), processes=1, csv_path=csv_path)
+    assert os.path.exists(path)
+    assert all(os.path.getsize(out) > 0 for out in paths)
@@ -0,0 +1,144 @@
+import numpy as np
+import pandas as pd
+
+from kde import kde_by
+
+
+def violin_summary(df, y, by=(), max_outliers=1_000, hover_columns=None, grid_size=256, rng=None):
+    """
+    Computes, for every group, what a violin plot shows: the KDE profile, the quartiles, the whiskers and the outliers.
+
+    The whiskers end at the most extreme values within 1.5 IQR of the quartiles, like in plotly. Only a sample of
+    the outliers is kept, stratified by group (every group keeps up to `max_outliers` / number of groups),
+    with the `hover_columns` only. The size of the result does not depend on the number of rows.
+
+    Parameters:
+    - df (pandas.DataFrame): The input dataframe containing the data.
+    - y (str): The numerical variable.
+    - by (list): The categorical variables that define the groups. Default is no variable (a single group).
+    - max_outliers (int): Maximum number of outliers kept in total. Default is 1,000.
+    - hover_columns (list): Columns kept for the outliers, besides `y`. Default is None (`by`).
+    - grid_size (int): Number of points of the KDE profiles. Default is 256.
+    - rng (numpy.random.Generator): Random generator of the outlier sample. Default is None (a new one).
+
+    Returns:
+    dict: With 'groups' (the values of `by` and the 'q1', 'median', 'q3', 'lowerfence', 'upperfence' and 'count'
+    of every group), 'grid', 'density' and 'support' (see `kde.group_kde`), and 'outliers' (a dataframe with
+    the sampled outliers, their 'group' and the `hover_columns`).
+    """
+    by = list(by)
+    rng = np.random.default_rng() if rng is None else rng
+    hover_columns = list(dict.fromkeys([y] + (by if hover_columns is None else list(hover_columns))))
+
+    kde = kde_by(df, y, by, grid_size=grid_size)
+    codes = kde['codes']
+    values = pd.Series(df.loc[kde['index'], y].to_numpy(dtype=float))
+    n_groups = len(kde['groups'])
+
+    grouped = values.groupby(codes)
+    quartiles = grouped.quantile([0.25, 0.5, 0.75]).unstack().reindex(range(n_groups))
+    q1, median, q3 = (quartiles[q].to_numpy() for q in (0.25, 0.5, 0.75))
+
+    # Whiskers: the most extreme values inside the 1.5 IQR fences
+    iqr = q3 - q1
+    low_fence, high_fence = (q1 - 1.5 * iqr)[codes], (q3 + 1.5 * iqr)[codes]
+    inside = (values.to_numpy() >= low_fence) & (values.to_numpy() <= high_fence)
+    whiskers = values[inside].groupby(codes[inside]).agg(['min', 'max']).reindex(range(n_groups))
+
+    groups = kde['groups'].assign(
+        q1=q1, median=median, q3=q3,
+        lowerfence=whiskers['min'].to_numpy(), upperfence=whiskers['max'].to_numpy(),
+        count=kde['counts'],
+    )
+
+    # Stratified sample of the outliers: a random rank inside every group, kept below the quota
+    outside = np.flatnonzero(~inside)
+    quota = max(max_outliers // max(n_groups, 1), 1)
+    order = outside[np.lexsort((rng.random(len(outside)), codes[outside]))]
+    counts = np.bincount(codes[order], minlength=n_groups)
+    starts = np.concatenate(([0], np.cumsum(counts)))[codes[order]]
+    sample = np.sort(order[np.arange(len(order)) - starts < quota])
+    outliers = df.loc[kde['index'][sample], hover_columns].reset_index(drop=True).assign(group=codes[sample])
+
+    return {
+        'groups': groups,
+        'grid': kde['grid'],
+        'density': kde['density'],
+        'support': kde['support'],
+        'outliers': outliers,
+    }
+
+
+def violin_traces(summary, y, x=None, color=None, width=0.8, colors=None):
+    """
+    Builds the traces of a violin plot from a `violin_summary`: a filled KDE profile, a box with the precomputed
+    statistics and the sampled outliers of every group.
+
+    The groups are placed at integer positions along x, one per category of `x`, and the categories of `color`
+    are placed side by side inside every position, like `violinmode='group'`.
+
+    Parameters:
+    - summary (dict): The summary, as returned by `violin_summary`.
+    - y (str): The numerical variable.
+    - x (str): The categorical variable along x. Default is None (a single position).
+    - color (str): The categorical variable of the colors. Default is None (a single color).
+    - width (float): Width of every position. Default is 0.8.
+    - colors (list): Colors of the categories of `color`. Default is None (the plotly palette).
+
+    Returns:
+    tuple: (traces, tickvals, ticktext) with the traces and the labels of the positions along x.
+    """
+    import plotly.graph_objects as go
+    from plotly.colors import qualitative
+
+    colors = qualitative.Plotly if colors is None else colors
+    groups = summary['groups']
+    x_values = groups[x].drop_duplicates().tolist() if x else [None]
+    color_values = groups[color].drop_duplicates().sort_values().tolist() if color else [None]
+    slot = width / len(color_values)
+    max_density = np.nanmax(summary['density']) if np.isfinite(summary['density']).any() else 1.0
+
+    traces = []
+    shown = set()
+    for i, row in groups.iterrows():
+        x_value = row[x] if x else None
+        color_value = row[color] if color else None
+        j = color_values.index(color_value)
+        centre = x_values.index(x_value) + (j - (len(color_values) - 1) / 2) * slot
+        line_color = colors[j % len(colors)]
+        name = str(color_value) if color else y
+        legend = name not in shown
+        shown.add(name)
+
+        # KDE profile, mirrored around the centre of the slot
+        low, high = summary['support'][i]
+        inside = (summary['grid'] >= low) & (summary['grid'] <= high)
+        half = summary['density'][i, inside] / max_density * slot * 0.48
+        grid = summary['grid'][inside]
+        traces.append(go.Scatter(
+            x=np.concatenate([centre - half, (centre + half)[::-1]]),
+            y=np.concatenate([grid, grid[::-1]]),
+            fill='toself', mode='lines', line=dict(color=line_color, width=1), opacity=0.6,
+            name=name, legendgroup=name, showlegend=legend, hoverinfo='skip',
+        ))
+
+        traces.append(go.Box(
+            x=[centre], q1=[row['q1']], median=[row['median']], q3=[row['q3']],
+            lowerfence=[row['lowerfence']], upperfence=[row['upperfence']],
+            width=slot * 0.15, marker_color=line_color, fillcolor='white', line=dict(color=line_color),
+            name=name, legendgroup=name, showlegend=False, boxpoints=False,
+        ))
+
+        outliers = summary['outliers'][summary['outliers']['group'] == i]
+        if len(outliers):
+            hover = [col for col in outliers.columns if col != 'group']
+            traces.append(go.Scatter(
+                x=np.full(len(outliers), centre), y=outliers[y], mode='markers',
+                marker=dict(color=line_color, size=4), name=name, legendgroup=name, showlegend=False,
+                customdata=outliers[hover].astype(str).to_numpy(),
+                hovertemplate='<br>'.join(f'{col}: %{{customdata[{k}]}}' for k, col in enumerate(hover)) + '<extra></extra>',
+            ))
+
+    tickvals = list(range(len(x_values)))
+    ticktext = [str(value) for value in x_values] if x else [y]
+    return traces, tickvals, ticktext